@@ -0,0 +1,300 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Non-interactive batch tool for converting data files and performing standard cuts as described in a job file.
+The job file is a json file with the following keys:
+
+    - files (string or list): Data files to be reduced. Either a list of file paths or a number string as used by fileListGenerator (required).
+
+    - folder (string): Folder of data files when files is a number string (default current directory).
+
+    - year (int): Year of data files when files is a number string (default 2018).
+
+    - instrument (string): Instrument used to generate file names when files is a number string (default CAMEA).
+
+    - binning (int): Binning used when converting raw files (default 8).
+
+    - saveLocation (string): Folder in which converted files and results are saved (default current directory).
+
+    - saveFormat (string): Format of cut results, either 'hdf' or 'csv' (default 'hdf').
+
+    - masks (list): Masking objects given as dictionaries with a 'type' naming the mask class in MJOLNIR.Data.Mask and its keyword arguments. Masked regions are combined (default no mask).
+
+    - cuts (list): Cuts given as dictionaries with a 'type' being one of cut1D, cutQE, cutPowder, or binData3D, an optional 'name', and the keyword arguments of the corresponding DataSet method.
+
+Example of job file::
+
+    {
+        "files": "136-137",
+        "folder": "/data/2018",
+        "year": 2018,
+        "binning": 8,
+        "saveLocation": "reduced",
+        "masks": [{"type": "circleMask", "center": [0.0, 0.0], "radius": 0.1}],
+        "cuts": [{"type": "cut1D", "name": "cut100", "q1": [1,0,0], "q2": [2,0,0], "width": 0.1, "minPixel": 0.01, "Emin": 1.0, "Emax": 1.5},
+                 {"type": "cutPowder", "EBinEdges": [1.0, 1.5, 2.0]}]
+    }
+
+"""
+
+import argparse
+import concurrent.futures
+import json
+import os
+
+import numpy as np
+import h5py as hdf
+
+from MJOLNIR.Data import DataSet,DataFile,Mask
+import MJOLNIR._tools
+
+cutTypes = ['cut1D','cutQE','cutPowder','binData3D']
+saveFormats = ['hdf','csv']
+
+jobDefaults = {'folder':'.','year':2018,'instrument':'CAMEA','binning':8,'saveLocation':'.','saveFormat':'hdf','masks':[],'cuts':[]}
+
+
+def loadJob(job):
+    """Load and validate job description.
+
+    Args:
+
+        - job (string or dict): Path to json job file or dictionary holding job description.
+
+    Returns:
+
+        - job (dict): Job description with defaults inserted.
+
+    Raises:
+
+        - AttributeError
+
+    """
+    if not isinstance(job,dict):
+        with open(job) as f:
+            job = json.load(f)
+
+    if not 'files' in job:
+        raise AttributeError('Job description does not contain any data files. Please provide "files".')
+    unknownKeys = [key for key in job if not key in jobDefaults and key != 'files']
+    if len(unknownKeys)>0:
+        raise AttributeError('Job description contains unknown key(s): {}'.format(', '.join(unknownKeys)))
+
+    loadedJob = dict(jobDefaults)
+    loadedJob.update(job)
+
+    if not loadedJob['saveFormat'] in saveFormats:
+        raise AttributeError('Save format "{}" not understood. Should be one of {}'.format(loadedJob['saveFormat'],', '.join(saveFormats)))
+
+    cuts = []
+    for i,cut in enumerate(loadedJob['cuts']):
+        if not 'type' in cut or not cut['type'] in cutTypes:
+            raise AttributeError('Cut number {} has type "{}" but should be one of {}'.format(i,cut.get('type'),', '.join(cutTypes)))
+        cut = dict(cut)
+        if not 'name' in cut:
+            cut['name'] = '{}_{}'.format(cut['type'],i)
+        cuts.append(cut)
+    names = [cut['name'] for cut in cuts]
+    if len(set(names))!=len(names):
+        raise AttributeError('Cut names are not unique: {}'.format(', '.join(names)))
+    loadedJob['cuts'] = cuts
+
+    return loadedJob
+
+
+def jobFiles(job):
+    """Generate list of data files from job description."""
+    files = job['files']
+    if isinstance(files,str):
+        files = MJOLNIR._tools.fileListGenerator(files,job['folder'],year=job['year'],instrument=job['instrument'])
+    return list(files)
+
+
+def generateMask(masks):
+    """Generate masking object from list of mask dictionaries.
+
+    Args:
+
+        - masks (list): List of dictionaries with 'type' being the name of masking object and remaining keys its kwargs.
+
+    Returns:
+
+        - mask (MaskingObject): Combined masking object or None if no masks are provided.
+
+    """
+    maskObject = None
+    for maskSpec in masks:
+        maskSpec = dict(maskSpec)
+        maskType = maskSpec.pop('type',None)
+        maskClass = getattr(Mask,str(maskType),None)
+        if not (isinstance(maskClass,type) and issubclass(maskClass,Mask.MaskingObject)):
+            raise AttributeError('Mask type "{}" not understood.'.format(maskType))
+        mask = maskClass(**maskSpec)
+        maskObject = mask if maskObject is None else maskObject+mask
+    return maskObject
+
+
+def convertFile(file,binning,saveLocation):
+    """Convert single raw file and save it as nxs file in saveLocation. Converted files are returned untouched.
+
+    Returns:
+
+        - fileName (string): Path to converted file.
+
+    """
+    dataFile = DataFile.DataFile(file)
+    if dataFile.type == 'nxs':
+        return file
+    convertedFile = dataFile.convert(binning)
+    fileName = os.path.join(os.path.abspath(saveLocation),os.path.splitext(os.path.split(file)[1])[0]+'.nxs')
+    convertedFile.saveNXsqom(fileName)
+    return fileName
+
+
+def loadDataSet(files,masks):
+    """Load converted files into DataSet and apply masks."""
+    dataSet = DataSet.DataSet(convertedFiles=files)
+    mask = generateMask(masks)
+    if not mask is None:
+        dataSet.mask = mask
+    return dataSet
+
+
+def saveFrame(fileName,data,saveFormat,attributes=None):
+    """Save pandas DataFrame as csv file or as one data set per column in hdf file."""
+    if saveFormat == 'csv':
+        data.to_csv(fileName,index=False)
+    else:
+        with hdf.File(fileName,'w') as f:
+            for column in data.columns:
+                f.create_dataset(column,data=data[column].values)
+            for key,value in (attributes or {}).items():
+                f.attrs[key] = value
+
+
+def runCut(dataSet,cut,saveLocation,saveFormat='hdf'):
+    """Perform cut on DataSet and save the result to disk.
+
+    Args:
+
+        - dataSet (DataSet): Converted DataSet to be cut.
+
+        - cut (dict): Cut description with 'type', 'name', and kwargs for the DataSet method.
+
+        - saveLocation (string): Folder in which the result is saved.
+
+    Kwargs:
+
+        - saveFormat (string): Either 'hdf' or 'csv'. binData3D is always saved as hdf (default 'hdf').
+
+    Returns:
+
+        - fileName (string): Path to saved result.
+
+    """
+    kwargs = dict(cut)
+    cutType = kwargs.pop('type')
+    name = kwargs.pop('name')
+    attributes = {'type':cutType,'cut':json.dumps(cut)}
+    kwargs = dict([(key,np.asarray(value) if isinstance(value,list) else value) for key,value in kwargs.items()]) # Json only provides lists
+
+    result = getattr(dataSet,cutType)(**kwargs)
+
+    if cutType == 'binData3D': # Binned volume does not fit a table
+        fileName = os.path.join(saveLocation,name+'.hdf')
+        (data,bins) = result
+        with hdf.File(fileName,'w') as f:
+            for dataName,values in zip(['Intensity','Monitor','Normalization','NormalizationCount'],data):
+                f.create_dataset(dataName,data=values)
+            for binName,values in zip(['X','Y','Z'],bins):
+                f.create_dataset(binName,data=values)
+            for key,value in attributes.items():
+                f.attrs[key] = value
+    else:
+        fileName = os.path.join(saveLocation,name+'.'+saveFormat)
+        saveFrame(fileName,result[0],saveFormat,attributes=attributes)
+    return fileName
+
+
+_workerDataSet = None
+
+def _initializeWorker(files,masks): # pragma: no cover
+    global _workerDataSet
+    _workerDataSet = loadDataSet(files,masks)
+
+def _cutWorker(cut,saveLocation,saveFormat): # pragma: no cover
+    return runCut(_workerDataSet,cut,saveLocation,saveFormat)
+
+
+def runJob(job,workers=1,outputFunction=print):
+    """Run conversion and cuts of job description.
+
+    Args:
+
+        - job (string or dict): Path to json job file or dictionary holding job description.
+
+    Kwargs:
+
+        - workers (int): Number of worker processes used for conversion and cuts (default 1)
+
+        - outputFunction (function): Function called with progress messages (default print)
+
+    Returns:
+
+        - files (list): Converted data files.
+
+        - results (list): Saved cut results.
+
+    """
+    job = loadJob(job)
+    saveLocation = job['saveLocation']
+    if not os.path.isdir(saveLocation):
+        os.makedirs(saveLocation)
+
+    files = jobFiles(job)
+    cuts = job['cuts']
+
+    if workers>1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            convertedFiles = list(executor.map(convertFile,files,[job['binning']]*len(files),[saveLocation]*len(files)))
+            for file in convertedFiles:
+                outputFunction('Converted {}'.format(file))
+        results = []
+        if len(cuts)>0:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=min(workers,len(cuts)),initializer=_initializeWorker,initargs=(convertedFiles,job['masks'])) as executor:
+                for fileName in executor.map(_cutWorker,cuts,[saveLocation]*len(cuts),[job['saveFormat']]*len(cuts)):
+                    outputFunction('Saved {}'.format(fileName))
+                    results.append(fileName)
+    else:
+        convertedFiles = []
+        for file in files:
+            convertedFiles.append(convertFile(file,job['binning'],saveLocation))
+            outputFunction('Converted {}'.format(convertedFiles[-1]))
+        results = []
+        if len(cuts)>0:
+            dataSet = loadDataSet(convertedFiles,job['masks'])
+            for cut in cuts:
+                results.append(runCut(dataSet,cut,saveLocation,job['saveFormat']))
+                outputFunction('Saved {}'.format(results[-1]))
+
+    return convertedFiles,results
+
+
+def main(): # pragma: no cover
+    import matplotlib
+    matplotlib.use('Agg') # Never open interactive windows when run as script
+    parser = argparse.ArgumentParser(description="Batch tool for non-interactive conversion and cutting of data files as described in a json job file.")
+    parser.add_argument("JobFile", type=str,help="Json file describing data files, binning, masks, and cuts. See documentation.")
+    parser.add_argument("-w", "--workers", type=int, default= 1,help="Number of worker processes. Default 1")
+    parser.add_argument("-s", "--save", type=str, default= '',help="Location to which the generated files will be saved. Overwrites saveLocation of job file.")
+
+    args = parser.parse_args()
+
+    job = loadJob(args.JobFile)
+    if not args.save.strip() == '':
+        job['saveLocation'] = args.save.strip()
+    runJob(job,workers=args.workers)
+
+
+if __name__ == '__main__': # pragma: no cover
+    main()
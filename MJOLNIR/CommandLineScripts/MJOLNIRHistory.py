@@ -39,24 +39,14 @@ returnText = ''
 
 saveFile = args.save
 
-for file in files:
-    try:
-        f = DataFile.DataFile(file)
-    except:
+headers = DataFile.readHeaders(files,indexFile=_tools.historyIndexFile) # Only new or changed files are opened
+
+for file,header in zip(files,headers):
+    if header is None or header['scanCommand'] is None: # Files without scan command are not data files
         textLine = file.split('/')[-1]+' not correct format\n'
-        returnText+= textLine
     else:
-        textLine = f.name+': '
-        try:
-            textLine+=f.scanCommand.decode()
-        except:
-            textLine+=str(f.scanCommand)
-        try:
-            textLine+='\t'+f.title.decode()+'\n'
-        except:
-            textLine+='\t'+str(f.title)+'\n'
-        
-        returnText+=textLine
+        textLine = header['name']+': '+str(header['scanCommand'])+'\t'+str(header['title'])+'\n'
+    returnText+=textLine
     print(textLine[:-1]) # Print string excluding the added new line character. 
 
 
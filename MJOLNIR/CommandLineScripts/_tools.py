@@ -9,6 +9,7 @@ from os.path import expanduser
 settingsFile = expanduser("~") # Use home folder for storing settings file
 
 settingsFile = os.path.join(settingsFile,'.MJOLNIRsettings')
+historyIndexFile = os.path.join(expanduser("~"),'.MJOLNIRHistoryIndex') # Index of meta data of already seen files
 
 rawFileFormats = ' '.join([x for x in ['.hdf']])
 convertedFileFormats = ' '.join([x for x in ['*.nxs']])
@@ -0,0 +1,251 @@
+import sys, os
+sys.path.append('.')
+sys.path.append('..')
+sys.path.append('../..')
+import sqlite3
+import json
+import glob
+import numpy as np
+from MJOLNIR import _tools
+from MJOLNIR.Data import DataFile
+
+
+def _scanParameters(f):
+    return ','.join(DataFile.getScanParameter(f)[0])
+
+catalogueEntries = {'scanCommand':'entry/scancommand',
+                    'title':'entry/title',
+                    'scanParameters':_scanParameters,
+                    'Ei':'entry/CAMEA/monochromator/energy',
+                    'A4':'entry/CAMEA/analyzer/polar_angle',
+                    'temperature':'entry/sample/temperature',
+                    'magneticField':'entry/sample/magnetic_field',
+                    'electricField':'entry/sample/electric_field',
+                    'sampleName':'entry/sample/name',
+                    'unitCell':'entry/sample/unit_cell',
+                    'UB':'entry/sample/orientation_matrix',
+                    'startTime':'entry/start_time',
+                    'endTime':'entry/end_time',
+                    'monitor':'entry/control/data',
+                    'binning':'entry/reduction/MJOLNIR_algorithm_convert/binning'}
+
+# Name and SQL type of columns in catalogue. Numerical values are stored as the mean over the scan.
+catalogueColumns = [('path','TEXT PRIMARY KEY'),('name','TEXT'),('mtime','REAL'),('size','INTEGER'),
+                    ('scanCommand','TEXT'),('title','TEXT'),('scanParameters','TEXT'),
+                    ('Ei','REAL'),('A4','REAL'),('temperature','REAL'),('magneticField','REAL'),('electricField','REAL'),
+                    ('sampleName','TEXT'),('unitCell','TEXT'),('UB','TEXT'),
+                    ('startTime','TEXT'),('endTime','TEXT'),('monitor','REAL'),('binning','INTEGER')]
+
+catalogueFile = os.path.join(os.path.expanduser("~"),'.MJOLNIRCatalogue.db')
+
+
+def _toColumn(name,value):
+    """Convert meta data value read from file into value stored in catalogue"""
+    if value is None:
+        return None
+    if name in ['unitCell','UB']:
+        return json.dumps(np.asarray(value,dtype=float).tolist())
+    if name in ['scanCommand','title','scanParameters','sampleName','startTime','endTime']:
+        return str(DataFile.decodeStr(value))
+    value = np.asarray(value,dtype=float)
+    if value.size == 0 or np.all(np.isnan(value)):
+        return None
+    if name == 'monitor':
+        return float(np.nansum(value))
+    if name == 'binning':
+        return int(value.reshape(-1)[0])
+    return float(np.nanmean(value))
+
+
+class Catalogue(object):
+    """Persistent catalogue of meta data of data files stored in an SQLite data base. Files are only read once,
+    and only the meta data is read, such that queries on e.g. incoming energy, temperature, and time are performed without
+    opening any data file."""
+    @_tools.KwargChecker()
+    def __init__(self,databaseFile=None):
+        """Open or create catalogue.
+
+        Kwargs:
+
+            - databaseFile (string): Location of SQLite data base (default catalogueFile in home folder).
+
+        """
+        if databaseFile is None:
+            databaseFile = catalogueFile
+        self.databaseFile = databaseFile
+        self.connection = sqlite3.connect(databaseFile)
+        with self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS files ({})'.format(', '.join([' '.join(column) for column in catalogueColumns])))
+            self.connection.execute('CREATE TABLE IF NOT EXISTS failed (path TEXT PRIMARY KEY, mtime REAL, size INTEGER)') # Files that could not be read
+            for column in ['Ei','temperature','startTime']:
+                self.connection.execute('CREATE INDEX IF NOT EXISTS files_{0} ON files ({0})'.format(column))
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM files').fetchone()[0]
+
+    def __contains__(self,file):
+        return not self.connection.execute('SELECT 1 FROM files WHERE path = ?',(os.path.abspath(file),)).fetchone() is None
+
+    def close(self):
+        """Close connection to data base"""
+        self.connection.close()
+
+    @_tools.KwargChecker()
+    def add(self,files,workers=8):
+        """Add data files to catalogue. Files already in the catalogue are only read again if their modification time or size has changed.
+        Files that no longer exist are skipped, and files that cannot be read are skipped until they change.
+
+        Args:
+
+            - files (string or list): Data file(s) or folder(s) in which all hdf and nxs files are added.
+
+        Kwargs:
+
+            - workers (int): Number of threads reading files (default 8).
+
+        Returns:
+
+            - added (int): Number of files read and added or updated.
+
+        """
+        if isinstance(files,str):
+            files = [files]
+        allFiles = []
+        for file in files:
+            if os.path.isdir(file):
+                allFiles.extend(sorted(glob.glob(os.path.join(file,'*.hdf'))+glob.glob(os.path.join(file,'*.nxs'))))
+            else:
+                allFiles.append(file)
+
+        known = dict([(path,(mtime,size)) for path,mtime,size in self.connection.execute('SELECT path, mtime, size FROM files')])
+        failed = dict([(path,(mtime,size)) for path,mtime,size in self.connection.execute('SELECT path, mtime, size FROM failed')])
+        newFiles = []
+        for file in allFiles:
+            path = os.path.abspath(file)
+            try:
+                stat = os.stat(path)
+            except OSError: # File has vanished
+                continue
+            if known.get(path) != (stat.st_mtime,stat.st_size) and failed.get(path) != (stat.st_mtime,stat.st_size):
+                newFiles.append((path,stat))
+
+        headers = DataFile.readHeaders([path for path,_ in newFiles],entries=catalogueEntries,workers=workers)
+        rows = []
+        failedRows = []
+        for (path,stat),header in zip(newFiles,headers):
+            if header is None: # File could not be read
+                failedRows.append((path,stat.st_mtime,stat.st_size))
+                continue
+            row = [path,header['name'],stat.st_mtime,stat.st_size]
+            row += [_toColumn(name,header[name]) for name,_ in catalogueColumns[4:]]
+            rows.append(row)
+
+        with self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO files VALUES ({})'.format(', '.join(['?']*len(catalogueColumns))),rows)
+            self.connection.executemany('DELETE FROM failed WHERE path = ?',[(row[0],) for row in rows])
+            self.connection.executemany('INSERT OR REPLACE INTO failed VALUES (?, ?, ?)',failedRows)
+        return len(rows)
+
+    @_tools.KwargChecker()
+    def query(self,Ei=None,temperature=None,magneticField=None,electricField=None,binning=None,A4=None,start=None,end=None,title=None,sampleName=None,scanParameter=None,
+              Ei_err=0.05,temperature_err=0.2,magneticField_err=0.2,electricField_err=0.2,A4_err=0.1):
+        """Find files in catalogue fulfilling all provided conditions.
+
+        Kwargs:
+
+            - Ei (float): Incoming energy in meV (default None).
+
+            - temperature (float): Sample temperature (default None).
+
+            - magneticField (float): Magnetic field (default None).
+
+            - electricField (float): Electric field (default None).
+
+            - binning (int): Binning of converted files (default None).
+
+            - A4 (float): Mean A4 position (default None).
+
+            - start (string or datetime): Earliest start time of file (default None).
+
+            - end (string or datetime): Latest end time of file (default None).
+
+            - title (string): Sub string of file title (default None).
+
+            - sampleName (string): Name of sample (default None).
+
+            - scanParameter (string): Name of scan parameter, e.g. 'a3' (default None).
+
+            - Ei_err (float): Tolerance of E_i for which the values are equal (default = 0.05)
+
+            - temperature_err (float): Tolerance of temperature for which the values are equal (default = 0.2)
+
+            - magneticField_err (float): Tolerance of magnetic field for which the values are equal (default = 0.2)
+
+            - electricField_err (float): Tolerance of electric field for which the values are equal (default = 0.2)
+
+            - A4_err (float): Tolerance of A4 for which the values are equal (default = 0.1)
+
+        Returns:
+
+            - files (list): Paths of files sorted by start time, to be used directly in DataSet.
+
+        """
+        conditions = []
+        parameters = []
+        for column,value,tolerance in [['Ei',Ei,Ei_err],['temperature',temperature,temperature_err],['magneticField',magneticField,magneticField_err],
+                                       ['electricField',electricField,electricField_err],['A4',A4,A4_err]]:
+            if not value is None:
+                conditions.append('ABS({} - ?) <= ?'.format(column))
+                parameters.extend([float(value),float(tolerance)])
+        if not binning is None:
+            conditions.append('binning = ?')
+            parameters.append(int(binning))
+        if not start is None:
+            conditions.append('startTime >= ?')
+            parameters.append(str(start))
+        if not end is None:
+            conditions.append('endTime <= ?')
+            parameters.append(str(end))
+        if not title is None:
+            conditions.append('instr(title, ?) > 0')
+            parameters.append(title)
+        if not sampleName is None:
+            conditions.append('sampleName = ?')
+            parameters.append(sampleName)
+        if not scanParameter is None:
+            conditions.append("instr(',' || scanParameters || ',', ?) > 0")
+            parameters.append(','+scanParameter+',')
+
+        statement = 'SELECT path FROM files'
+        if len(conditions)>0:
+            statement+=' WHERE '+' AND '.join(conditions)
+        statement+=' ORDER BY startTime, path'
+        return [row[0] for row in self.connection.execute(statement,parameters)]
+
+    def metadata(self,files=None):
+        """Return meta data of files in catalogue as list of dictionaries.
+
+        Kwargs:
+
+            - files (list): Files for which meta data is returned (default all files in catalogue).
+
+        """
+        names = [name for name,_ in catalogueColumns]
+        statement = 'SELECT {} FROM files'.format(', '.join(names))
+        if files is None:
+            rows = self.connection.execute(statement+' ORDER BY startTime, path').fetchall()
+        else:
+            if isinstance(files,str):
+                files = [files]
+            rows = [self.connection.execute(statement+' WHERE path = ?',(os.path.abspath(file),)).fetchone() for file in files]
+        result = []
+        for row in rows:
+            if row is None:
+                result.append(None)
+                continue
+            entry = dict(zip(names,row))
+            for name in ['unitCell','UB']:
+                if not entry[name] is None:
+                    entry[name] = np.array(json.loads(entry[name]))
+            result.append(entry)
+        return result
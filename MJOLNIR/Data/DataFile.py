@@ -10,14 +10,14 @@ import warnings
 from MJOLNIR import _tools
 import datetime
 import math
-import shapely
-from shapely.geometry import Polygon as PolygonS, Point as PointS
 from MJOLNIR import TasUBlibDEG as TasUBlib
 from MJOLNIR._tools import Marray
 from MJOLNIR.Data import Mask
 import MJOLNIR.Data.Sample
 import re
 import copy
+import pickle
+import concurrent.futures
 
 multiFLEXXDetectors = 31*5
 reFloat = r'-?\d*\.\d*'
@@ -33,6 +33,7 @@ def sind(x):
 
 class DataFile(object):
     """Object to load and keep track of HdF files and their conversions"""
+    @_tools.ProfileSpan()
     def __init__(self,fileLocation=None):
         # Check if file exists
         if isinstance(fileLocation,DataFile): # Copy everything in provided file
@@ -338,7 +339,11 @@ class DataFile(object):
             del self._maskingObject
         if hasattr(self,'I'): # if identity has    
             if hasattr(self,'_maskingObject'):
-                self._mask = self._maskingObject(self) # Generate boolean mask
+                with _tools.ProfileSpan('DataFile.mask'):
+                    mask = self._maskingObject(self) # Generate boolean mask
+                if np.size(mask) == np.size(self.I): # 1D masks add extra axes in front
+                    mask = np.asarray(mask).reshape(self.I.shape)
+                self._mask = mask
             else:
                 if not np.all(self.I.shape == mask.shape):
                     raise AttributeError('Shape of provided mask {} does not match shape of data {}.'.format(mask.shape,self.I.shape))
@@ -673,6 +678,7 @@ class DataFile(object):
             
 
         
+    @_tools.ProfileSpan()
     @_tools.KwargChecker()
     def convert(self,binning=None):
         if self.instrument == 'CAMEA':
@@ -741,27 +747,12 @@ class DataFile(object):
         
         A3.resize((steps,1,1))
         Ei = self.Ei.copy().reshape(-1,1,1)#np.array(instrument.get('monochromator/energy'))
-        if False:
-            kf = factorsqrtEK*np.sqrt(EfMean)#.reshape(1,detectors,binning*EPrDetector)
-            
-            ki = factorsqrtEK*np.sqrt(Ei).reshape(-1,1,1)
-            # Shape everything into shape (steps,detectors,bins) (if external parameter 
-            # is changed, this is assured by A3 reshape)
-            Qx = ki-kf*np.cos(A4Mean)
-            Qy = -kf*np.sin(A4Mean)
-            QX = Qx*np.cos(A3)-Qy*np.sin(A3)
-            QY = Qx*np.sin(A3)+Qy*np.cos(A3)
-        else:
-            UB = self.sample.orientationMatrix
-            UBINV = np.linalg.inv(UB)
-            HKL,QX,QY = TasUBlib.calcTasQH(UBINV,[np.rad2deg(A3),
-                np.rad2deg(A4Mean)],Ei,EfMean)
-            H,K,L = np.swapaxes(np.swapaxes(HKL,1,2),0,3)
-            self.sample.B = TasUBlib.calculateBMatrix(self.sample.cell)
-
-        DeltaE = Ei-EfMean
-        if DeltaE.shape[0]==1:
-            DeltaE = DeltaE*np.ones((steps,1,1))
+        
+        UB = self.sample.orientationMatrix
+        UBINV = np.linalg.inv(UB)
+        QX,QY,H,K,L,DeltaE = calculateQHKL(UBINV,np.rad2deg(A3),np.rad2deg(A4Mean),Ei,EfMean,steps=steps)
+        self.sample.B = TasUBlib.calculateBMatrix(self.sample.cell)
+
         Monitor = self.Monitor.copy().reshape((steps,1,1))
         Monitor = Monitor*np.ones((1,detectors,EPrDetector*binning))
         Normalization = EfNormalization*np.ones((steps,1,1))
@@ -931,6 +922,8 @@ class DataFile(object):
             - EBins (list): Binning edges in energy
             
         """
+        import shapely.geometry
+        from shapely.geometry import Point as PointS
         if addEdge:
             if np.isclose(float(addEdge),1.0):
                 addEdgeAmount = None
@@ -1549,6 +1542,131 @@ def getScanParameter(f):
 
 
 
+headerEntries = {'scanCommand':'entry/scancommand','title':'entry/title'}
+
+def readHeader(fileLocation,entries=None):
+    """Read meta data of a data file without loading counts and calibration tables.
+
+    Args:
+
+        - fileLocation (string): Location of hdf or nxs file.
+
+    Kwargs:
+
+        - entries (dict): Mapping from meta data name to location in file or to function extracting the value from the open file (default headerEntries).
+
+    Returns:
+
+        - metadata (dict): Name of file and meta data. Entries not found in the file are None.
+
+    Raises:
+
+        - AttributeError
+
+    """
+    if entries is None:
+        entries = headerEntries
+    if not os.path.isfile(fileLocation):
+        raise AttributeError('File location does not exist({}).'.format(fileLocation))
+
+    metadata = {'name':os.path.basename(fileLocation)}
+    if not os.path.splitext(fileLocation)[1] in ['.hdf','.nxs']: # Other formats are only readable as a whole
+        dataFile = DataFile(fileLocation)
+        for name in entries:
+            metadata[name] = decodeStr(getattr(dataFile,name,None))
+        return metadata
+
+    with hdf.File(fileLocation,mode='r') as f:
+        for name,location in entries.items():
+            if callable(location):
+                metadata[name] = location(f)
+                continue
+            value = f.get(location)
+            if value is None:
+                metadata[name] = None
+                continue
+            value = np.array(value)
+            if value.size == 1:
+                value = decodeStr(value.reshape(-1)[0])
+            metadata[name] = value
+    return metadata
+
+
+def readHeaders(files,entries=None,workers=8,indexFile=None):
+    """Read meta data of multiple data files concurrently. Meta data is cached in an index on disk
+    such that only new or changed files (judged from modification time and size) are read on repeated calls.
+
+    Args:
+
+        - files (list): Locations of data files.
+
+    Kwargs:
+
+        - entries (dict): Mapping from meta data name to location in file (default headerEntries).
+
+        - workers (int): Number of threads reading files (default 8).
+
+        - indexFile (string): Location of index file. If None no index is used (default None).
+
+    Returns:
+
+        - metadata (list): Meta data dictionary for each file or None if file could not be read.
+
+    """
+    if entries is None:
+        entries = headerEntries
+    if isinstance(files,str):
+        files = [files]
+
+    index = {}
+    if not indexFile is None and os.path.isfile(indexFile):
+        try:
+            with open(indexFile,'rb') as f:
+                index = pickle.load(f)
+        except Exception: # Corrupt index is simply rebuilt
+            index = {}
+
+    def fileKey(file):
+        stat = os.stat(file)
+        return os.path.abspath(file),stat.st_mtime,stat.st_size
+
+    def read(file):
+        try:
+            key = fileKey(file)
+        except OSError:
+            return None,None,False
+        cached = index.get(key[0])
+        if not cached is None and cached[:2] == key[1:] and all([name in cached[2] for name in entries]):
+            return key,cached[2],True
+        try:
+            return key,readHeader(file,entries=entries),False
+        except Exception:
+            return key,None,False
+
+    if workers>1 and len(files)>1:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(read,files))
+    else:
+        results = [read(file) for file in files]
+
+    metadata = []
+    changed = False
+    for key,meta,fromIndex in results:
+        metadata.append(meta)
+        if meta is None or fromIndex:
+            continue
+        index[key[0]] = (key[1],key[2],meta)
+        changed = True
+
+    if not indexFile is None and changed:
+        temporaryFile = indexFile+'.tmp'
+        with open(temporaryFile,'wb') as f:
+            pickle.dump(index,f)
+        os.replace(temporaryFile,indexFile)
+
+    return metadata
+
+
 @_tools.KwargChecker()
 def createEmptyDataFile(A3,A4,Ei,sample,Monitor=50000, A3Off = 0.0, A4Off = 0.0,
                         title='EmptyDataFileTitle', name='EmptyDataFile',
@@ -1676,6 +1794,73 @@ def createEmptyDataFile(A3,A4,Ei,sample,Monitor=50000, A3Off = 0.0, A4Off = 0.0,
 
 
 
+def calculateQHKL(UBINV,A3,A4,Ei,Ef,steps=None):
+    """Calculate Qx, Qy, H, K, L, and energy transfer for all pixels in one pass. Equivalent to TasUBlib.calcTasQH
+    with Qx and Qy extracted and energy transfer calculated, but without intermediate copies of the full data shape.
+
+    Args:
+
+        - UBINV (3x3 array): Inverse of UB matrix
+
+        - A3 (array): Sample rotation in degrees of shape (steps) or (steps,1,1)
+
+        - A4 (array): Scattering angle of pixels in degrees of shape (steps or 1,detectors,bins)
+
+        - Ei (array): Incoming energy in meV of shape (steps or 1)
+
+        - Ef (array): Final energy of pixels in meV of shape (1,detectors,bins)
+
+    Kwargs:
+
+        - steps (int): Number of steps in scan. If None, found from the shape of A3, A4, and Ei (default None)
+
+    Returns:
+
+        - qx, qy, h, k, l, energy (arrays): Arrays of shape (steps,detectors,bins)
+
+    .. note::
+        The length of Q and its angle in the instrument frame only depend on A4, Ei, and Ef. For A3 scans these
+        are thus only calculated once per pixel and each step is reduced to a 2x2 rotation.
+
+    """
+    A4 = np.asarray(A4,dtype=float)
+    A4 = A4.reshape((-1,)+A4.shape[-2:])
+    A3 = np.asarray(A3,dtype=float).reshape(-1,1,1)
+    Ei = np.asarray(Ei,dtype=float).reshape(-1,1,1)
+    Ef = np.asarray(Ef,dtype=float).reshape((1,)+A4.shape[-2:])
+    if steps is None:
+        steps = np.max([A3.shape[0],A4.shape[0],Ei.shape[0]])
+    shape = (steps,)+A4.shape[-2:]
+
+    # Instrument frame, i.e. before sample rotation. Shape (1,detectors,bins) unless A4 or Ei is scanned
+    ki = np.sqrt(Ei)*factorsqrtEK
+    kf = np.sqrt(Ef)*factorsqrtEK
+    q = np.sqrt(ki**2+kf**2-2.0*ki*kf*cosd(A4))
+    phi = np.deg2rad(np.sign(A4)*TasUBlib.calcTheta(ki,kf,np.abs(A4)))
+    a = q*np.cos(phi)
+    b = q*np.sin(phi)
+
+    cosA3 = cosd(A3)
+    sinA3 = sind(A3)
+
+    qx,qy,h,k,l,energy,temp = [np.empty(shape) for _ in range(7)]
+    # Rotate by A3: qx = q*cos(A3-phi), qy = -q*sin(A3-phi)
+    np.multiply(cosA3,a,out=qx)
+    np.multiply(sinA3,b,out=temp)
+    qx+=temp
+    np.multiply(cosA3,b,out=qy)
+    np.multiply(sinA3,a,out=temp)
+    qy-=temp
+
+    # Qz is zero, thus only first two columns of UBINV contribute
+    for out,row in zip([h,k,l],UBINV):
+        np.multiply(qx,row[0],out=out)
+        np.multiply(qy,row[1],out=temp)
+        out+=temp
+
+    np.subtract(Ei,Ef,out=energy)
+    return qx,qy,h,k,l,energy
+
 def getNX_class(x,y,attribute):
     try:
         variableType = y.attrs['NX_class']
@@ -8,6 +8,7 @@ import datetime
 import h5py as hdf
 import numpy as np
 import pickle as pickle
+import copy
 import matplotlib.pyplot as plt
 from matplotlib.collections import PatchCollection,PolyCollection
 import matplotlib.ticker as ticker
@@ -17,31 +18,24 @@ from MJOLNIR.Data import Mask
 import MJOLNIR.Data.DataFile
 import MJOLNIR.Data.Sample
 from MJOLNIR import _tools
-from mpl_toolkits.axisartist.grid_helper_curvelinear import \
-    GridHelperCurveLinear
-from mpl_toolkits.axisartist import SubplotHost
 import pandas as pd
-import pytest
-from scipy.ndimage import filters
-import scipy.optimize
-from scipy.spatial import Voronoi,ConvexHull,KDTree
-from shapely.geometry import Polygon as PolygonS
-from shapely.geometry import Point as PointS
-from shapely.vectorized import contains
 import time
-from . import Viewer3DPyQtGraph
-from pyqtgraph.Qt import QtCore, QtGui, QtWidgets
+import collections
+import concurrent.futures
+import hashlib
 import warnings
-from ufit import Dataset
+# Qt, pyqtgraph, ufit, shapely and scipy.spatial are only imported when the features needing them are used to keep import of the module fast
 
 pythonVersion = sys.version_info[0]
 
 _cache = []
 
+precisionAttributes = ['qx','qy','h','k','l','energy','Norm'] # Attributes of converted files stored in DataSet precision
+
 class DataSet(object):
     @_tools.KwargChecker(include=['Author']) 
     def __init__(self, dataFiles=None, normalizationfiles=None, 
-                 calibrationfiles=None, convertedFiles=None, **kwargs):
+                 calibrationfiles=None, convertedFiles=None, precision='float64', **kwargs):
         """DataSet object to hold all informations about data.
         
         Kwargs:
@@ -54,14 +48,26 @@ class DataSet(object):
 
             - convertedFiles (string, DataFile or list of strings): Location of converted data files (default None).
 
+            - precision (str): Working precision of converted positions (qx, qy, h, k, l, energy) and normalization, either 'float64' or 'float32' (default 'float64').
+
         Raises:
 
             - ValueError
             
             - NotImplementedError
+
+        .. note::
+            With precision 'float32' the memory used by converted data is halved. Intensities and monitors are
+            kept as integers and all binning is accumulated in double precision. Compared to 'float64', the
+            position of points only differs on the 1e-7 relative level, i.e. points lying within this distance
+            of a bin edge may end up in the neighbouring bin. The data set works on its own copies of the converted
+            files, such that the provided DataFile objects keep their precision. Changing the precision from 'float32' 
+            to 'float64' afterwards does not recover the digits lost; reload the data to work in full double precision.
         
         """
         
+        self._precision = np.dtype(np.float64)
+        self.precision = precision
         self._dataFiles = []
         self._normalizationfiles = []
         self._convertedFiles = []
@@ -119,6 +125,23 @@ class DataSet(object):
             raise
 
 
+    @property
+    def precision(self):
+        return self._precision.name
+
+    @precision.setter
+    def precision(self,precision):
+        try:
+            dtype = np.dtype(precision)
+        except TypeError:
+            dtype = None
+        if precision is None or dtype is None or not dtype in [np.dtype(np.float32),np.dtype(np.float64)]:
+            raise AttributeError('Precision must be either "float32" or "float64", received "{}".'.format(precision))
+        changed = dtype != self._precision
+        self._precision = dtype
+        if changed and hasattr(self,'_convertedFiles') and len(self.convertedFiles)!=0:
+            self._getData()
+
     @property
     def normalizationfiles(self):
         return self._normalizationfiles
@@ -190,7 +213,6 @@ class DataSet(object):
             elif hasattr(self,'_maskingObject'): # not masking object but self has one, delete it
                 del self._maskingObject
             masksum = np.sum([np.sum(x) for x  in mask])
-            self.maskIndices = np.cumsum([np.sum(1-M) for M in mask])[:-1]
 
         elif isinstance(mask,Mask.MaskingObject):
             self._maskingObject = mask
@@ -204,7 +226,6 @@ class DataSet(object):
             if hasattr(self,'_maskingObject'): # not masking object but self has one, delete it
                 del self._maskingObject
             masksum = np.sum(mask)
-            self.maskIndices = np.cumsum([np.sum(1-M) for M in mask])[:-1]
         if masksum==0:
             pass#warnings.warn('Provided mask has no masked elements!')
         elif masksum==self.I.size:
@@ -214,7 +235,87 @@ class DataSet(object):
             if hasattr(val,'extractData'):
                 val.mask = mask
 
-        self.maskIndices = np.cumsum([np.sum(1-M) for M in mask])[:-1]
+        self._unmaskedCounts = np.array([np.size(M)-np.count_nonzero(M) for M in mask])
+        self.maskIndices = np.cumsum(self._unmaskedCounts)[:-1]
+
+    def addMask(self,mask,files=None):
+        """Extend current mask with additional masked points. Only the data files and points masked by the new mask are updated.
+
+        Args:
+
+            - mask (MaskingObject or list of boolean arrays): Mask to be added (logical or) to the current mask. Adding boolean arrays removes the masking objects of the data set and of the affected data files, as for DataSet.mask.
+
+        Kwargs:
+
+            - files (list of int): Indices of data files to which the mask is added (default None, all files)
+
+        Returns:
+
+            - changed (list of int): Indices of data files for which the mask changed
+
+        """
+        if not isinstance(self._mask,(list,np.ndarray)) or len(self._mask)!=len(self):
+            raise AttributeError('DataSet has no mask to be added to. Set DataSet.mask before adding to it.')
+
+        if files is None:
+            files = range(len(self))
+        else:
+            files = np.asarray(files,dtype=int).flatten()
+        
+        isMaskingObject = isinstance(mask,Mask.MaskingObject)
+        if not isMaskingObject and len(mask)!=len(self):
+            raise AttributeError('Provided number of masks ({}) does not match number of data files ({})'.format(len(mask),len(self)))
+
+        marrays = [val for val in self.__dict__.values() if hasattr(val,'extractData')]
+        changedFiles = []
+        for i in files:
+            df = self[i]
+            currentMask = self._mask[i]
+            if isMaskingObject:
+                newMask = mask(df)
+            else:
+                newMask = mask[i]
+            
+            if not isinstance(currentMask,np.ndarray) or currentMask.shape != np.shape(df.I):
+                currentMask = np.array(np.broadcast_to(currentMask,np.shape(df.I)),dtype=bool)
+                self._mask[i] = currentMask
+                df._mask = currentMask
+                for val in marrays:
+                    val[i].mask = currentMask
+            
+            changed = np.logical_and(np.asarray(newMask,dtype=bool).reshape(currentMask.shape),np.logical_not(currentMask))
+            if not np.any(changed):
+                continue
+            
+            # Only points changed are updated in mask of data file and in all masked arrays
+            currentMask[changed] = True
+            for val in marrays:
+                if val[i].shape == currentMask.shape:
+                    val[i][changed] = np.ma.masked
+                else:
+                    val[i].mask = np.all(currentMask)
+            self._unmaskedCounts[i]-=np.count_nonzero(changed)
+            changedFiles.append(i)
+
+        if isMaskingObject and hasattr(self,'_maskingObject'):
+            if isinstance(self._maskingObject,list) or len(files)!=len(self):
+                maskingObjects = self._maskingObject if isinstance(self._maskingObject,list) else [self._maskingObject]*len(self)
+                self._maskingObject = [m+mask if i in files else m for i,m in enumerate(maskingObjects)]
+            else:
+                self._maskingObject = self._maskingObject+mask
+            for i in files:
+                if hasattr(self[i],'_maskingObject'):
+                    self[i]._maskingObject = self[i]._maskingObject+mask
+        elif not isMaskingObject: # Boolean masks cannot be added to masking objects, which thus no longer describe the mask
+            if hasattr(self,'_maskingObject'):
+                del self._maskingObject
+            for i in files:
+                if hasattr(self[i],'_maskingObject'):
+                    del self[i]._maskingObject
+        
+        if len(changedFiles)>0:
+            self.maskIndices = np.cumsum(self._unmaskedCounts)[:-1]
+        return changedFiles
 
     @property
     def settings(self):
@@ -372,9 +473,19 @@ class DataSet(object):
         self.convertedFiles = convertedFiles    
         self._getData()
             
+    @_tools.ProfileSpan()
     def _getData(self): # Internal method to populate I,qx,qy,energy,Norm and Monitor
         
         if len(self.convertedFiles)!=0:
+            precision = getattr(self,'_precision',np.dtype(np.float64)) # Data sets saved before precision was introduced
+            for i,d in enumerate(self.convertedFiles): # Cast to working precision
+                attributes = [attr for attr in precisionAttributes if hasattr(d,attr) and np.asarray(getattr(d,attr)).dtype != precision]
+                if len(attributes)==0:
+                    continue
+                d = copy.copy(d) # Data files provided by the user are left untouched, only the data set holds the recast arrays
+                for attr in attributes:
+                    setattr(d,attr,np.asarray(getattr(d,attr)).astype(precision))
+                self._convertedFiles[i] = d
             self.I,self.qx,self.qy,self.energy,self.Norm,self.Monitor,self.a3,self.a3Off,self.a4,self.a4Off,self.instrumentCalibrationEf, \
             self.instrumentCalibrationA4,self.instrumentCalibrationEdges,self.Ei,self.scanParameters,\
             self.scanParameterValues,self.scanParameterUnits,self.h,self.k,self.l,self.mask = MJOLNIR.Data.DataFile.extractData(self.convertedFiles)
@@ -388,6 +499,7 @@ class DataSet(object):
         elif len(self.dataFiles)!=0:
             self.sample = [d.sample for d in self]
 
+    @_tools.ProfileSpan()
     @_tools.KwargChecker()
     def binData3D(self,dx,dy,dz,rlu=True,dataFiles=None):
         """Bin a converted data file into voxels with sizes dx*dy*dz. Wrapper for the binData3D functionality.
@@ -441,6 +553,7 @@ class DataSet(object):
 
         return returnData,bins
 
+    @_tools.ProfileSpan()
     @_tools.KwargChecker()
     def cut1D(self,q1,q2,width,minPixel,Emin,Emax,rlu=True,plotCoverage=False,extend=True,dataFiles=None,constantBins=False,positions=None,I=None,Norm=None,Monitor=None,ufit=False):
         """Wrapper for 1D cut through constant energy plane from q1 to q2 function returning binned intensity, monitor, normalization and normcount. The full width of the line is width while height is given by Emin and Emax. 
@@ -553,23 +666,22 @@ class DataSet(object):
         I,Mon,Norm,BinC = Data
         DataValues = [Qx,Qy,H,K,L,Energy,I,Mon,Norm,BinC]
         columns = ['Qx','Qy','H','K','L','Energy','Intensity','Monitor','Normalization','BinCount']
-        dtypes = [np.float]*6+[np.int]*2+[np.float]+[np.int]
+        dtypes = [float]*6+[int]*2+[float]+[int]
 
-        pdData = pd.DataFrame()
+        cutResult = CutResult()
         if not len(I) == 0:
             for dat,col,typ in zip(DataValues,columns,dtypes):
-                pdData[col] = dat.astype(typ)
-            pdData['Int'] = pdData['Intensity']*pdData['BinCount']/(pdData['Normalization']*pdData['Monitor'])
+                cutResult[col] = np.asarray(dat).flatten().astype(typ)
+            cutResult['Int'] = _normalizedIntensity(cutResult)
 
-        
         if not ufit:
-            return pdData,[binpositionsTotal,orthopos,EArray]
+            return cutResult.to_pandas(),[binpositionsTotal,orthopos,EArray]
         
         if rlu:
             q1,q2 = self.convertToHKL([q1,q2])
-        ufitData = self.generateUFitDataset(pdData,q1,q2,rlu,width=width,Emin=Emin,Emax=Emax,minPixel=minPixel)
+        cutResult.metadata['ufit'] = dict(meta=self._ufitMeta(),q1=q1,q2=q2,rlu=rlu,width=width,Emin=Emin,Emax=Emax,minPixel=minPixel)
         
-        return ufitData
+        return cutResult.to_ufit()
 
         
     
@@ -720,6 +832,7 @@ class DataSet(object):
         return ax,Data,bins
 
 
+    @_tools.ProfileSpan()
     @_tools.KwargChecker()
     def cutQE(self,q1,q2,width,minPixel,EnergyBins,rlu=True,extend=True,dataFiles=None,constantBins=False):
         """Wrapper for cut data into maps of q and intensity between two q points and given energies. This is performed by doing consecutive constant energy planes.
@@ -760,6 +873,21 @@ class DataSet(object):
 
         """
     
+        positions,I,Norm,Monitor = self._extractCutData(rlu=rlu,dataFiles=dataFiles)
+        if rlu==True: # Recalculate H,K,L to qx
+            q1,q2 = self.convertToQxQy([q1,q2])
+
+        if np.all(np.isclose(q1,q2)):
+            raise AttributeError('Provided Q points are equal. Got ({}) and ({}).'.format(', '.join([str(x) for x in q1]),', '.join([str(x) for x in q2])))
+
+        Data,Bins = cutQE(positions=positions,I=I,Norm=Norm,Monitor=Monitor,q1=q1,q2=q2,width=width,minPixel=minPixel,
+                          EnergyBins=EnergyBins,extend=extend,constantBins=constantBins)
+
+        cutResult,returnpositions,centerPos,binDistance = self._cutQEResult(Data,Bins,q1,q2)
+        return cutResult.to_pandas(),returnpositions,centerPos,binDistance
+
+    def _extractCutData(self,rlu=True,dataFiles=None):
+        """Extract unmasked positions, intensity, normalization and monitor used for cutting. In RLU mode, the Qx and Qy of all data files are rotated into the frame of the first data file."""
         if dataFiles is None:
             if len(self.convertedFiles)==0:
                 raise AttributeError('No data file to be binned provided in either input or DataSet object.')
@@ -778,58 +906,63 @@ class DataSet(object):
             DS = DataSet(convertedFiles = dataFiles)
             I,qx,qy,energy,Norm,Monitor,samples,maskIndices = DS.I.extractData(),DS.qx.extractData(),DS.qy.extractData(),DS.energy.extractData(),DS.Norm.extractData(),DS.Monitor.extractData(),DS.sample,DS.maskIndices
         
-        
-        if rlu==True: # Recalculate H,K,L to qx
-            q1,q2 = self.convertToQxQy([q1,q2])
+        if rlu==True: 
             # Rotate all data files to fit with first data file
-            #thetaDifference = [s.theta-samples[0].theta for s in samples]
-            rotationMatrices = [np.dot(samples[0].RotMat.T,s.RotMat) for s in samples]#[_tools.Rot(theta,deg=False) for theta in thetaDifference]
+            rotationMatrices = [np.dot(samples[0].RotMat.T,s.RotMat) for s in samples]
             Q = [[QX,QY] for QX,QY in zip(np.split(qx,maskIndices),np.split(qy,maskIndices))]
             qx,qy = np.concatenate([np.einsum('ij,j...->i...',rot,q) for rot,q in zip(rotationMatrices,Q)],axis=1)
-            positions = np.array([qx,qy,energy])
-                
-        else:
-            positions = np.array([qx,qy,energy])
+        
+        positions = np.array([qx,qy,energy])
+        return positions,I,Norm,Monitor
 
-        intensityArray = []
-        monitorArray = []
-        normalizationArray = []
-        normcountArray = []
-        centerPos = []
+    def _cutQEResult(self,Data,Bins,q1,q2):
+        """Collect the output of the cutQE engine into a CutResult together with bin positions, bin centres and distances to q1."""
         returnpositions = []
+        centerPos = []
         binDistance = []
 
         dirvec = (np.array(q2) - np.array(q1)).astype(float)
         dirvec /= np.linalg.norm(dirvec)
 
-        dataFrame = []
-        for i in np.arange(len(EnergyBins)-1):
-
-            _local,position = self.cut1D(positions=positions,I=I,Norm=Norm,Monitor=Monitor,q1=q1,q2=q2,
-                                    width=width,minPixel=minPixel,Emin=EnergyBins[i],Emax=EnergyBins[i+1],
-                                    plotCoverage=False,extend=extend,constantBins=constantBins,dataFiles=dataFiles,rlu=False)                                      
-
-            _local['energyCut'] = i
-            dataFrame.append(_local)
-
-            if len(_local)==0:
-                continue
+        cutIndices = [i for i,data in enumerate(Data) if len(data[0])>0]
+        binEdges = []
+        for i in cutIndices:
+            position = Bins[i]
             returnpositions.append(position)
-
+            binEdges.append(position[0])
 
             thisCenterPos = 0.5*(position[0][:-1]+position[0][1:])
             centerPos.append(thisCenterPos)
             thisBinDistance = np.dot(thisCenterPos[:,:len(q1)] - q1, dirvec)
             binDistance.append(thisBinDistance)
-        if len(dataFrame)>1:
-            dataFrame = pd.concat(dataFrame)
-        elif len(dataFrame) == 1:
-            dataFrame = dataFrame[0]
-        
-        for col in ['Intensity','Monitor','Normalization','BinCount']:
-            dataFrame[col] = dataFrame[col].astype(int)
 
-        return dataFrame,returnpositions,centerPos,binDistance
+        # All cuts are collected in one cut result allocated once
+        binCounts = np.array([len(Data[i][0]) for i in cutIndices],dtype=int)
+        columns = ['Qx','Qy','H','K','L','Energy','Intensity','Monitor','Normalization','BinCount']
+        if len(cutIndices)>0:
+            binEdges = np.concatenate(binEdges)
+            positionEdges = np.concatenate([binEdges[:,:2],self.convertToHKL(binEdges[:,:2]),binEdges[:,-1].reshape(-1,1)],axis=1)
+            # Bin centres are found between consecutive edges not crossing from one cut to the next
+            notBoundary = np.ones(len(binEdges)-1,dtype=bool)
+            notBoundary[np.cumsum(binCounts+1)[:-1]-1] = False
+            centres = (0.5*(positionEdges[:-1]+positionEdges[1:]))[notBoundary]
+            intensity,MonitorCount,Normalization,normcounts = [np.concatenate([Data[i][j] for i in cutIndices]) for j in range(4)]
+        else:
+            centres = np.zeros((0,6))
+            intensity = MonitorCount = Normalization = normcounts = np.zeros(0)
+
+        cutResult = CutResult(index=np.concatenate([np.arange(n) for n in binCounts]) if len(binCounts)>0 else np.zeros(0,dtype=int))
+        for col,values in zip(columns[:6],centres.T):
+            cutResult[col] = values
+        cutResult['Intensity'] = intensity.astype(int)
+        cutResult['Monitor'] = MonitorCount.astype(int)
+        cutResult['Normalization'] = Normalization.astype(float)
+        cutResult['BinCount'] = normcounts.astype(int)
+        cutResult['Int'] = _normalizedIntensity(cutResult)
+        cutResult['energyCut'] = np.repeat(np.array(cutIndices,dtype=int),binCounts)
+        cutResult['Normalization'] = cutResult['Normalization'].astype(int)
+
+        return cutResult,returnpositions,centerPos,binDistance
 
  
     
@@ -912,8 +1045,9 @@ class DataSet(object):
         #                minPixel=minPixel,EnergyBins=EnergyBins,rlu=rlu,ax = ax,constantBins=constantBins,**kwargs)
         return self.plotCutQELine(QPoints=[q1,q2],width=width,minPixel=minPixel,EnergyBins=EnergyBins,rlu=rlu,ax=ax,dataFiles=dataFiles,constantBins=constantBins,**kwargs)
     
+    @_tools.ProfileSpan()
     @_tools.KwargChecker()
-    def cutPowder(self,EBinEdges,qMinBin=0.01,dataFiles=None,constantBins=False):
+    def cutPowder(self,EBinEdges,qMinBin=0.01,dataFiles=None,constantBins=False,commonBins=False):
         """Cut data powder map with intensity as function of the length of q and energy. 
 
         Args:
@@ -928,6 +1062,8 @@ class DataSet(object):
 
             - constantBins (bool): If True only bins of size minPixel is used (default False)
 
+            - commonBins (bool): If True the same |q| bins are used for all energies, otherwise the binning is found for each energy (default False)
+
 
         Returns:
             
@@ -954,11 +1090,11 @@ class DataSet(object):
         positions = np.array([qx,qy,energy])
 
         return cutPowder(positions=positions,I=I,Norm=Norm,Monitor=Monitor,
-                        EBinEdges=EBinEdges,qMinBin=qMinBin,constantBins=constantBins)
+                        EBinEdges=EBinEdges,qMinBin=qMinBin,constantBins=constantBins,commonBins=commonBins)
 
     
     @_tools.KwargChecker(function=plt.pcolormesh,include=np.concatenate([_tools.MPLKwargs,['vmin','vmax','edgecolors']]))
-    def plotCutPowder(self,EBinEdges,qMinBin=0.01,ax=None,dataFiles=None,constantBins=False,log=False,colorbar=True,outputFunction=print,**kwargs):
+    def plotCutPowder(self,EBinEdges,qMinBin=0.01,ax=None,dataFiles=None,constantBins=False,commonBins=False,log=False,colorbar=True,outputFunction=print,**kwargs):
         """Plotting wrapper for the cutPowder method. Generates a 2D plot of powder map with intensity as function of the length of q and energy.  
         
         .. note::
@@ -978,6 +1114,8 @@ class DataSet(object):
 
             - constantBins (bool): If True only bins of size minPixel is used (default False)
 
+            - commonBins (bool): If True the same |q| bins are used for all energies (default False)
+
             - log (bool): If true, logarithm to intensity is plotted (default False)
 
             - colorbar (bool): If True a colorbar is added to the figure (default True)
@@ -996,7 +1134,7 @@ class DataSet(object):
 
         """
 
-        Data,qbins = self.cutPowder(EBinEdges=EBinEdges,qMinBin=qMinBin,dataFiles=dataFiles,constantBins=constantBins)
+        Data,qbins = self.cutPowder(EBinEdges=EBinEdges,qMinBin=qMinBin,dataFiles=dataFiles,constantBins=constantBins,commonBins=commonBins)
         
         if ax is None:
             plt.figure()
@@ -1091,7 +1229,7 @@ class DataSet(object):
         raise RuntimeError('This code is not meant to be run but rather is to be overwritten by decorator. Something is wrong!! Should run {}'.format(RLUAxes.createQEAxes))
     
     #@_tools.KwargChecker(function=plt.pcolormesh,include=['vmin','vmax','colorbar','zorder'])
-    def plotQPlane(self,EMin=None,EMax=None,EBins=None,binning='xy',xBinTolerance=0.05,yBinTolerance=0.05,enlargen=False,log=False,ax=None,rlu=True,dataFiles=None,xScale=1.0,yScale=1.0,outputFunction=print,**kwargs):
+    def plotQPlane(self,EMin=None,EMax=None,EBins=None,binning='xy',xBinTolerance=0.05,yBinTolerance=0.05,enlargen=False,log=False,ax=None,rlu=True,dataFiles=None,xScale=1.0,yScale=1.0,outputFunction=print,workers=1,**kwargs):
         """Wrapper for plotting tool to show binned intensities in the Q plane between provided energies.
             
         Kwargs:
@@ -1102,11 +1240,11 @@ class DataSet(object):
 
             - EBins (list): List of energy bins (Default None).
 
-            - binning (str): Binning scheme, either 'xy' or 'polar' (default 'xy').
+            - binning (str): Binning scheme, either 'xy', 'polar', or 'hkl' (default 'xy'). For 'hkl' data is binned on a rectilinear grid along the projection vectors of the sample and rlu is to be True.
             
-            - xBinTolerance (float): bin sizes along x direction (default 0.05). If enlargen is true, this is the minimum bin size.
+            - xBinTolerance (float): bin sizes along x direction (default 0.05). If enlargen is true, this is the minimum bin size. For 'hkl' binning in RLU along first projection vector.
 
-            - yBinTolerance (float): bin sizes along y direction (default 0.05). If enlargen is true, this is the minimum bin size.
+            - yBinTolerance (float): bin sizes along y direction (default 0.05). If enlargen is true, this is the minimum bin size. For 'hkl' binning in RLU along second projection vector.
             
             - enlargen (bool): If the bin sizes should be adaptive (default False). If set true, bin tolerances are used as minimum bin sizes.
 
@@ -1127,6 +1265,8 @@ class DataSet(object):
             - zorder (int): If provided decides the z ordering of plot (default 10)
 
             - outputFunction (function): Function called on output string (default print)
+
+            - workers (int): Number of threads used to bin the energy slices in parallel (default 1)
             
             - other: Other key word arguments are passed to the pcolormesh plotting algorithm.
             
@@ -1140,6 +1280,9 @@ class DataSet(object):
             
         .. note::
             The axes object has a new method denoted 'set_clim' taking two parameters (VMin and VMax) used to change axes colouring.
+
+        .. note::
+            For 'hkl' binning, the bin edges along the projection vectors in RLU are stored in the attribute 'projectionBins' of the axes as [xBins,yBins] for each plane.
             
         .. note::
             If a 3D matplotlib axis is provided, the planes are plotted in 3D with the provided energy bins. As the method 
@@ -1160,6 +1303,9 @@ class DataSet(object):
                 raise AttributeError('Provided limits are either wrong or the same. Received EMin={} and EMax={}, expects EMin<EMax.'.format(EMin,EMax))
             EBins = np.array([EMin,EMax])
 
+        if binning == 'hkl' and not rlu: # Bins along the projection vectors only line up with a reciprocal lattice axis
+            raise AttributeError("Binning 'hkl' is only possible with rlu=True.")
+
         if dataFiles is None:
             if len(self.convertedFiles)==0:
                 raise AttributeError('No data file to be binned provided in either input or DataSet object.')
@@ -1175,7 +1321,7 @@ class DataSet(object):
 
         else: 
             DS = DataSet(convertedFiles = dataFiles)
-            I,qx,qy,energy,Norm,Monitor,samples,maskIndices = DS.I,DS.qx,DS.qy,DS.energy,DS.Norm,DS.Monitor,DS.sample,DS.maskIndices
+            I,qx,qy,energy,Norm,Monitor,samples,maskIndices = DS.I.extractData(),DS.qx.extractData(),DS.qy.extractData(),DS.energy.extractData(),DS.Norm.extractData(),DS.Monitor.extractData(),DS.sample,DS.maskIndices
         if ax is None:
             if rlu is True:
                 ax = self.createRLUAxes()
@@ -1202,6 +1348,9 @@ class DataSet(object):
         if rlu == True: # Rotate positions with taslib.misalignment to line up with RLU
             Q = [[QX,QY] for QX,QY in zip(np.split(qx,maskIndices),np.split(qy,maskIndices))]
             qx,qy = np.concatenate([np.einsum('ij,j...->i...',s.RotMat,q) for s,q in zip(samples,Q)],axis=1)
+
+        if binning == 'hkl': # Convert all points once into coordinates along the projection vectors, in which bins are rectilinear
+            qx,qy = samples[0].tr(qx,qy)
             
         if 'zorder' in kwargs:
             zorder = kwargs['zorder']
@@ -1225,65 +1374,41 @@ class DataSet(object):
         offset = [] # Only used for binning in polar
         pmeshs = []
 
-        binnings = ['xy','polar']
+        binnings = ['xy','polar','hkl']
         if not binning in binnings:
             raise AttributeError('The provided binning is not understood, should be {}'.format(', '.join(binnings)))
 
-        for i in range(len(EBins)-1):
-            #print('Binning {} to {}.'.format(EBins[i],EBins[i+1]))
-            EBinEdges = [EBins[i],EBins[i+1]]
-            e_inside = np.logical_and(energy>EBinEdges[0],energy<=EBinEdges[1])
-            if np.sum(e_inside)==0:
-                continue
-            if binning == 'polar':
-                
-                x = np.arctan2(qy[e_inside],qx[e_inside]) # Gives values between -pi and pi
-                bins = 20
-                # Following block checks if measured area corresponds to alpha ~pi as arctan2 only gives
-                # values back in range -pi to pi.
-                if np.max(x.flatten())+xBinTolerance>np.pi and np.min(x.flatten())-xBinTolerance<-np.pi:
-                    h = np.histogram(x.flatten(),bins = bins)
-                    while np.max(h[0]==0) == False:
-                        bins *= 2
-                        h = np.histogram(x.flatten(),bins = bins)
-                        if bins > 200:
-                            break
-                    if bins > 200: # If everything has been covered, do nothing.
-                        offset.append(0.0)
-                    else:
-                        offset.append(2*np.pi-h[1][np.argmax(h[0]==0)]) # Move highest value of lump to fit 2pi
-                        x = np.mod(x+offset[-1],2*np.pi)-np.pi # moves part above 2pi to lower than 2pi and make data fit in range -pi,pi
-                        offset[-1]-=np.pi # As x is moved by pi, so should the offset
-                else:
-                    offset.append(0.0)
+        # Sort energies once such that every energy slice is found by a binary search instead of a full scan
+        energyOrder = np.argsort(energy,kind='stable')
+        sortedEnergy = energy[energyOrder]
+        
+        def binSlice(i):
+            start,stop = np.searchsorted(sortedEnergy,[EBins[i],EBins[i+1]],side='right') # energy>EBins[i] and energy<=EBins[i+1]
+            if stop<=start:
+                return None
+            e_inside = np.sort(energyOrder[start:stop]) # Keep original order of points within slice
+            return binQPlaneSlice(qx[e_inside],qy[e_inside],I[e_inside],Monitor[e_inside],Norm[e_inside],binning='xy' if binning == 'hkl' else binning,
+                                    xBinTolerance=xBinTolerance,yBinTolerance=yBinTolerance,enlargen=enlargen)
+        
+        if workers>1 and len(EBins)>2: # Energy slices are independent and histogramming releases the GIL
+            with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+                slices = list(executor.map(binSlice,range(len(EBins)-1)))
+        else:
+            slices = [binSlice(i) for i in range(len(EBins)-1)]
 
-                y = np.linalg.norm([qx[e_inside],qy[e_inside]],axis=0)  
-                if not enlargen:
-                    xBins.append(np.arange(-np.pi,np.pi+xBinTolerance*0.999,xBinTolerance)) # Add tolerance as to ensure full coverage of parameter
-                    yBins.append(np.arange(0,np.max(y)+yBinTolerance*0.999,yBinTolerance)) # Add tolerance as to ensure full coverage of parameter
-                else:
-                    xBins.append(_tools.binEdges(x,tolrance=xBinTolerance))
-                    yBins.append(_tools.binEdges(y,tolerance=yBinTolerance))
-
-            elif binning == 'xy':
-                x = qx[e_inside]
-                y = qy[e_inside]
-                if not enlargen:
-                    xBins.append(np.arange(np.min(x),np.max(x)+0.999*xBinTolerance,xBinTolerance)) # Add tolerance as to ensure full coverage of parameter
-                    yBins.append(np.arange(np.min(y),np.max(y)+0.999*yBinTolerance,yBinTolerance)) # Add tolerance as to ensure full coverage of parameter
-                else:
-                    xBins.append(_tools.binEdges(x,tolerance=xBinTolerance))
-                    yBins.append(_tools.binEdges(y,tolerance=yBinTolerance))
-            
-            X = x.flatten()
-            Y = y.flatten()
-            
-            intensity.append(np.histogram2d(X,Y,bins=(xBins[i],yBins[i]),weights=I[e_inside])[0].astype(I.dtype))
-            monitorCount.append(np.histogram2d(X,Y,bins=(xBins[i],yBins[i]),weights=Monitor[e_inside])[0].astype(Monitor.dtype))
-            Normalization.append(np.histogram2d(X,Y,bins=(xBins[i],yBins[i]),weights=Norm[e_inside])[0].astype(Norm.dtype))
-            NormCount.append(np.histogram2d(X,Y,bins=(xBins[i],yBins[i]),weights=np.ones_like(I[e_inside]))[0].astype(I.dtype))
-                
-                
+        energyIndices = [] # Index of energy slices containing data
+        for i,result in enumerate(slices):
+            if result is None:
+                continue
+            [intens,monitor,normalization,normCount],[xBin,yBin],off = result
+            energyIndices.append(i)
+            intensity.append(intens)
+            monitorCount.append(monitor)
+            Normalization.append(normalization)
+            NormCount.append(normCount)
+            xBins.append(xBin)
+            yBins.append(yBin)
+            offset.append(off)
 
             warnings.simplefilter('ignore')
             Int.append(np.divide(intensity[-1]*NormCount[-1],monitorCount[-1]*Normalization[-1]))
@@ -1296,6 +1421,14 @@ class DataSet(object):
         elif binning == 'xy':
             Qx =[np.outer(xBins[i],np.ones_like(yBins[i])) for i in range(len(intensity))]
             Qy =[np.outer(np.ones_like(xBins[i]),yBins[i]) for i in range(len(intensity))]
+
+        elif binning == 'hkl': # Corners of the rectilinear RLU bins are converted back to Qx,Qy for plotting
+            Qx,Qy = [],[]
+            for i in range(len(intensity)):
+                qxGrid,qyGrid = samples[0].inv_tr(np.outer(xBins[i],np.ones_like(yBins[i])),np.outer(np.ones_like(xBins[i]),yBins[i]))
+                Qx.append(qxGrid)
+                Qy.append(qyGrid)
+            ax.projectionBins = [[xBin,yBin] for xBin,yBin in zip(xBins,yBins)]
             
         
         if 'vmin' in kwargs:
@@ -1319,14 +1452,14 @@ class DataSet(object):
         if log:
             Int = [np.log10(1e-20+np.array(intens)) for intens in Int]
 
-        for i in range(len(EBins)-1):
+        for i,energyIndex in enumerate(energyIndices):
             if _3D:
                 QX = 0.25*np.array(np.array(Qx[i])[1:,1:]+np.array(Qx[i])[:-1,1:]+np.array(Qx[i])[1:,:-1]+np.array(Qx[i])[:-1,:-1])/xScale
                 QY = 0.25*np.array(np.array(Qy[i])[1:,1:]+np.array(Qy[i])[:-1,1:]+np.array(Qy[i])[1:,:-1]+np.array(Qy[i])[:-1,:-1])/yScale
                 #QY = np.array(np.array(Qy[i])[1:,1:])
                 I = np.array(Int[i])
                 levels = np.linspace(vmin,vmax,50)
-                pmeshs.append(ax.contourf3D(QX,QY,I,zdir = 'z',offset=np.mean(EBins[i:i+2]),levels=levels,cmap=cmap,**kwargs))
+                pmeshs.append(ax.contourf3D(QX,QY,I,zdir = 'z',offset=np.mean(EBins[energyIndex:energyIndex+2]),levels=levels,cmap=cmap,**kwargs))
             else:
                 pmeshs.append(ax.pcolormesh(Qx[i],Qy[i],Int[i],zorder=zorder,cmap=cmap,**kwargs))
         if not _3D:
@@ -1409,7 +1542,7 @@ class DataSet(object):
         return [intensity,monitorCount,Normalization,NormCount],[Qx,Qy],ax
 
     @_tools.KwargChecker()
-    def plotA3A4(self,dataFiles=None,ax=None,planes=[],log=False,returnPatches=False,binningDecimals=3,singleFigure=False,plotTessellation=False,Ei_err = 0.05,temperature_err=0.2,magneticField_err=0.2,electricField_err=0.2):
+    def plotA3A4(self,dataFiles=None,ax=None,planes=[],log=False,returnPatches=False,binningDecimals=3,singleFigure=False,plotTessellation=False,Ei_err = 0.05,temperature_err=0.2,magneticField_err=0.2,electricField_err=0.2,tessellationFile=None):
         """Plot data files together with pixels created around each point in A3-A4 space. Data is binned in the specified planes through their A3 and A4 values. 
         This can result in distorted binning when binning across large energy regions. Data is plotted using the pixels calculated for average plane value, i.e. 
         binning 7,8,9,10, and 11 patches for plane 9 are used for plotting.
@@ -1439,6 +1572,8 @@ class DataSet(object):
             
             - electricField_err (float): Tolerance of electric field for which the values are equal (default = 0.2)
 
+            - tessellationFile (str or bool): Hdf file used to persist the A3-A4 tessellation. If True, MJOLNIRTessellation.h5 next to the data files is used. If None, nothing is written to disk (default None)
+
         Returns:
             
             - ax (matplotlib axis or list of): axis (list of) containing figures for plotted planes.
@@ -1472,7 +1607,7 @@ class DataSet(object):
         
         return plotA3A4(dataFiles,ax=ax,planes=planes,log=log, returnPatches=returnPatches,binningDecimals=binningDecimals,
         singleFigure=singleFigure,plotTessellation=plotTessellation,Ei_err=Ei_err,temperature_err=temperature_err,\
-        magneticField_err=magneticField_err,electricField_err=electricField_err)
+        magneticField_err=magneticField_err,electricField_err=electricField_err,tessellationFile=tessellationFile)
 #
 #    def plotQPatches(self,dataFiles=None,ax=None,planes=[],binningDecimals=3,log=False,returnPatches=False,A4Extend=0.2,A3Extend=0.5,singleFigure=False,plotTessellation=False,Ei_err = 0.05,temperature_err=0.2,magneticField_err=0.2,electricField_err=0.2):
 #        """Plot data files together with pixels created around each point in Q space. 
@@ -1545,6 +1680,7 @@ class DataSet(object):
 #        magneticField_err=magneticField_err,electricField_err=electricField_err)
 
     
+    @_tools.ProfileSpan()
     @_tools.KwargChecker()
     def cutQELine(self,QPoints,EnergyBins,width=0.1,minPixel=0.01,rlu=True,dataFiles=None,constantBins=False):
         """
@@ -1618,34 +1754,51 @@ class DataSet(object):
         if not isinstance(minPixel,(list,np.ndarray)):
             minPixel = np.array([minPixel for _ in range(len(QPoints)-1)]).reshape(len(QPoints)-1)
 
+        positions,I,Norm,Monitor = self._extractCutData(rlu=rlu,dataFiles=dataFiles)
+        if rlu==True:
+            QPoints = np.asarray(self.convertToQxQy(QPoints),dtype=float)
+        else:
+            QPoints = QPoints.astype(float)
+
+        for pStart,pStop in zip(QPoints,QPoints[1:]):
+            if np.all(np.isclose(pStart,pStop)):
+                raise AttributeError('Provided Q points are equal. Got ({}) and ({}).'.format(', '.join([str(x) for x in pStart]),', '.join([str(x) for x in pStop])))
+
+        # All segments are cut from one projection of the data
+        Data,Bins = cutQELine(positions=positions,I=I,Norm=Norm,Monitor=Monitor,QPoints=QPoints,width=width,minPixel=minPixel,
+                              EnergyBins=list(EnergyBins),constantBins=constantBins)
+
         DataList = []
         BinList = []
         centerPosition = []
         binDistance = []
-
-        for cutIndex,[pStart,pStop,w,mP,EB] in enumerate(zip(QPoints,QPoints[1:],width,minPixel,EnergyBins)):
-            _DataList,_BinList,_centerPosition,_binDistance = self.cutQE(q1=pStart,q2=pStop,width=w,minPixel=mP,EnergyBins=EB,rlu=rlu,
-                                                                         dataFiles=dataFiles,extend=False,constantBins=constantBins)
+        for cutIndex,[pStart,pStop,_Data,_Bins] in enumerate(zip(QPoints,QPoints[1:],Data,Bins)):
+            _DataList,_BinList,_centerPosition,_binDistance = self._cutQEResult(_Data,_Bins,pStart,pStop)
             _DataList['qCut']=cutIndex
             DataList.append(_DataList)
-            if rlu:
-                UB2D = self.sample[0].convertHKLINV # Matrix to calculate HKL from Qx,Qy 
-                _BinListUpdated = []
-                _centerPositionUpdated = []
-                for i,[Position,ortho,E] in enumerate(_BinList):
-                    pos = np.array([np.concatenate([np.dot(UB2D,x[:2]),[x[2]]],axis=0) for x in Position])
-                    orthogonal = [np.dot(UB2D,x) for x in ortho]
-                    _BinListUpdated.append([pos,orthogonal,E])
-
-                    cPos = np.array([np.concatenate([np.dot(UB2D,x[:2]),[x[2]]],axis=0) for x in _centerPosition[i]])
-                    _centerPositionUpdated.append(cPos)
-                _BinList = _BinListUpdated
-                _centerPosition = _centerPositionUpdated
             BinList.append(_BinList)
             centerPosition.append(_centerPosition)
             binDistance.append(_binDistance)
-            
-        DataList = pd.concat(DataList)
+
+        if rlu and sum(len(b) for b in BinList)>0:
+            # Convert all bin edges, orthogonal positions and centres to HKL with one matrix multiplication each
+            UB2D = self.sample[0].convertHKLINV # Matrix to calculate HKL from Qx,Qy 
+            edges = [b[0] for _BinList in BinList for b in _BinList]
+            orthogonal = [b[1] for _BinList in BinList for b in _BinList]
+            centres = [c for _centerPosition in centerPosition for c in _centerPosition]
+            
+            def toHKL(arrays):
+                stacked = np.concatenate(arrays)
+                converted = np.concatenate([np.matmul(stacked[:,:2],UB2D.T),stacked[:,2:]],axis=1)
+                return np.split(converted,np.cumsum([len(x) for x in arrays])[:-1])
+            
+            edges = iter(toHKL(edges))
+            orthogonal = iter(toHKL(orthogonal))
+            centres = iter(toHKL(centres))
+            BinList = [[[next(edges),next(orthogonal),E] for _,_,E in _BinList] for _BinList in BinList]
+            centerPosition = [[next(centres) for _ in _centerPosition] for _centerPosition in centerPosition]
+            
+        DataList = CutResult.concatenate(DataList).to_pandas()
         return DataList,np.array(BinList,dtype=object),np.array(centerPosition,dtype=object),np.array(binDistance,dtype=object)
 
     
@@ -2207,6 +2360,7 @@ class DataSet(object):
         return returnData
 
     
+    @_tools.ProfileSpan()
     @_tools.KwargChecker()
     def cut1DE(self,E1,E2,q,rlu=True,width=0.02, minPixel = 0.1, dataFiles = None,constantBins=False,ufit=False):
         """Perform 1D cut through constant Q point returning binned intensity, monitor, normalization and normcount. The width of the cut is given by 
@@ -2276,7 +2430,7 @@ class DataSet(object):
             variables = ['Qx','Qy']
         variables.append('Energy')
         [intensity,MonitorCount,Normalization,normcounts],bins  = cut1DE(positions = positions, I=I, Norm=Norm,Monitor=Monitor,E1=E1,E2=E2,q=Q,width=width,minPixel=minPixel,constantBins=constantBins)
-        data = pd.DataFrame()
+        data = CutResult()
         
 
         HKL = self.convertToHKL(Q.flatten())
@@ -2290,15 +2444,15 @@ class DataSet(object):
         data['Monitor'] = MonitorCount.astype(int)
         data['Normalization'] = Normalization.astype(int)
         data['BinCount'] = normcounts.astype(int)
-        data['binDistance'] = np.linalg.norm(data[variables]-np.array(data[variables].iloc[1]),axis=1)
+        data['binDistance'] = np.linalg.norm(data[variables]-data[variables][1],axis=1)
         
-        data['Int'] = data['Intensity']*data['BinCount']/(data['Normalization']*data['Monitor'])
+        data['Int'] = _normalizedIntensity(data)
         if not ufit:
-            return data,bins
+            return data.to_pandas(),bins
         
-        ufitData = self.generateUFitDataset(data,q1=q,q2=None,rlu=rlu,width=width,minPixel=minPixel,Emin=E1,Emax=E2,QDirection=False)
+        data.metadata['ufit'] = dict(meta=self._ufitMeta(),q1=q,q2=None,rlu=rlu,width=width,minPixel=minPixel,Emin=E1,Emax=E2,QDirection=False)
         
-        return ufitData
+        return data.to_ufit()
 
     @_tools.KwargChecker(function=plt.errorbar,include=np.concatenate([_tools.MPLKwargs,['ticks','tickRound','mfc','markeredgewidth','markersize']])) #Advanced KWargs checker for figures
     def plotCut1DE(self,E1,E2,q,rlu=True,width=0.02, minPixel = 0.1, dataFiles = None,constantBins=False,ax=None,ufit=False,**kwargs):
@@ -2419,13 +2573,9 @@ class DataSet(object):
         if not ufit:
             return ax,Data,bins
         
+        from ufit import Dataset
         # Create meta data for uFit dataset
-        meta = dict()
-        
-        meta['instrument'] = self[0].instrument
-        meta['experiment'] = ', '.join(d.experimentIdentifier for d in self)
-        meta['title'] = self[0].title # TODO: Should be a collection of titles for all files?
-        meta['datafilename'] = ', '.join(d.name for d in self)
+        meta = self._ufitMeta()
         
         dist,Int = np.array(Data[['Energy','Int']]).T
         err = np.sqrt(Data['Intensity'])*Data['BinCount']/(Data['Monitor']*Data['Normalization'])
@@ -2438,6 +2588,7 @@ class DataSet(object):
         return ax,ufitData
 
 
+    @_tools.ProfileSpan()
     def cutELine(self, Q1, Q2, Emin=None, Emax=None, energyWidth = 0.05, minPixel = 0.02, width = 0.02, rlu=True, dataFiles=None, constantBins=False):
         """Perform cut along energy in steps between two Q Point 
         
@@ -2500,35 +2651,15 @@ class DataSet(object):
         Q2 = np.asarray(Q2,dtype=float)
 
         dirvec = Q2-Q1
-        
-        # Copy the original mask to be reapplied later
-        originalMask = DS.mask
-
-        # Cut out relevant part of data set
-        Q1re = Q1.copy().reshape(-1,1,1)
-        
-        if rlu:
-            normal = DS.sample[0].planeNormal
-            normal*=1.0/np.linalg.norm(normal)
-            perp = np.cross(dirvec,normal)/np.linalg.norm(dirvec)
-
-            mask = [np.array([np.logical_or(np.abs(np.einsum('i...,i->...',(A-Q1re),dirvec)-0.5)>0.5,np.abs(np.einsum('i...,i->...',A-Q1re,perp))>width) for A in zip(d.h,d.k,d.l)]) for d in DS]
-        else:
-            perp = dirvec[[1,0]]
-
-            mask = [np.array([np.logical_or(np.abs(np.einsum('i...,i->...',(A-Q1re),dirvec)-0.5)>0.5,np.abs(np.einsum('i...,i->...',A-Q1re,perp))>width) for A in zip(d.qx,d.qy)]) for d in DS]
-
-        # Combine the old mask and new with points close to cut
-        DS.mask = [np.logical_or(mNew,mOld) for mNew,mOld in zip(mask,self.mask)]
 
         # Number of points along the Q cutting direction to reach minPixel
         points = np.linalg.norm(dirvec)/minPixel
 
-        # Find minimum and maximum for newly masked data
+        # Without limits all energies within the cut are used
         if Emin is None:
-            Emin = DS.energy.min()
+            Emin = -np.inf
         if Emax is None:
-            Emax = DS.energy.max()
+            Emax = np.inf
 
         # Points for which constant Q cut in energy is to be performed
         QPoints = np.array([Q1+dirvec*x for x in np.linspace(0.0,1.0,int(np.floor(points)))])
@@ -2541,27 +2672,24 @@ class DataSet(object):
 
             positions = np.array([qx,qy,energy])
             
-            Qs = np.array([DS.convertToQxQy(q) for q in QPoints])
+            Qs = DS.convertToQxQy(QPoints).reshape(-1,2)
         else:
             positions = np.array([qx,qy,energy])
             Qs = QPoints
 
-        
-        Data = []
-        Bins = []
+        # Perform actual binning of all Q points at once
+        binnedData,Bins = cutELine(positions = positions, I=I, Norm=Norm,Monitor=Monitor,QPoints=Qs,width=width,energyWidth=energyWidth,E1=Emin,E2=Emax,constantBins=constantBins)
 
-        # Perform actual binning
-        for i,Q in enumerate(Qs):
-            Q = Q.flatten()
-            [intensity,MonitorCount,Normalization,normcounts],bins  = cut1DE(positions = positions, I=I, Norm=Norm,Monitor=Monitor,E1=Emin,E2=Emax,q=Q,width=width,minPixel=energyWidth,constantBins=constantBins)
-            data = pd.DataFrame()
+        HKL = self.convertToHKL(Qs).reshape(-1,3)
+        Data = []
+        for i,(Q,hkl,[intensity,MonitorCount,Normalization,normcounts],bins) in enumerate(zip(Qs,HKL,binnedData,Bins)):
+            data = CutResult()
             
-            HKL = self.convertToHKL(Q.flatten())
             data['Qx'] = Q[0]*np.ones_like(intensity)
             data['Qy'] = Q[1]*np.ones_like(intensity)
-            data['H'] = HKL[0]*np.ones_like(intensity)
-            data['K'] = HKL[1]*np.ones_like(intensity)
-            data['L'] = HKL[2]*np.ones_like(intensity)
+            data['H'] = hkl[0]*np.ones_like(intensity)
+            data['K'] = hkl[1]*np.ones_like(intensity)
+            data['L'] = hkl[2]*np.ones_like(intensity)
             data['Energy'] = 0.5*(bins[0][1:]+bins[0][:-1])
             data['Intensity'] = intensity.astype(int)
             data['Monitor'] = MonitorCount.astype(int)
@@ -2569,12 +2697,10 @@ class DataSet(object):
             data['BinCount'] = normcounts.astype(int)
             data['QCut'] = i*np.ones_like(intensity).astype(int)
             
-            data['Int'] = data['Intensity']*data['BinCount']/(data['Normalization']*data['Monitor'])
+            data['Int'] = _normalizedIntensity(data)
             Data.append(data)
-            Bins.append(bins)
 
-        Data = pd.concat(Data)
-        DS.mask = originalMask
+        Data = CutResult.concatenate(Data).to_pandas()
 
         return Data,Bins
 
@@ -2739,6 +2865,8 @@ class DataSet(object):
             Data = Intensity
             
         if customSlicer == True:
+            from pyqtgraph.Qt import QtCore, QtGui, QtWidgets
+            from MJOLNIR.Data import Viewer3DPyQtGraph
             
             if QtWidgets.QApplication.instance() is None:
                 _cache.append(QtWidgets.QApplication(sys.argv))
@@ -2976,7 +3104,7 @@ class DataSet(object):
 
         Args:
 
-            - pdData (pandas dataframe): Data generated from 1D cut
+            - pdData (pandas dataframe or CutResult): Data generated from 1D cut
 
             - q1 (array): Start point for cut
 
@@ -2998,81 +3126,17 @@ class DataSet(object):
 
         """
 
-        if rlu:
-            variables = ['H','K','L']
-        else:
-            variables = ['Qx','Qy']
-        variables = variables
-
-        if QDirection:
-            QRounding = int(-np.round(np.log10(minPixel)))
-            ERounding = int(np.round(6/(np.linalg.norm(Emin-Emax))))
-            ERounding = np.max([ERounding,1])
-            QRounding = np.max([QRounding,1])
-
-            dirVec = np.array(q2)-np.array(q1)
-            if rlu:
-                dirVec = _tools.LengthOrder(dirVec)
-            else:
-                dirVec = _tools.Norm2D(dirVec)
-
-            pdData['binDistance'] = np.linalg.norm(pdData[variables]-np.array(pdData[variables].iloc[1]),axis=1)/np.linalg.norm(dirVec)
-
-            startPos = pdData[variables].iloc[0]   
-
-            if rlu:
-                xdirection = _tools.generateLabel(np.round(dirVec,QRounding))[1:-1].split(', ')
-            else:
-                xdirection = _tools.generateLabel(np.round(dirVec,QRounding),labels=['Qx','Qy'])[1:-1].split(', ')
-            xConstantOffset = np.round(startPos,QRounding)
-            xlabel = []
-            for l,val in zip(xdirection,xConstantOffset):
-                if np.isclose(val,0):
-                    xlabel.append(l)
-                elif l=='0':
-                    xlabel.append('{}'.format(val))
-                else:
-                    xlabel.append(l+'{:+}'.format(val))
-
-        else:
-            ERounding = int(-np.round(np.log10(minPixel)))
-            QRounding = int(-np.round(np.log10(width)))
-
-            ERounding = np.max([ERounding,1])
-            QRounding = np.max([QRounding,1])
-            pdData['binDistance'] = pdData['Energy']
-
+        return generateUFitDataset(pdData,meta=self._ufitMeta(),q1=q1,q2=q2,rlu=rlu,width=width,minPixel=minPixel,Emin=Emin,Emax=Emax,QDirection=QDirection)
 
-            xlabel = [str(x) for x in np.array(q1,dtype=float).round(QRounding)]
-
-        
-        x = np.array(pdData['binDistance'])
-
-        # Calcualte mean energy from bins (last return value)
-        Energy = (Emin+Emax)*0.5
-        # Create meta data for uFit dataset
+    def _ufitMeta(self):
+        """Meta data describing the data set for uFit datasets."""
         meta = dict()
 
         meta['instrument'] = self[0].instrument
         meta['experiment'] = ', '.join(d.experimentIdentifier for d in self)
         meta['title'] = self[0].title # TODO: Should be a collection of titles for all files?
         meta['datafilename'] = ', '.join(d.name for d in self)
-
-        Int = np.array(pdData['Int'])
-        err = np.sqrt(pdData['Intensity'])*pdData['BinCount']/(pdData['Monitor']*pdData['Normalization'])
-        data = np.array([x,Int,err]).T
-
-        
-
-        xcol = '\n'.join(xlabel)+'\n'+'{:.3}'.format(np.round(Energy,ERounding))
-        if rlu:
-            xcol+='\n[RLU,meV]'
-        else:
-            xcol+='\n'+r'[$\AA^{-1}$,meV]'
-        ycol = 'Intensity'
-        name = 'Intensity'
-        ufitData = Dataset(meta=meta,data=data,xcol=xcol,ycol=ycol,name=name)
-        return ufitData
+        return meta
 
     def updateSampleParameters(self,unitCell):
         """Update unit cell parameters and corresponding UB matrix
@@ -3107,6 +3171,202 @@ def load(filename):
         fileObject.close()
         return tmp_dict
 
+class CutResult(object):
+    """Lightweight columnar result of a cut. Columns are kept as named NumPy arrays in insertion order together with 
+    meta data describing the cut. Cuts are assembled and concatenated in this form and only converted into a pandas 
+    DataFrame or a uFit Dataset when returned from the public API.
+
+    Kwargs:
+
+        - columns (dict): Dictionary of column name and values (default None)
+
+        - index (array): Row index used when converted to a pandas DataFrame. If None rows are numbered from 0 (default None)
+
+        - metadata: Any keyword is stored in the metadata dictionary. The keyword ufit holds the arguments for generateUFitDataset.
+
+    """
+    def __init__(self,columns=None,index=None,**metadata):
+        self._columns = collections.OrderedDict()
+        if not columns is None:
+            for name,values in columns.items():
+                self[name] = values
+        self.index = index
+        self.metadata = metadata
+
+    def __getitem__(self,name):
+        if isinstance(name,(list,tuple)): # Multiple columns are returned as a 2D array of shape (len,columns)
+            return np.array([self._columns[n] for n in name]).T
+        return self._columns[name]
+
+    def __setitem__(self,name,values):
+        values = np.asarray(values)
+        if values.ndim == 0: # Scalars are broadcasted as for pandas
+            values = np.full(len(self),values)
+        elif len(self._columns)>0 and not name in self._columns and len(values)!=len(self):
+            raise AttributeError('Length of column "{}" ({}) does not match length of cut result ({}).'.format(name,len(values),len(self)))
+        self._columns[name] = values
+
+    def __contains__(self,name):
+        return name in self._columns
+
+    def __iter__(self):
+        return iter(self._columns)
+
+    def __len__(self):
+        if len(self._columns)==0:
+            return 0 if self.index is None else len(self.index)
+        return len(next(iter(self._columns.values())))
+
+    @property
+    def columns(self):
+        return list(self._columns.keys())
+
+    @property
+    def shape(self):
+        return (len(self),len(self._columns))
+
+    def to_pandas(self):
+        """Convert cut result into a pandas DataFrame with the columns in order."""
+        if len(self._columns)==0:
+            return pd.DataFrame(index=self.index)
+        return pd.DataFrame(self._columns,index=self.index,copy=False)
+
+    def to_ufit(self):
+        """Convert cut result into a uFit Dataset using the parameters stored in the ufit meta data."""
+        if not 'ufit' in self.metadata:
+            raise AttributeError('Cut result does not contain the parameters needed to generate a uFit dataset.')
+        return generateUFitDataset(self,**self.metadata['ufit'])
+
+    @classmethod
+    def concatenate(cls,results,**metadata):
+        """Concatenate cut results row wise as pandas.concat. Indices of the results are kept.
+
+        Args:
+
+            - results (list): List of CutResults to be concatenated.
+
+        Kwargs:
+
+            - metadata: Meta data of the combined result.
+
+        """
+        results = [r for r in results if len(r.columns)>0]
+        if len(results)==0:
+            return cls(**metadata)
+        combined = cls(index=np.concatenate([np.arange(len(r)) if r.index is None else np.asarray(r.index) for r in results]),**metadata)
+        for name in results[0].columns:
+            combined._columns[name] = np.concatenate([r[name] for r in results])
+        return combined
+
+    def __repr__(self):
+        return 'CutResult with {} rows and columns {}'.format(len(self),', '.join(self.columns))
+
+
+def generateUFitDataset(pdData,meta,q1,q2,rlu,width,minPixel,Emin,Emax,QDirection=True):
+    """Generate uFitDataset from cut.
+
+    Args:
+
+        - pdData (pandas dataframe or CutResult): Data generated from 1D cut
+
+        - meta (dict): Meta data of the uFit dataset, i.e. instrument, experiment, title and datafilename
+
+        - q1 (array): Start point for cut
+
+        - q2 (array): End point for cut
+
+        - rlu (bool): If in reciprocal lattice unites or not
+
+        - width (float): Width size (used for rounding of labels)
+
+        - minPixel (float): Minimum pixel size (used for rounding of labels)
+
+        - Emin (float): Minimum energy
+         
+        - Emax (float): Maximum energy
+
+    Kwargs:
+
+        - QDirection (bool): If true ufitdata is created along Q, otherwise energy (default True)
+
+    """
+    from ufit import Dataset
+
+    if rlu:
+        variables = ['H','K','L']
+    else:
+        variables = ['Qx','Qy']
+
+    if QDirection:
+        QRounding = int(-np.round(np.log10(minPixel)))
+        ERounding = int(np.round(6/(np.linalg.norm(Emin-Emax))))
+        ERounding = np.max([ERounding,1])
+        QRounding = np.max([QRounding,1])
+
+        dirVec = np.array(q2)-np.array(q1)
+        if rlu:
+            dirVec = _tools.LengthOrder(dirVec)
+        else:
+            dirVec = _tools.Norm2D(dirVec)
+
+        position = np.array([np.asarray(pdData[v]) for v in variables]).T
+        pdData['binDistance'] = np.linalg.norm(position-position[1],axis=1)/np.linalg.norm(dirVec)
+
+        startPos = position[0]
+
+        if rlu:
+            xdirection = _tools.generateLabel(np.round(dirVec,QRounding))[1:-1].split(', ')
+        else:
+            xdirection = _tools.generateLabel(np.round(dirVec,QRounding),labels=['Qx','Qy'])[1:-1].split(', ')
+        xConstantOffset = np.round(startPos,QRounding)
+        xlabel = []
+        for l,val in zip(xdirection,xConstantOffset):
+            if np.isclose(val,0):
+                xlabel.append(l)
+            elif l=='0':
+                xlabel.append('{}'.format(val))
+            else:
+                xlabel.append(l+'{:+}'.format(val))
+
+    else:
+        ERounding = int(-np.round(np.log10(minPixel)))
+        QRounding = int(-np.round(np.log10(width)))
+
+        ERounding = np.max([ERounding,1])
+        QRounding = np.max([QRounding,1])
+        pdData['binDistance'] = pdData['Energy']
+
+
+        xlabel = [str(x) for x in np.array(q1,dtype=float).round(QRounding)]
+
+    
+    x = np.array(pdData['binDistance'])
+
+    # Calcualte mean energy from bins (last return value)
+    Energy = (Emin+Emax)*0.5
+
+    Int = np.array(pdData['Int'])
+    err = np.sqrt(np.asarray(pdData['Intensity']))*np.asarray(pdData['BinCount'])/(np.asarray(pdData['Monitor'])*np.asarray(pdData['Normalization']))
+    data = np.array([x,Int,err]).T
+
+    xcol = '\n'.join(xlabel)+'\n'+'{:.3}'.format(np.round(Energy,ERounding))
+    if rlu:
+        xcol+='\n[RLU,meV]'
+    else:
+        xcol+='\n'+r'[$\AA^{-1}$,meV]'
+    ycol = 'Intensity'
+    name = 'Intensity'
+    ufitData = Dataset(meta=meta,data=data,xcol=xcol,ycol=ycol,name=name)
+    return ufitData
+
+
+def _normalizedIntensity(data):
+    """Normalized intensity Intensity*BinCount/(Normalization*Monitor) of cut data with empty bins giving nan or inf as in pandas."""
+    with np.errstate(divide='ignore',invalid='ignore'):
+        return np.asarray(data['Intensity'])*np.asarray(data['BinCount'])/(np.asarray(data['Normalization'])*np.asarray(data['Monitor']))
+
+
+@_tools.ProfileSpan()
 @_tools.KwargChecker()
 def cut1D(positions,I,Norm,Monitor,q1,q2,width,minPixel,Emin,Emax,plotCoverage=False,extend=True,constantBins=False):
     """Perform 1D cut through constant energy plane from q1 to q2 returning binned intensity, monitor, normalization and normcount. The full width of the line is width while height is given by Emin and Emax. 
@@ -3229,7 +3489,225 @@ def cut1D(positions,I,Norm,Monitor,q1,q2,width,minPixel,Emin,Emax,plotCoverage=F
     return [intensity,MonitorCount,Normalization,normcounts],[binpositionsTotal,orthopos,np.array([Emin,Emax])]
 
 
+@_tools.ProfileSpan()
+@_tools.KwargChecker()
+def cutQE(positions,I,Norm,Monitor,q1,q2,width,minPixel,EnergyBins,extend=True,constantBins=False):
+    """Perform consecutive 1D cuts through constant energy planes from q1 to q2 for all energy bins at once. 
+    All points are projected onto the cut only once and intensity, monitor, normalization and normcount are 
+    accumulated for all (energy, q) bins in one grouped reduction. Results are identical to calling cut1D for each energy bin.
+
+    Args:
+
+        - positions (3 arrays): position in Qx, Qy, and E in flattend arrays.
+
+        - I (array): Flatten intensity array
+
+        - Norm (array): Flatten normalization array
+
+        - Monitor (array): Flatten monitor array
+
+        - q1 (2D array): Start position of cut in format (qx,qy).
+
+        - q2 (2D array): End position of cut in format (qx,qy).
+
+        - width (float): Full width of cut in q-plane.
+
+        - minPixel (float): Minimal size of binning along the cutting direction. Points will be binned if they are closer than minPixel.
+
+        - EnergyBins (list): Bin edges between which the 1D constant energy cuts are performed.
+
+    Kwargs:
+
+        - extend (bool): Whether or not the cut from q1 to q2 is to be extended throughout the data (default true)
+
+        - constantBins (bool): If True only bins of size minPixel is used (default False)
+
+    Returns:
+
+        - Data list (n * 4 arrays): For each energy bin intensity, monitor count, normalization and normalization counts binned in the 1D cut.
+
+        - Bin list (n * 3 arrays): For each energy bin, bin edge positions in plane of size (m+1,3), orthogonal positions of bin edges in plane of size (2,2), and energy edges of size (2).
+
+    """
+    q1 = np.asarray(q1,dtype=float)
+    dirvec = np.array(q2,dtype=float)-q1
+    dirLength = np.linalg.norm(dirvec)
+    dirvec/=dirLength
+    orthovec=np.array([dirvec[1],-dirvec[0]])
+    
+    # Project all points onto the cut once
+    ProjectMatrix = np.array([dirvec,orthovec])
+    propos = np.dot(ProjectMatrix,positions[:2]-q1.reshape(2,1))
+
+    return _binProjectedQE(propos,positions[2],I,Norm,Monitor,q1,dirvec,dirLength,width,minPixel,EnergyBins,extend=extend,constantBins=constantBins)
+
+
+def _binProjectedQE(propos,energy,I,Norm,Monitor,q1,dirvec,dirLength,width,minPixel,EnergyBins,extend=True,constantBins=False):
+    """Bin points already projected onto a cut (along and orthogonal to dirvec relative to q1) into all energy bins. Used by cutQE and cutQELine."""
+    orthovec=np.array([dirvec[1],-dirvec[0]])
+    EnergyBins = np.asarray(EnergyBins,dtype=float).flatten()
 
+    orthobins = [-width/2.0,width/2.0]
+    orthopos = np.outer(orthobins,orthovec)
+    # Points are binned in orthogonal direction including edges as for np.histogramdd
+    insideOrtho = np.logical_and(propos[1]>=orthobins[0],propos[1]<=orthobins[1])
+    insideWidth = np.logical_and(propos[1]<orthobins[1],propos[1]>orthobins[0])
+    if extend==False: # Only take points between the given q points
+        if constantBins==False:
+            insideQ = np.logical_and(propos[0]>-0.05,propos[0]<dirLength*1.05)
+        else:
+            insideQ = np.logical_and(propos[0]>0.0,propos[0]<dirLength)
+        insideOrtho = np.logical_and(insideOrtho,insideQ)
+        insideWidth = np.logical_and(insideWidth,insideQ)
+
+    # Only points close to the cut are sorted by energy, from which every energy bin is found by a binary search. 
+    # Energy limits are inclusive, i.e. points on an edge between two energy bins are used in both.
+    candidates = np.where(insideOrtho)[0]
+    order = candidates[np.argsort(energy[candidates],kind='stable')]
+    sortedEnergy = energy[order]
+
+    Data = []
+    Bins = []
+    pointIndices = []
+    binIndices = []
+    binOffset = 0
+    binRanges = []
+    for Emin,Emax in zip(EnergyBins[:-1],EnergyBins[1:]):
+        start = np.searchsorted(sortedEnergy,Emin,side='left')
+        stop = np.searchsorted(sortedEnergy,Emax,side='right')
+        index = np.sort(order[start:stop]) # Keep original order of points
+        along = propos[0][index]
+        
+        insideBins = along[insideWidth[index]]
+        if constantBins==False:
+            lenbins = np.array(_tools.binEdges(insideBins,minPixel,startPoint=0.0,endPoint=dirLength))
+        else:
+            if len(insideBins)==0:
+                lenbins = np.array([])
+            else:
+                Min,Max = _tools.minMax(insideBins)
+                lenbins = np.arange(Min,Max+0.5*minPixel,minPixel)
+        
+        if len(lenbins)==0:
+            Bins.append([np.array([]),orthopos,[Emin,Emax]])
+            binRanges.append(None)
+            continue
+        
+        binpositions = np.outer(lenbins,dirvec)+q1
+        EmeanVec = np.ones((len(binpositions),1))*(Emin+Emax)*0.5
+        Bins.append([np.concatenate((binpositions,EmeanVec),axis=1),orthopos,np.array([Emin,Emax])])
+        
+        binCount = max(len(lenbins)-1,0)
+        local = np.searchsorted(lenbins,along,side='right')-1
+        local[along==lenbins[-1]] = binCount-1 # Last bin is closed as in np.histogramdd
+        valid = np.logical_and(local>=0,local<binCount)
+        pointIndices.append(index[valid])
+        binIndices.append(local[valid]+binOffset)
+        binRanges.append((binOffset,binOffset+binCount))
+        binOffset+=binCount
+
+    if len(pointIndices)>0:
+        pointIndices = np.concatenate(pointIndices)
+        binIndices = np.concatenate(binIndices)
+    else:
+        pointIndices = binIndices = np.array([],dtype=int)
+
+    normcounts = np.bincount(binIndices,minlength=binOffset).astype(float)
+    intensity = np.bincount(binIndices,weights=I[pointIndices].flatten(),minlength=binOffset)
+    MonitorCount = np.bincount(binIndices,weights=Monitor[pointIndices].flatten(),minlength=binOffset)
+    Normalization = np.bincount(binIndices,weights=Norm[pointIndices].flatten().astype(accumulationDtype(Norm.dtype)),minlength=binOffset)
+
+    for binRange in binRanges:
+        if binRange is None:
+            Data.append([np.array([]),np.array([]),np.array([]),np.array([])])
+        else:
+            low,high = binRange
+            Data.append([intensity[low:high],MonitorCount[low:high],Normalization[low:high],normcounts[low:high]])
+
+    return Data,Bins
+
+
+@_tools.ProfileSpan()
+@_tools.KwargChecker()
+def cutQELine(positions,I,Norm,Monitor,QPoints,width,minPixel,EnergyBins,constantBins=False):
+    """Perform consecutive Q-E cuts along a path of Q points. Only points inside the bounding box of the path are kept, and these
+    are projected onto all segments in one vectorized pass before being binned segment by segment as in cutQE with extend=False.
+    A point close to a corner of the path is used in all segments it is within, as when cutting each segment separately.
+
+    Args:
+
+        - positions (3 arrays): position in Qx, Qy, and E in flattend arrays.
+
+        - I (array): Flatten intensity array
+
+        - Norm (array): Flatten normalization array
+
+        - Monitor (array): Flatten monitor array
+
+        - QPoints (n * 2D array): Points of the path in format (qx,qy).
+
+        - width (float or list): Full width of cuts in q-plane, either common or one per segment.
+
+        - minPixel (float or list): Minimal size of binning along the cutting direction, either common or one per segment.
+
+        - EnergyBins (list): Bin edges in energy, either common or one list per segment.
+
+    Kwargs:
+
+        - constantBins (bool): If True only bins of size minPixel is used (default False)
+
+    Returns:
+
+        - Data list (n-1 lists): For each segment, the data list of cutQE.
+
+        - Bin list (n-1 lists): For each segment, the bin list of cutQE.
+
+    """
+    positions = np.asarray(positions)
+    QPoints = np.asarray(QPoints,dtype=float)
+    segments = len(QPoints)-1
+    width = np.broadcast_to(np.asarray(width,dtype=float),(segments,))
+    minPixel = np.broadcast_to(np.asarray(minPixel,dtype=float),(segments,))
+    if len(EnergyBins)==0 or not isinstance(EnergyBins[0],(list,np.ndarray)):
+        EnergyBins = [EnergyBins]*segments
+
+    starts = QPoints[:-1]
+    dirvecs = QPoints[1:]-starts
+    dirLengths = np.linalg.norm(dirvecs,axis=1)
+    dirvecs/=dirLengths.reshape(-1,1)
+    orthovecs = np.array([dirvecs[:,1],-dirvecs[:,0]]).T
+
+    # Bounding box of the area covered by all segments, slightly padded to be safe against rounding
+    if constantBins==False:
+        alongLimits = np.array([-0.05*np.ones(segments),1.05*dirLengths]).T
+    else:
+        alongLimits = np.array([np.zeros(segments),dirLengths]).T
+    orthoLimits = np.array([-0.5*width,0.5*width]).T
+    corners = np.concatenate([starts+alongLimits[:,[i]]*dirvecs+orthoLimits[:,[j]]*orthovecs for i in range(2) for j in range(2)])
+    lower = corners.min(axis=0)-1e-8
+    upper = corners.max(axis=0)+1e-8
+    inside = np.all(np.logical_and(positions[:2]>=lower.reshape(2,1),positions[:2]<=upper.reshape(2,1)),axis=0)
+    candidates = np.where(inside)[0]
+
+    localPositions = positions[:,candidates]
+    I,Norm,Monitor = [x[candidates] for x in [I,Norm,Monitor]]
+
+    # Projection of all points onto all segments at once
+    ProjectMatrices = np.stack([dirvecs,orthovecs],axis=1)
+    propos = np.matmul(ProjectMatrices,localPositions[np.newaxis,:2]-starts.reshape(segments,2,1))
+
+    Data = []
+    Bins = []
+    for segment in range(segments):
+        _Data,_Bins = _binProjectedQE(propos[segment],localPositions[2],I,Norm,Monitor,starts[segment],dirvecs[segment],dirLengths[segment],
+                                      width[segment],minPixel[segment],EnergyBins[segment],extend=False,constantBins=constantBins)
+        Data.append(_Data)
+        Bins.append(_Bins)
+    return Data,Bins
+
+
+
+@_tools.ProfileSpan()
 def cut1DE(positions,I,Norm,Monitor,E1,E2,q,width,minPixel,constantBins=False):#,plotCoverage=False):
     """Perform 1D cut through constant Q point returning binned intensity, monitor, normalization and normcount. The width of the cut is given by 
     the width attribute. 
@@ -3301,16 +3779,152 @@ def cut1DE(positions,I,Norm,Monitor,E1,E2,q,width,minPixel,constantBins=False):#
     normcounts = np.histogram(Energies,bins=bins,weights=np.ones_like(Energies).flatten())[0]
     intensity = np.histogram(Energies,bins=bins,weights=I[allInside].flatten())[0]
     MonitorCount=  np.histogram(Energies,bins=bins,weights=np.array(Monitor[allInside].flatten(),dtype=np.int64))[0] # Need to change to int64 to avoid overflow
-    Normalization= np.histogram(Energies,bins=bins,weights=Norm[allInside].flatten())[0]
+    Normalization= np.histogram(Energies,bins=bins,weights=Norm[allInside].flatten().astype(accumulationDtype(Norm.dtype)))[0]
     
 
     return [intensity,MonitorCount,Normalization,normcounts],[bins]
 
 
+@_tools.ProfileSpan()
+@_tools.KwargChecker()
+def cutELine(positions,I,Norm,Monitor,QPoints,width,energyWidth,E1,E2,constantBins=False):
+    """Perform constant Q cuts along energy for a line of equidistant Q points in a single pass through the data. 
+    Each data point close to the line is projected onto it once and assigned to all Q points within width, 
+    after which the energy spectra of all Q points are binned together.
+
+    Args:
+
+        - positions (3 arrays): position in Qx, Qy, and E in flattend arrays.
+
+        - I (array): Flatten intensity array
+
+        - Norm (array): Flatten normalization array
+
+        - Monitor (array): Flatten monitor array
+
+        - QPoints (n x 2 array): Equidistant Q points along a line in (qx,qy)
+
+        - width (float): Full width of cut in q-plane.
+
+        - energyWidth (float): Minimal size of binning along energy. Points will be binned if they are closer than energyWidth.
+
+        - E1 (float): Start energy.
 
+        - E2 (float): End energy.
+
+    Kwargs:
+
+        - constantBins (bool): If True only bins of size energyWidth is used (default False)
+
+    Returns:
+
+        - Data list (n x 4 arrays): Intensity, monitor count, normalization and normalization counts binned for each Q point.
+
+        - Bin list (n x 1 array): Bin edge positions in energy for each Q point
+
+    """
+    QPoints = np.asarray(QPoints,dtype=float).reshape(-1,2)
+    QCount = len(QPoints)
+
+    insideEnergy = np.logical_and(positions[2]<=E2,positions[2]>=E1)
+    if(np.sum(insideEnergy)==0):
+        raise AttributeError('No points are within the provided energy limits.')
+
+    # Project all points onto the line once and find the range of Q points possibly within width
+    start = QPoints[0]
+    if QCount>1:
+        step = (QPoints[-1]-start)/(QCount-1)
+    else:
+        step = np.zeros(2)
+    stepLength = np.linalg.norm(step)
+    
+    relative = positions[:2].T-start
+    if stepLength>0.0:
+        direction = step/stepLength
+        along = np.dot(relative,direction)/stepLength
+        perpendicular = np.abs(np.dot(relative,direction[[1,0]]*np.array([-1.0,1.0])))
+        reach = width/stepLength
+        strip = np.logical_and(perpendicular<width,np.logical_and(along>-reach,along<QCount-1+reach))
+        strip = np.where(strip)[0]
+        
+        first = np.clip(np.ceil(along[strip]-reach),0,QCount-1).astype(int)
+        last = np.clip(np.floor(along[strip]+reach),0,QCount-1).astype(int)
+    else:
+        strip = np.where(np.linalg.norm(relative,axis=1)<width)[0]
+        first = last = np.zeros(len(strip),dtype=int)
+    
+    # Expand into (point, Q point) pairs and keep those truly within width
+    candidates = last-first+1
+    pointIndex = np.repeat(strip,candidates)
+    offsets = np.arange(np.sum(candidates))-np.repeat(np.cumsum(candidates)-candidates,candidates)
+    QIndex = np.repeat(first,candidates)+offsets
+    
+    inside = np.linalg.norm(positions[:2,pointIndex].T-QPoints[QIndex],axis=1)<width
+    pointIndex = pointIndex[inside]
+    QIndex = QIndex[inside]
+
+    if np.any(np.bincount(QIndex,minlength=QCount)==0):
+        raise AttributeError('No points are inside selected q range.')
+
+    energyPairs = insideEnergy[pointIndex]
+    pointIndex = pointIndex[energyPairs]
+    QIndex = QIndex[energyPairs]
+    
+    order = np.argsort(QIndex,kind='stable')
+    pointIndex = pointIndex[order]
+    QIndex = QIndex[order]
+    Energies = positions[2][pointIndex]
+    groupEdges = np.concatenate([[0],np.cumsum(np.bincount(QIndex,minlength=QCount))])
+
+    # Bin edges are found per Q point while the accumulation is done for all Q points at once
+    Bins = []
+    binIndex = np.full(len(pointIndex),-1,dtype=int)
+    binOffset = 0
+    binOffsets = []
+    for i in range(QCount):
+        energies = Energies[groupEdges[i]:groupEdges[i+1]]
+        if len(energies)==0:
+            bins = []
+        elif constantBins==False:
+            bins = np.array(_tools.binEdges(energies,tolerance=energyWidth))
+        else:
+            Min,Max = _tools.minMax(energies)
+            bins = np.arange(Min,Max+0.5*energyWidth,energyWidth)
+        
+        if len(bins)<2:
+            Bins.append([[E1,E2]] if len(bins)==0 else [bins])
+            binOffsets.append((binOffset,binOffset))
+            continue
+        
+        local = np.searchsorted(bins,energies,side='right')-1
+        local[energies==bins[-1]] = len(bins)-2 # Last bin is closed as in np.histogram
+        valid = np.logical_and(local>=0,local<len(bins)-1)
+        binIndex[groupEdges[i]:groupEdges[i+1]] = np.where(valid,local+binOffset,-1)
+
+        Bins.append([bins])
+        binOffsets.append((binOffset,binOffset+len(bins)-1))
+        binOffset+=len(bins)-1
+
+    valid = binIndex>=0
+    binIndex = binIndex[valid]
+    pointIndex = pointIndex[valid]
+    
+    normcounts = np.bincount(binIndex,minlength=binOffset).astype(float)
+    intensity = np.bincount(binIndex,weights=I[pointIndex].flatten(),minlength=binOffset)
+    MonitorCount = np.bincount(binIndex,weights=np.array(Monitor[pointIndex].flatten(),dtype=np.int64),minlength=binOffset)
+    Normalization = np.bincount(binIndex,weights=Norm[pointIndex].flatten().astype(accumulationDtype(Norm.dtype)),minlength=binOffset)
+
+    Data = [[intensity[low:high],MonitorCount[low:high],Normalization[low:high],normcounts[low:high]] for low,high in binOffsets]
+
+    return Data,Bins
+
+
+
+@_tools.ProfileSpan()
 @_tools.KwargChecker()
-def cutPowder(positions,I,Norm,Monitor,EBinEdges,qMinBin=0.01,constantBins=False):
-    """Cut data powder map with intensity as function of the length of q and energy. 
+def cutPowder(positions,I,Norm,Monitor,EBinEdges,qMinBin=0.01,constantBins=False,commonBins=False):
+    """Cut data powder map with intensity as function of the length of q and energy. The length of q is calculated once and
+    all points are assigned an (energy, |q|) bin after which intensity, monitor, normalization and bin count are accumulated in one grouped reduction.
 
     Args:
 
@@ -3330,6 +3944,8 @@ def cutPowder(positions,I,Norm,Monitor,EBinEdges,qMinBin=0.01,constantBins=False
 
         - constantBins (bool): If True only bins of size minPixel is used (default False)
 
+        - commonBins (bool): If True the same |q| bins are used for all energies, otherwise the binning is found for each energy (default False)
+
     Returns:
         
         - Data list (pandas DataFrame): DataFrame containing qx,qy,H,K,L,Intensity,Normalization,Monitor,BinCount,Int,binDistance for powder cut.
@@ -3338,36 +3954,74 @@ def cutPowder(positions,I,Norm,Monitor,EBinEdges,qMinBin=0.01,constantBins=False
 
     """
     qx,qy,energy = positions
+    EBinEdges = np.asarray(EBinEdges,dtype=float)
+    energyBins = len(EBinEdges)-1
 
     q = np.linalg.norm([qx,qy],axis=0)
 
-    qbins = []
-    
-    data = []
-    #for i in range(len(EBinEdges)-1):
-    for energyBin,[binStart,binEnd] in enumerate(zip(EBinEdges,EBinEdges[1:])):
-        e_inside = np.logical_and(energy>binStart,energy<=binEnd)
-        q_inside = q[e_inside]
+    # Energy bin of all points, where lower edges are exclusive and upper edges inclusive
+    energyIndex = np.searchsorted(EBinEdges,energy,side='left')-1
+    inside = np.where(np.logical_and(energyIndex>=0,energyIndex<energyBins))[0]
+    order = inside[np.argsort(energyIndex[inside],kind='stable')] # Points sorted by energy bin keeping original order within bins
+    groupLimits = np.concatenate([[0],np.cumsum(np.bincount(energyIndex[inside],minlength=energyBins))])
+
+    def qBinning(q_inside):
+        if len(q_inside)==0:
+            return np.array([])
         if constantBins==False:
-            qbins.append(np.array(_tools.binEdges(q_inside,tolerance=qMinBin)))
-        else:
-            Min,Max = _tools.minMax(q_inside)
-            qbins.append(np.arange(Min,Max+0.5*qMinBin,qMinBin))
-            
-        intensity,bins = np.histogram(q_inside,bins=qbins[-1],weights=I[e_inside].flatten())
-        monitorCount = np.histogram(q_inside,bins=qbins[-1],weights=Monitor[e_inside].flatten())[0].astype(Monitor.dtype)
-        Normalization = np.histogram(q_inside,bins=qbins[-1],weights=Norm[e_inside].flatten())[0].astype(Norm.dtype)
-        NormCount = np.histogram(q_inside,bins=qbins[-1],weights=np.ones_like(I[e_inside]).flatten())[0].astype(I.dtype)
+            return np.array(_tools.binEdges(q_inside,tolerance=qMinBin))
+        Min,Max = _tools.minMax(q_inside)
+        return np.arange(Min,Max+0.5*qMinBin,qMinBin)
 
-        _data = pd.DataFrame(np.array([intensity,monitorCount,Normalization,NormCount],dtype=np.int).T,
-                        columns=['Intensity','Monitor','Normalization','BinCount'],dtype=np.int)
-        _data['q'] = 0.5*(bins[:-1]+bins[1:])
-        _data['Energy'] = np.ones_like(_data['q'])*0.5*(binStart+binEnd)
-        _data['EnergyCut'] = np.ones_like(_data['q'],dtype=np.int)*energyBin
-        data.append(_data)
-    data = pd.concat(data)
-    data['Int'] = data['Intensity']*data['BinCount']/(data['Normalization']*data['Monitor'])
-    return data,qbins
+    if commonBins:
+        commonQBins = qBinning(q[order])
+
+    qbins = []
+    pointIndices = []
+    binIndices = []
+    binCounts = []
+    binOffset = 0
+    for energyBin in range(energyBins):
+        index = order[groupLimits[energyBin]:groupLimits[energyBin+1]]
+        q_inside = q[index]
+        bins = commonQBins if commonBins else qBinning(q_inside)
+        qbins.append(bins)
+        
+        binCount = max(len(bins)-1,0)
+        binCounts.append(binCount)
+        if binCount == 0:
+            continue
+        # Bins are closed to the left except the last as for np.histogram
+        local = np.searchsorted(bins,q_inside,side='right')-1
+        local[q_inside==bins[-1]] = binCount-1
+        valid = np.logical_and(local>=0,local<binCount)
+        pointIndices.append(index[valid])
+        binIndices.append(local[valid]+binOffset)
+        binOffset+=binCount
+
+    if len(pointIndices)>0:
+        pointIndices = np.concatenate(pointIndices)
+        binIndices = np.concatenate(binIndices)
+    else:
+        pointIndices = binIndices = np.array([],dtype=int)
+
+    intensity = np.bincount(binIndices,weights=I[pointIndices].flatten(),minlength=binOffset)
+    monitorCount = np.bincount(binIndices,weights=Monitor[pointIndices].flatten(),minlength=binOffset).astype(Monitor.dtype)
+    Normalization = np.bincount(binIndices,weights=Norm[pointIndices].flatten().astype(accumulationDtype(Norm.dtype)),minlength=binOffset)
+    NormCount = np.bincount(binIndices,minlength=binOffset).astype(I.dtype)
+
+    binCounts = np.array(binCounts,dtype=int)
+    energyCut = np.repeat(np.arange(energyBins),binCounts)
+    data = CutResult(index=np.concatenate([np.arange(n) for n in binCounts]) if energyBins>0 else np.zeros(0,dtype=int))
+    data['Intensity'] = intensity.astype(int)
+    data['Monitor'] = monitorCount.astype(int)
+    data['Normalization'] = Normalization.astype(int)
+    data['BinCount'] = NormCount.astype(int)
+    data['q'] = np.concatenate([0.5*(bins[:-1]+bins[1:]) for bins in qbins if len(bins)>1]) if binOffset>0 else np.zeros(0)
+    data['Energy'] = (0.5*(EBinEdges[:-1]+EBinEdges[1:]))[energyCut]
+    data['EnergyCut'] = energyCut
+    data['Int'] = _normalizedIntensity(data)
+    return data.to_pandas(),qbins
 
 
 
@@ -3503,7 +4157,7 @@ def cutPowder(positions,I,Norm,Monitor,EBinEdges,qMinBin=0.01,constantBins=False
 #    return ax
 
 @_tools.KwargChecker()
-def plotA3A4(files,ax=None,planes=[],binningDecimals=3,log=False,returnPatches=False,singleFigure=False,plotTessellation=False,Ei_err = 0.05,temperature_err=0.2,magneticField_err=0.2,electricField_err=0.2): # pragma: no cover
+def plotA3A4(files,ax=None,planes=[],binningDecimals=3,log=False,returnPatches=False,singleFigure=False,plotTessellation=False,Ei_err = 0.05,temperature_err=0.2,magneticField_err=0.2,electricField_err=0.2,tessellationFile=None): # pragma: no cover
     """Plot data files together with pixels created around each point in A3-A4 space. Data is binned in the specified planes through their A3 and A4 values. 
     This can result in distorted binning when binning across large energy regions. Data is plotted using the pixels calculated for average plane value, i.e. 
     binning 7,8,9,10, and 11 patches for plane 9 are used for plotting.
@@ -3536,6 +4190,8 @@ def plotA3A4(files,ax=None,planes=[],binningDecimals=3,log=False,returnPatches=F
         
         - electricField_err (float): Tolerance of electric field for which the values are equal (default = 0.2)
 
+        - tessellationFile (str or bool): Hdf file used to persist the A3-A4 tessellation. If True, MJOLNIRTessellation.h5 next to the data files is used. If None, nothing is written to disk (default None)
+
     Returns:
         
         - ax (matplotlib axis or list of): axis (list of) containing figures for plotted planes.
@@ -3564,6 +4220,7 @@ def plotA3A4(files,ax=None,planes=[],binningDecimals=3,log=False,returnPatches=F
         Binning planes from different analysers might result in nonsensible binnings.
 
     """
+    from scipy.spatial import KDTree
    
     if not isinstance(ax, (list,)) and ax is not None:
         ax = np.array([ax])
@@ -3716,7 +4373,12 @@ def plotA3A4(files,ax=None,planes=[],binningDecimals=3,log=False,returnPatches=F
         numGroups = 1
     else:
         numGroups = False
-    polygons,GoodPolyPoints = voronoiTessellation(points=points ,plot = plotTessellation,Boundary = BoundPoly, numGroups=numGroups)
+    # All planes share the A3-A4 grid, thus tessellation is calculated once and stored next to the data
+    if tessellationFile is True: # Only persist tessellation when asked to
+        tessellationFile = tessellationFileLocation(files)
+    elif tessellationFile is False:
+        tessellationFile = None
+    polygons,GoodPolyPoints = voronoiTessellation(points=points ,plot = plotTessellation,Boundary = BoundPoly, numGroups=numGroups, cacheFile=tessellationFile)
 
 
     # Sort centroids (i.e. polygons) like measurement points
@@ -4187,8 +4849,92 @@ def plotA3A4(files,ax=None,planes=[],binningDecimals=3,log=False,returnPatches=F
 #
 #@_tools.my_timer_N()
 
+_voronoiCache = collections.OrderedDict()
+_voronoiCacheSize = 16
+
+def _voronoiCacheKey(pointsX,pointsY,combiPoly):
+    """Hash of the point set and boundary used as key in the tessellation cache"""
+    key = hashlib.sha1()
+    for arr in [pointsX,pointsY]:
+        arr = np.ascontiguousarray(arr,dtype=float)
+        key.update(str(arr.shape).encode())
+        key.update(arr.tobytes())
+    key.update(combiPoly.wkb)
+    return key.hexdigest()
+
+def clearVoronoiCache():
+    """Remove all tessellations stored in the voronoiTessellation cache"""
+    _voronoiCache.clear()
+
+def saveTessellation(fileName,key,PolyPoints):
+    """Save tessellation under the given key into an hdf file. Existing tessellations in file are kept.
+
+    Args:
+
+        - fileName (str): Location of tessellation file
+
+        - key (str): Hash of point set and boundary as generated by voronoiTessellation
+
+        - PolyPoints (array): Corner points of each polygon
+
+    """
+    lengths = np.array([len(P) for P in PolyPoints],dtype=int)
+    corners = np.concatenate([np.asarray(P,dtype=float) for P in PolyPoints],axis=0)
+    with hdf.File(fileName,mode='a') as f:
+        if key in f:
+            del f[key]
+        group = f.create_group(key)
+        group.create_dataset('corners',data=corners,compression='gzip')
+        group.create_dataset('lengths',data=lengths,compression='gzip')
+
+def loadTessellation(fileName,key):
+    """Load tessellation saved with saveTessellation.
+
+    Args:
+
+        - fileName (str): Location of tessellation file
+
+        - key (str): Hash of point set and boundary as generated by voronoiTessellation
+
+    Returns:
+
+        - Polygons (array): Shapely polygons (None if key is not found)
+
+        - PolyPoints (array): Corner points of each polygon (None if key is not found)
+
+    """
+    from shapely.geometry import Polygon as PolygonS
+    if not os.path.isfile(fileName):
+        return None,None
+    with hdf.File(fileName,mode='r') as f:
+        if not key in f:
+            return None,None
+        corners = np.array(f[key]['corners'])
+        lengths = np.array(f[key]['lengths'])
+    
+    PolyPoints = np.split(corners,np.cumsum(lengths)[:-1])
+    Polygons = np.empty(len(PolyPoints),dtype=object)
+    Polygons[:] = [PolygonS(P) for P in PolyPoints]
+    if len(np.unique(lengths))==1:
+        PolyPoints = np.array(PolyPoints)
+    else:
+        PolyPoints = np.array(PolyPoints+[None],dtype=object)[:-1]
+    return Polygons,PolyPoints
+
+def tessellationFileLocation(files):
+    """Location of tessellation file stored next to the (converted) data files. 
+    If no file location is known, None is returned."""
+    for file in files:
+        location = getattr(file,'fileLocation',None)
+        if location is None and hasattr(file,'original_file'):
+            location = getattr(file.original_file,'fileLocation',None)
+        if not location is None:
+            return os.path.join(os.path.dirname(os.path.abspath(location)),'MJOLNIRTessellation.h5')
+    return None
+
+@_tools.ProfileSpan()
 @_tools.KwargChecker()
-def voronoiTessellation(points,plot=False,Boundary=False,numGroups=False):
+def voronoiTessellation(points,plot=False,Boundary=False,numGroups=False,cache=True,cacheFile=None):
     """Generate individual pixels around the given datapoints.
 
     Args:
@@ -4201,8 +4947,25 @@ def voronoiTessellation(points,plot=False,Boundary=False,numGroups=False):
 
         - Boundary (list of Polygons): List of Shapely polygons constituting the boundaries (Default False)
 
+        - cache (bool): If True, re-use tessellation previously calculated for identical points and boundary (default True)
+
+        - cacheFile (str): Hdf file in which tessellations are persisted and looked up between sessions (default None)
+
+    Returns:
+
+        - Polygons (array): Shapely polygons, internal pixels first followed by the ones clipped by the boundary
+
+        - PolyPoints (array): Corner points of each polygon
+
+    .. note::
+        Containment of points and Voronoi vertices are checked in one vectorized call. Only regions with a
+        vertex outside of the boundary are clipped by it, while all other regions are used directly.
 
     """
+    from scipy.spatial import Voronoi
+    from shapely.geometry import Polygon as PolygonS
+    from shapely.vectorized import contains
+    import shapely.prepared
 
     if numGroups == False:
         numGroups = len(points)
@@ -4227,8 +4990,27 @@ def voronoiTessellation(points,plot=False,Boundary=False,numGroups=False):
         else:
             pointsX = points[0]
             pointsY = points[1]
-        
-    containsAllPoints=np.all([combiPoly.contains(PointS(pointsX[i],pointsY[i])) for i in range(len(pointsX))])
+
+    if (cache or not cacheFile is None) and not plot:
+        cacheKey = _voronoiCacheKey(pointsX,pointsY,combiPoly)
+        if cache and cacheKey in _voronoiCache:
+            _voronoiCache.move_to_end(cacheKey)
+            Polygons,PolyPoints = _voronoiCache[cacheKey]
+            return Polygons.copy(),PolyPoints.copy()
+        if not cacheFile is None:
+            try:
+                Polygons,PolyPoints = loadTessellation(cacheFile,cacheKey)
+            except OSError: # Unreadable file is treated as no file
+                Polygons = None
+            if not Polygons is None and len(Polygons)==len(pointsX):
+                if cache:
+                    _voronoiCache[cacheKey] = (Polygons,PolyPoints)
+                    if len(_voronoiCache)>_voronoiCacheSize:
+                        _voronoiCache.popitem(last=False)
+                    return Polygons.copy(),PolyPoints.copy()
+                return Polygons,PolyPoints
+
+    containsAllPoints=np.all(contains(combiPoly,pointsX,pointsY))
     if not containsAllPoints:
         plt.figure()
         plt.scatter(pointsX,pointsY,c='b')
@@ -4245,31 +5027,44 @@ def voronoiTessellation(points,plot=False,Boundary=False,numGroups=False):
     
 
     vor = Voronoi(AllPoints.T)
-    regions = np.array([reg for reg in vor.regions])
-    boolval = np.array([len(x)>2 and not -1 in x for x in regions]) # Check if region has at least 3 points and is not connected to infinity (-1))
-        
-    PolyPoints = np.array([vor.vertices[reg,:] for reg in regions[boolval]])
-    polygons = np.array([PolygonS(X) for X in PolyPoints])
-
-    insidePolygonsBool = np.array([combiPoly.contains(P) for P in polygons])
-
-    edgePolygonsBool = np.logical_not(insidePolygonsBool)
+    regions = [reg for reg in vor.regions if len(reg)>2 and not -1 in reg] # Regions with at least 3 points and not connected to infinity (-1)
     
+    # A region is internal if all of its vertices are inside of the boundary. As Voronoi regions are convex this is
+    # exact for a convex boundary, while for a combined (possibly concave) boundary the candidates are verified.
+    vertexInside = contains(combiPoly,vor.vertices[:,0],vor.vertices[:,1])
+    insidePolygonsBool = np.array([np.all(vertexInside[reg]) for reg in regions],dtype=bool)
+
+    convexBoundary = np.isclose(combiPoly.convex_hull.area,combiPoly.area)
+    if not convexBoundary:
+        preparedPoly = shapely.prepared.prep(combiPoly)
+
+    insidePolygons = []
+    insidePolyPoints = []
+    edgePolygons = []
+    for reg,inside in zip(regions,insidePolygonsBool):
+        X = vor.vertices[reg]
+        poly = PolygonS(X)
+        if inside and (convexBoundary or preparedPoly.contains(poly)):
+            insidePolygons.append(poly)
+            insidePolyPoints.append(X)
+        else:
+            edgePolygons.append(poly)
+
     intersectionPolygon = []
-    for poly in polygons[edgePolygonsBool]:
+    for poly in edgePolygons:
         inter = poly.intersection(combiPoly)
         if not isinstance(inter,PolygonS): # Not a simple polygon
-            inter = inter[np.argmax([x.area for x in inter])] # Return the polygon with biggest area inside boundary
+            inter = inter.geoms[np.argmax([x.area for x in inter.geoms])] # Return the polygon with biggest area inside boundary
         intersectionPolygon.append(inter)
     
-    Polygons = np.concatenate([polygons[np.logical_not(edgePolygonsBool)],intersectionPolygon])
+    Polygons = np.empty(len(insidePolygons)+len(intersectionPolygon),dtype=object)
+    Polygons[:] = insidePolygons+intersectionPolygon
     
     
     if plot or len(pointsX)!=len(Polygons): # pragma: no cover
         plt.figure()
-        insiders = np.logical_not(edgePolygonsBool)
         
-        [plt.plot(np.array(inter.boundary.coords)[:,0],np.array(inter.boundary.coords)[:,1],c='r') for inter in polygons[insiders]]
+        [plt.plot(np.array(inter.boundary.coords)[:,0],np.array(inter.boundary.coords)[:,1],c='r') for inter in insidePolygons]
         [plt.plot(np.array(inter.boundary.coords)[:,0],np.array(inter.boundary.coords)[:,1],c='g') for inter in intersectionPolygon]
         [plt.plot(np.array(bound.boundary.coords)[:,0],np.array(bound.boundary.coords)[:,1],'-.',c='r') for bound in BoundPoly]
         plt.scatter(extraPoints[:,0],extraPoints[:,1])
@@ -4279,111 +5074,24 @@ def voronoiTessellation(points,plot=False,Boundary=False,numGroups=False):
     if not len(pointsX)==len(Polygons):
         raise AttributeError('The number of points given({}) is not the same as the number of polygons created({}). This can be due to many reasons, mainly:\n - Points overlap exactly\n - Points coinsides with the calculated edge\n - ??'.format(len(pointsX),len(Polygons)))
 
+    PolyPoints = insidePolyPoints+[np.array(P.boundary.coords[:-1]) for P in intersectionPolygon]
+    if len(set([len(P) for P in PolyPoints]))==1: # All polygons have same number of corners
+        PolyPoints = np.array(PolyPoints)
+    else:
+        PolyPoints = np.array(PolyPoints+[None],dtype=object)[:-1]
 
-    return Polygons,np.array([np.array(P.boundary.coords[:-1]) for P in Polygons])
-#
-#
-#
-#
-#@_tools.my_timer_N(N=0)
-#def voronoiTessellationOPTIMIZED2(points,plot=False,Boundary=False): # pragma: no cover
-#    """Generate individual pixels around the given datapoints.
-#
-#    Args:
-#
-#        - points (list of list of points): Data points to generate pixels in shape [files,XY,N] i.e. [1,2,N] for one file with N points
-#
-#    Kwargs:
-#
-#        - plot (bool): If True, method plots pixels created with green as edge bins and red as internal (default False)
-#
-#        - Boundary (lost of Polygons): List of Shapely polygons constituting the boundaries (Default False)
-#
-#
-#    """
-#    numGroups = len(points)
-#    
-#    if Boundary==False:
-#        BoundPoly= [convexHullPoints(points[i][0].flatten(),points[i][1].flatten()) for i in range(numGroups)]
-#    else:
-#        BoundPoly = Boundary 
-#        
-#    if numGroups == 1:
-#        combiPoly = BoundPoly[0]
-#        pointsX = np.array([points[0][0].flatten()])[0]
-#        pointsY = np.array([points[0][1].flatten()])[0]
-#    else: # Combine all files
-#        combiPoly = BoundPoly[0].union(BoundPoly[1])
-#        for i in range(len(BoundPoly)-2):
-#            combiPoly = combiPoly.union(BoundPoly[i+2])
-#        if Boundary==False:
-#            pointsX = np.concatenate([points[i][0].flatten() for i in range(numGroups)])
-#            pointsY = np.concatenate([points[i][1].flatten() for i in range(numGroups)])
-#        else:
-#            pointsX = points[0]
-#            pointsY = points[1]
-#        
-#    containsAllPoints=np.all(contains(combiPoly,pointsX,pointsY))
-#    
-#    
-#    if not containsAllPoints:
-#        raise AttributeError('The provided boundary does not contain all points')
-#    # Add extra points to ensure that area is finite
-#    extraPoints = np.array([[np.mean(pointsX),np.max(pointsY)+50],[np.mean(pointsX),np.min(pointsY)-50],\
-#                             [np.min(pointsX)-50,np.mean(pointsY)],[np.max(pointsX)+50,np.mean(pointsY)],\
-#                             [np.min(pointsX)-50,np.max(pointsY)+50],[np.min(pointsX)-50,np.min(pointsY)-50],\
-#                             [np.max(pointsX)+50,np.max(pointsY)+50],[np.max(pointsX)+50,np.min(pointsY)-50]])
-#    
-#    
-#    AllPoints = np.array([np.concatenate([pointsX,extraPoints[:,0]]),np.concatenate([pointsY,extraPoints[:,1]])])
-#    
-#    
-#    vor = Voronoi(AllPoints.T)
-#    
-#    regions = np.array(vor.regions)
-#       
-#    boolval = np.array([len(x)>2 and not -1 in x for x in regions]) # Check if region has at least 3 points and is not connected to infinity (-1))
-#    
-#    PolyPoints = np.array([vor.vertices[reg,:] for reg in regions[boolval]])
-#    
-#    
-#    def genPolygon(PolyPoints):
-#        return PolygonS(PolyPoints)
-#
-#    genPolygon_vectorized = np.vectorize(genPolygon,otypes=[PolygonS])
-#
-#    polygons = genPolygon_vectorized(PolyPoints)#
-#
-#    insidePolygonsBool = np.array([combiPoly.contains(P) for P in polygons])
-#    edgePolygonsBool = np.logical_not(insidePolygonsBool)
-#    
-#    def intersectionLoop(polygons,edgePolygonsBool,combiPoly):
-#        intersectionPolygon = []
-#        for poly in polygons[edgePolygonsBool]:
-#            inter = poly.intersection(combiPoly)
-#            if not isinstance(inter,PolygonS): # Not a simple polygon
-#                inter = inter[np.argmax([x.area for x in inter])] # Return the polygon with biggest area inside boundary
-#            intersectionPolygon.append(inter)
-#        return intersectionPolygon
-#    intersectionPolygon = intersectionLoop(polygons,edgePolygonsBool,combiPoly)
-#
-#    Polygons = np.concatenate([polygons[np.logical_not(edgePolygonsBool)],intersectionPolygon])
-#
-#    if not len(pointsX)==len(Polygons):
-#        raise AttributeError('The number of points given({}) is not the same as the number of polygons created({}). This can be due to many reasons, mainly:\n - Points overlap exactly\n - Points coinsides with the calulated edge\n - ??'.format(len(pointsX),len(Polygons)))
-#
-#    return Polygons,np.concatenate([PolyPoints[insidePolygonsBool],np.array([np.array(P.boundary.coords[:-1]) for P in intersectionPolygon])],axis=0)
-
-
-
-
-
-
-
-
-
-
+    if not cacheFile is None and not plot:
+        try:
+            saveTessellation(cacheFile,cacheKey,PolyPoints)
+        except OSError as e:
+            warnings.warn('Tessellation could not be saved to {}: {}'.format(cacheFile,e))
 
+    if cache and not plot:
+        _voronoiCache[cacheKey] = (Polygons,PolyPoints)
+        if len(_voronoiCache)>_voronoiCacheSize:
+            _voronoiCache.popitem(last=False)
+        return Polygons.copy(),PolyPoints.copy()
+    return Polygons,PolyPoints
 
 
 
@@ -4462,6 +5170,8 @@ def boundaryQ(file,plane,A4Extend=0.0,A3Extend=0.0): # pragma: no cover
 
 def convexHullPoints(A3,A4):
     """Calculate the convex hull of rectangularly spaced A3 and A4 values"""
+    from scipy.spatial import ConvexHull
+    from shapely.geometry import Polygon as PolygonS
     A3Unique = np.unique(A3)
     A4Unique = np.unique(A4)
     
@@ -4478,6 +5188,132 @@ def convexHullPoints(A3,A4):
     bound = hullPoints.points[hullPoints.vertices].T
     return PolygonS(bound.T)
 
+def histogram2DWeights(x,y,bins,weights):
+    """Calculate weighted 2D histograms for a list of weights, finding the bin of each point only once. 
+    Each histogram is identical to np.histogram2d(x,y,bins=bins,weights=weight).
+
+    Args:
+
+        - x (array): Flattened positions along first axis
+
+        - y (array): Flattened positions along second axis
+
+        - bins (list of 2 arrays): Bin edges along x and y
+
+        - weights (list of arrays): Weights to be histogrammed
+
+    Returns:
+
+        - histograms (list of arrays): Histograms of shape (len(bins[0])-1,len(bins[1])-1) for each weight
+
+    """
+    indices = []
+    for values,edges in zip([x,y],bins):
+        edges = np.asarray(edges)
+        index = np.searchsorted(edges,values,side='right')
+        index[values==edges[-1]]-=1 # Right most edge is included in last bin
+        indices.append(index)
+    shape = (len(bins[0])+1,len(bins[1])+1) # Including outliers on both sides
+    flatIndex = np.ravel_multi_index(indices,shape)
+    histograms = []
+    for weight in weights:
+        hist = np.bincount(flatIndex,weights=weight,minlength=shape[0]*shape[1]).reshape(shape)
+        histograms.append(hist[1:-1,1:-1])
+    return histograms
+
+
+def binQPlaneSlice(qx,qy,I,Monitor,Norm,binning='xy',xBinTolerance=0.05,yBinTolerance=0.05,enlargen=False):
+    """Bin intensities of a single energy slice in the Q plane as used in plotQPlane.
+
+    Args:
+
+        - qx (array): Flattened qx positions
+
+        - qy (array): Flattened qy positions
+
+        - I (array): Flattened intensities
+
+        - Monitor (array): Flattened monitor counts
+
+        - Norm (array): Flattened normalization
+
+    Kwargs:
+
+        - binning (str): Binning scheme, either 'xy' or 'polar' (default 'xy').
+
+        - xBinTolerance (float): bin sizes along x direction (default 0.05). If enlargen is true, this is the minimum bin size.
+
+        - yBinTolerance (float): bin sizes along y direction (default 0.05). If enlargen is true, this is the minimum bin size.
+
+        - enlargen (bool): If the bin sizes should be adaptive (default False). If set true, bin tolerances are used as minimum bin sizes.
+
+    Returns:
+
+        - dataList (list): Binned data in format [Intensity, Monitor, Normalization, Normcount]
+
+        - bins (list): Bin edges in format [xBins,yBins]
+
+        - offset (float): Angular offset used in polar binning (0.0 for xy binning)
+
+    """
+    offset = 0.0
+    if binning == 'polar':
+        x = np.arctan2(qy,qx) # Gives values between -pi and pi
+        bins = 20
+        # Following block checks if measured area corresponds to alpha ~pi as arctan2 only gives
+        # values back in range -pi to pi.
+        if np.max(x.flatten())+xBinTolerance>np.pi and np.min(x.flatten())-xBinTolerance<-np.pi:
+            h = np.histogram(x.flatten(),bins = bins)
+            while np.max(h[0]==0) == False:
+                bins *= 2
+                h = np.histogram(x.flatten(),bins = bins)
+                if bins > 200:
+                    break
+            if bins <= 200: # If everything has been covered, do nothing.
+                offset = 2*np.pi-h[1][np.argmax(h[0]==0)] # Move highest value of lump to fit 2pi
+                x = np.mod(x+offset,2*np.pi)-np.pi # moves part above 2pi to lower than 2pi and make data fit in range -pi,pi
+                offset-=np.pi # As x is moved by pi, so should the offset
+
+        y = np.linalg.norm([qx,qy],axis=0)  
+        if not enlargen:
+            xBins = np.arange(-np.pi,np.pi+xBinTolerance*0.999,xBinTolerance) # Add tolerance as to ensure full coverage of parameter
+            yBins = np.arange(0,np.max(y)+yBinTolerance*0.999,yBinTolerance) # Add tolerance as to ensure full coverage of parameter
+        else:
+            xBins = _tools.binEdges(x,tolerance=xBinTolerance)
+            yBins = _tools.binEdges(y,tolerance=yBinTolerance)
+
+    elif binning == 'xy':
+        x = qx
+        y = qy
+        if not enlargen:
+            xBins = np.arange(np.min(x),np.max(x)+0.999*xBinTolerance,xBinTolerance) # Add tolerance as to ensure full coverage of parameter
+            yBins = np.arange(np.min(y),np.max(y)+0.999*yBinTolerance,yBinTolerance) # Add tolerance as to ensure full coverage of parameter
+        else:
+            xBins = _tools.binEdges(x,tolerance=xBinTolerance)
+            yBins = _tools.binEdges(y,tolerance=yBinTolerance)
+    else:
+        raise AttributeError('The provided binning is not understood, should be xy or polar')
+
+    X = x.flatten()
+    Y = y.flatten()
+
+    intensity,monitorCount,Normalization,NormCount = histogram2DWeights(X,Y,bins=(xBins,yBins),weights=[I,Monitor,Norm,np.ones_like(I)])
+    
+    intensity = intensity.astype(I.dtype)
+    monitorCount = monitorCount.astype(Monitor.dtype)
+    Normalization = Normalization.astype(accumulationDtype(Norm.dtype))
+    NormCount = NormCount.astype(I.dtype)
+
+    return [intensity,monitorCount,Normalization,NormCount],[xBins,yBins],offset
+
+
+def accumulationDtype(dtype):
+    """Data type used when accumulating values of given type. Floating point values are always summed 
+    in double precision, independent of the working precision of the data set."""
+    if np.issubdtype(dtype,np.floating):
+        return np.float64
+    return dtype
+
 def isListOfStrings(object):
     if isinstance(object, list):
         isListOfStr = True
@@ -4619,6 +5455,7 @@ def calculateGrid3D(X,Y,Z):
 
 
 
+@_tools.ProfileSpan()
 @_tools.KwargChecker()
 def binData3D(dx,dy,dz,pos,data,norm=None,mon=None,bins=None):
     """ 3D binning of data.
@@ -4670,7 +5507,7 @@ def binData3D(dx,dy,dz,pos,data,norm=None,mon=None,bins=None):
         MonitorCount=  np.histogramdd(np.array(pos).T,bins=HistBins,weights=mon.flatten())[0].astype(mon.dtype)
         returndata.append(MonitorCount)
     if norm is not None:
-        Normalization= np.histogramdd(np.array(pos).T,bins=HistBins,weights=norm.flatten())[0].astype(norm.dtype)
+        Normalization= np.histogramdd(np.array(pos).T,bins=HistBins,weights=norm.flatten())[0].astype(accumulationDtype(norm.dtype))
         
         returndata.append(Normalization)
         
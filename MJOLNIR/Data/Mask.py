@@ -8,6 +8,9 @@ from six import with_metaclass
 # or
 from future.utils import with_metaclass
 
+# Masks are only evaluated through their bounding box when they are applied to at least this number of points
+minimumPruningSize = 10000
+
 def requiredArguments(func,requiredNames):
     """Return list of arguments not found in arguments of func"""
     varnames = func.__code__.co_varnames
@@ -97,6 +100,42 @@ class MaskingObject(with_metaclass(MaskingObjectMeta)):
     
     def __truediv__(self,other):
         return self*(-other)
+
+    @property
+    def boundingBox(self):
+        """Axis aligned bounding box of masked region as array of shape (2,len(coordinates)) holding minimum and maximum. None if not bounded."""
+        return None
+
+    def _evaluateInside(self,points,out):
+        """Find points inside mask. If mask has a bounding box, only points within it are checked exactly."""
+        boundingBox = self.boundingBox
+        size = np.size(out)
+        if boundingBox is None or size < minimumPruningSize:
+            return self._inside(points,out)
+
+        # Pad bounding box slightly to not loose points on the boundary due to rounding
+        padding = 1e-8*np.maximum(1.0,np.max(np.abs(boundingBox),axis=0))
+        lower,upper = boundingBox[0]-padding,boundingBox[1]+padding
+        
+        candidate = np.empty(np.shape(out),dtype=bool)
+        for i,(p,low,high) in enumerate(zip(points,lower,upper)):
+            if i == 0:
+                np.greater_equal(p,low,out=out)
+            else:
+                np.greater_equal(p,low,out=candidate)
+                np.logical_and(out,candidate,out=out)
+            np.less_equal(p,high,out=candidate)
+            np.logical_and(out,candidate,out=out)
+        
+        index = np.flatnonzero(out)
+        if len(index) > 0.5*size: # Pruning does not pay off
+            return self._inside(points,out)
+        if len(index) == 0:
+            return out
+        
+        inside = self._inside([np.ravel(p)[index] for p in points],np.empty(len(index),dtype=bool))
+        out.flat[index] = inside
+        return out
     
     def generateInputKwargs(self):
         """Generate dictionary with initial args/kwargs used for init"""
@@ -132,15 +171,12 @@ class MultiMask(MaskingObject):
 
     
     def __call__(self,*args,**kwargs):
-        masks = []
-        for m in self.masks:
-            masks.append(m(*args,**kwargs))
-        
-        results = self.operation(*masks)
-        if self.negated:
-            results = np.logical_not(results)
-        return results
+        return self.compile()(*args,**kwargs)
     
+    def compile(self):
+        """Return a CompiledMask evaluating the full mask expression in one pass"""
+        return CompiledMask(self)
+
     def negate(self):
         newMask = self.clone()
         newMask.negated = not newMask.negated
@@ -185,6 +221,154 @@ class MultiMask(MaskingObject):
 
 
 
+class CompiledMask(object):
+    def __init__(self,mask):
+        """Flattened evaluation of a mask expression.
+
+        Nested MultiMasks combined with the same logical operation are merged into one operation 
+        and the expression is evaluated as a list of instructions. Coordinates are only fetched once 
+        from the data object, masks supporting it are evaluated directly into boolean buffers and these 
+        buffers are combined in place and reused.
+
+        args:
+            mask (MaskingObject): Mask expression to be compiled
+
+        Example:
+
+            >>> mask = circleMask([0,0],radius=0.5,coordinates=['qx','qy'])*lineMask(1.0,2.0,coordinates=['energy'])
+            >>> compiled = mask.compile()
+            >>> masks = [compiled(df) for df in dataSet]
+
+        """
+        self.mask = mask
+        self.program = []
+        self._compile(mask)
+
+    def _compile(self,mask):
+        if isinstance(mask,MultiMask):
+            operands = self._flatten(mask)
+            for m in operands:
+                self._compile(m)
+            self.program.append(('operation',mask.operation,len(operands),mask.negated))
+        else:
+            self.program.append(('mask',mask,1,False))
+
+    @staticmethod
+    def _flatten(mask):
+        """Find operands of mask, merging nested non-negated masks with same logical operation"""
+        if not mask.operation in [np.logical_and,np.logical_or]:
+            return list(mask.masks)
+        operands = []
+        for m in mask.masks:
+            if isinstance(m,MultiMask) and m.operation is mask.operation and not m.negated:
+                operands+=CompiledMask._flatten(m)
+            else:
+                operands.append(m)
+        return operands
+
+    def __call__(self,x=None,*args,**kwargs):
+        """Evaluate mask on x. If out is provided as keyword argument, the result is written into it."""
+        out = kwargs.pop('out',None)
+        if x is not None:
+            args = (x,)+args
+        coordinates = {}
+        buffers = [] # Boolean arrays allocated during evaluation
+        free = [] # Buffers that can be reused
+        stack = []
+
+        for kind,obj,count,negated in self.program:
+            if kind == 'mask':
+                stack.append(self._evaluateMask(obj,args,kwargs,coordinates,buffers,free))
+                continue
+            
+            operands = stack[-count:]
+            del stack[-count:]
+            if isinstance(obj,np.ufunc):
+                if obj in [np.logical_and,np.logical_or]: # Accumulate into an allocated buffer if possible
+                    operands = sorted(operands,key=lambda operand: not _isBuffer(operand,buffers))
+                result = operands[0]
+                for operand in operands[1:]:
+                    if _isBuffer(result,buffers) and np.broadcast(result,operand).shape == result.shape:
+                        obj(result,operand,out=result)
+                    else:
+                        result = obj(result,operand)
+            else:
+                result = obj(*operands)
+
+            for operand in operands:
+                if not operand is result and _isBuffer(operand,buffers):
+                    free.append(operand)
+
+            if negated:
+                if _isBuffer(result,buffers):
+                    np.logical_not(result,out=result)
+                else:
+                    result = np.logical_not(result)
+            stack.append(result)
+
+        result = stack[0]
+        if out is not None:
+            np.copyto(out,result)
+            return out
+        return result
+
+    def _evaluateMask(self,mask,args,kwargs,coordinates,buffers,free):
+        if len(mask.coordinates)==0 or not hasattr(mask,'_inside') or len(args)==0:
+            return mask(*args,**kwargs)
+
+        points = []
+        for coord in mask.coordinates:
+            if not coord in coordinates:
+                coordinates[coord] = np.asarray(getattr(args[0],coord))
+            points.append(coordinates[coord])
+
+        shape = points[0].shape
+        for i,b in enumerate(free):
+            if b.shape == shape:
+                buffer = free.pop(i)
+                break
+        else:
+            buffer = np.empty(shape,dtype=bool)
+            buffers.append(buffer)
+
+        mask._evaluateInside(points,buffer)
+        if mask.maskInside == False:
+            np.logical_not(buffer,out=buffer)
+        return buffer
+
+
+def _isBuffer(array,buffers):
+    """Check if array is one of the buffers (by identity)"""
+    return any(array is b for b in buffers)
+
+
+def _insideRotatedBox(points,center,rotationMatrix,halfEdges,out,closed=False):
+    """Check if points are inside box of half edge lengths halfEdges after rotation around center.
+
+    The rotation is performed one axis at a time to only keep a few temporary arrays in memory.
+    """
+    shape = np.shape(points[0])
+    differences = [np.subtract(p,c,dtype=float) for p,c in zip(points,center)]
+    rotated = np.empty(shape)
+    temporary = np.empty(shape)
+    inside = np.empty(shape,dtype=bool)
+    compare = np.less_equal if closed else np.less
+
+    for i,(row,halfEdge) in enumerate(zip(rotationMatrix,halfEdges)):
+        np.multiply(differences[0],row[0],out=rotated)
+        for difference,r in zip(differences[1:],row[1:]):
+            np.multiply(difference,r,out=temporary)
+            rotated+=temporary
+        np.abs(rotated,out=rotated)
+        if i == 0:
+            compare(rotated,halfEdge,out=out)
+        else:
+            compare(rotated,halfEdge,out=inside)
+            np.logical_and(out,inside,out=out)
+    return out
+
+
+
 def RotationMatrix(theta,deg=True):
     """Generate 2D rotation matrix given angle theta"""
     if deg == True:
@@ -273,6 +457,19 @@ class lineMask(MaskingObject):
             mask = np.logical_not(mask)
         return mask
 
+    @property
+    def boundingBox(self):
+        return np.array([[self.start],[self.end]],dtype=float)
+
+    def _inside(self,points,out):
+        np.greater(points[0],self.start,out=out)
+        np.logical_and(out,points[0]<=self.end,out=out)
+        return out
+
+    def _evaluateInside(self,points,out):
+        # The range check is already as cheap as the pruning
+        return self._inside(points,out)
+
 class rectangleMask(MaskingObject):
     dimensionality = '2D'
     def __init__(self,corner1,corner2,corner3=None,maskInside=True,coordinates=None):
@@ -374,19 +571,20 @@ class rectangleMask(MaskingObject):
                 points = np.array(x)
             else:
                 points = np.array([x,y])
-        # calculate mask by rotating all points so rectangle is along coordinate axes
-        # This makes the logical checks easy
-        pointShape = points.shape[1:]
-        points.shape = (2,-1)
-        
-        rotatedPoints = np.einsum('ij,jk->ik',self.rotationMatrix,np.array(points)-self.center)
-        rotatedPoints.shape = np.concatenate([[2],pointShape])
-        logic = np.array([np.logical_and(x>-0.5*edge,x<0.5*edge) for x,edge in zip(rotatedPoints,[self.height,self.length])])
-        
-        mask = np.all(logic,axis=0)
+        mask = self._evaluateInside(points,np.empty(np.shape(points[0]),dtype=bool))
         if self.maskInside == False:
             mask = np.logical_not(mask)
         return mask
+
+    @property
+    def boundingBox(self):
+        corners = np.array(self.corners)
+        return np.array([corners.min(axis=0),corners.max(axis=0)])
+
+    def _inside(self,points,out):
+        # calculate mask by rotating all points so rectangle is along coordinate axes
+        # This makes the logical checks easy
+        return _insideRotatedBox(points,self.center[:,0],self.rotationMatrix,[0.5*self.height,0.5*self.length],out)
     
 
 class boxMask(MaskingObject):
@@ -550,21 +748,20 @@ class boxMask(MaskingObject):
                 if z is None:
                     raise AttributeError('Recieved only X and Y, but no Z')
                 points = np.array([x,y,z])
-        # calculate mask by rotating all points so rectangle is along coordinate axes
-        # This makes the logical checks easy
-        pointShape = points.shape[1:]
-        
-        points.shape = (3,-1)
-        
-        rotatedPoints = np.einsum('ij,jk->ik',self.rotationMatrix,np.array(points)-self.center.T)
-        rotatedPoints.shape = np.concatenate([[3],pointShape]).astype(int)
-        logic = np.array([np.logical_and(x>=-0.5*edge,x<=0.5*edge) for x,edge in zip(rotatedPoints,[self.length,self.height,self.width])])
-        
-        mask = np.all(logic,axis=0)
+        mask = self._evaluateInside(points,np.empty(np.shape(points[0]),dtype=bool))
         if self.maskInside == False:
             mask = np.logical_not(mask)
         return mask
 
+    @property
+    def boundingBox(self):
+        return np.array([self.corners.min(axis=0),self.corners.max(axis=0)])
+
+    def _inside(self,points,out):
+        # calculate mask by rotating all points so box is along coordinate axes
+        # This makes the logical checks easy
+        return _insideRotatedBox(points,self.center[0],self.rotationMatrix,[0.5*self.length,0.5*self.height,0.5*self.width],out,closed=True)
+
 
 class circleMask(MaskingObject):
     
@@ -659,15 +856,28 @@ class circleMask(MaskingObject):
                 else:
                     points = np.array([x,y,z])
         
-        pointShape = points.shape[1:]
-        points.shape = (points.shape[0],-1)
-        
-        mask = np.linalg.norm(points-self.center,axis=0)<=self.radius
-        mask.shape = pointShape
+        mask = self._evaluateInside(points,np.empty(np.shape(points[0]),dtype=bool))
         
         if self.maskInside == False:
             mask = np.logical_not(mask)
         return mask
+
+    @property
+    def boundingBox(self):
+        return np.array([self.center[:,0]-self.radius,self.center[:,0]+self.radius])
+
+    def _inside(self,points,out):
+        distance = np.empty(np.shape(points[0]))
+        temporary = np.empty_like(distance)
+        for i,(p,c) in enumerate(zip(points,self.center[:,0])):
+            target = distance if i == 0 else temporary
+            np.subtract(p,c,out=target)
+            np.multiply(target,target,out=target)
+            if i > 0:
+                distance+=temporary
+        np.sqrt(distance,out=distance)
+        np.less_equal(distance,self.radius,out=out)
+        return out
     
 class indexMask(MaskingObject):
     dimensionality = '1D'
@@ -10,8 +10,6 @@ import warnings
 from MJOLNIR import _tools
 import datetime
 import math
-import shapely
-from shapely.geometry import Polygon as PolygonS, Point as PointS
 from MJOLNIR import TasUBlibDEG as TasUBlib
 from MJOLNIR._tools import Marray
 import MJOLNIR.Data.DataFile
@@ -371,25 +369,22 @@ class Sample(object):
         Ef = np.asarray(Ef).flatten() # Shape (n)
         Bragg = np.asarray(Bragg).reshape(-1,3) # shape (l,3)
         
-        QlLocal = []
-        if spurionType.lower() == 'monochromator':
-            for B in Bragg:
-                Ql = []
-                Angles = np.array([TasUBlib.calcTasQAngles(self.orientationMatrix,self.planeNormal,1.0,A3Off,np.array([B[0],B[1],B[2],e,e]))[:2] for e in Ef])
-                for ei in Ei:
-                    Ql.append(np.array([TasUBlib.calcTasQH(self.orientationMatrixINV,angle,ei,e,0) for angle,e in zip(Angles,Ef)])[:,1])
-                QlLocal.append(Ql)
-        elif spurionType.lower() == 'analyser':
-            for B in Bragg:
-                Ql = []
-                for ei in Ei:
-                    Angles2 = np.array(TasUBlib.calcTasQAngles(self.orientationMatrix,self.planeNormal,1.0,A3Off,np.array([B[0],B[1],B[2],ei,ei]))[:2])
-                    Ql.append(np.array([TasUBlib.calcTasQH(self.orientationMatrixINV,Angles2,ei,e,A3Off*0.0) for e in Ef])[:,1]) # Extract Qx,Qy
-                QlLocal.append(Ql)
+        l,m,n = len(Bragg),len(Ei),len(Ef)
+        if spurionType.lower() == 'monochromator': # Angles found for Ef -> Ef, shape (l,n)
+            qe = np.concatenate([np.repeat(Bragg,n,axis=0),np.tile(Ef,l).reshape(-1,1)*np.ones((1,2))],axis=1)
+            A3,A4 = TasUBlib.calcTasQAnglesBatch(self.orientationMatrix,self.planeNormal,1.0,A3Off,qe)[:2]
+            A3 = A3.reshape(l,1,n)
+            A4 = A4.reshape(l,1,n)
+        elif spurionType.lower() == 'analyser': # Angles found for Ei -> Ei, shape (l,m)
+            qe = np.concatenate([np.repeat(Bragg,m,axis=0),np.tile(Ei,l).reshape(-1,1)*np.ones((1,2))],axis=1)
+            A3,A4 = TasUBlib.calcTasQAnglesBatch(self.orientationMatrix,self.planeNormal,1.0,A3Off,qe)[:2]
+            A3 = A3.reshape(l,m,1)
+            A4 = A4.reshape(l,m,1)
         else:
             raise AttributeError('Provided spurionType not understood. Expected "Monochromator" or "Analyser" but recieved "{}".'.format(spurionType))
 
-        returnVal = np.array(QlLocal) # Shape (l,m,n,3)
+        returnVal = TasUBlib.calcTasQHBatch(self.orientationMatrixINV,A3,A4,Ei.reshape(1,m,1),Ef.reshape(1,1,n))[1]
+        returnVal.shape = (l,m,n,3) # Shape (l,m,n,3)
         
         if HKL == True or Projection == True: # need to calculate HKL for Projection calculation
             returnValShape = np.array(returnVal.shape)
@@ -10,14 +10,21 @@ import warnings
 
 from matplotlib import rc
 
-from distutils.spawn import find_executable
-if find_executable('latex'): # pragma: no cover
-    rc('text', usetex=True)
-    plt.rc('text.latex', preamble=r'\usepackage{amsmath}')
-    USETEX = True
-else:
-    rc('text', usetex=False)
-    USETEX = False
+import shutil
+USETEX = None
+
+def setupLatex(): # pragma: no cover
+    """Use LaTeX for text rendering if it is installed. The search for latex is only performed once, when the first viewer is created."""
+    global USETEX
+    if USETEX is None:
+        if shutil.which('latex'):
+            rc('text', usetex=True)
+            plt.rc('text.latex', preamble=r'\usepackage{amsmath}')
+            USETEX = True
+        else:
+            rc('text', usetex=False)
+            USETEX = False
+    return USETEX
 import scipy.optimize
 import pyperclip
 from MJOLNIR.Statistics.FittingFunction import *
@@ -177,6 +184,7 @@ class Viewer1D: # pragma: no cover
             
         For a walkthrough of the interface see :ref:`Raw plotting and fitting<Raw-plotting-and-fitting>`. 
         """
+        setupLatex()
         ## Make x data into shape (N,M) for N: num of variables, M: scanpoints
         if len(XData.shape) >= 3 or len(XData.shape)==0:
             raise AttributeError('Expected size of xData is 2 dimensions')
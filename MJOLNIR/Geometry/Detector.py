@@ -228,13 +228,39 @@ class TubeDetector1D(Detector):
         ax.plot_surface(Xcrot+pos[0], Ycrot+pos[1], Zcrot+pos[2], alpha=1.0, rstride=rstride, cstride=cstride)
         ax.plot_surface(Xcrot2+pos[0], Ycrot2+pos[1], Zcrot2+pos[2], alpha=1.0, rstride=rstride, cstride=cstride)
 
-    def getPixelPositions(self):
-        """Return pixel positions relative to center."""
+    def getPixelPositions(self,split=True):
+        """Return pixel positions relative to center.
+
+        Kwargs:
+
+            - split (bool): If True, pixels are split into the areas given by split and pixels outside are discarded. Otherwise all pixels are returned as one array (default True)
+
+        """
         scale = (np.arange(self.pixels,dtype=float)-(self.pixels-1.0)/2.0)/self.pixels*self.length   # the distance of the pixels relative to the central pixel
         scale.shape=(self.pixels,1)
         direction = self.direction.copy()
         direction.shape=(1,3)
         pixelPositions = np.dot(scale,direction)+self.position
+        if not split:
+            return pixelPositions
 
         return np.split(pixelPositions,self.split)[1:-1]
+
+    def getSplitIndices(self):
+        """Return pixel indices and area number of all pixels within the areas given by split, equivalent to the splitting done in getPixelPositions.
+
+        Returns:
+
+            - pixelIndex (array): Index of pixels inside areas in order.
+
+            - area (array): Area number of each pixel.
+
+        """
+        edges = np.clip(self.split,0,self.pixels)
+        lower = edges[:-1]
+        upper = np.maximum(lower,edges[1:]) # Decreasing edges give empty areas
+        counts = upper-lower
+        area = np.repeat(np.arange(len(counts)),counts)
+        pixelIndex = np.arange(np.sum(counts))-np.repeat(np.cumsum(counts)-counts,counts)+np.repeat(lower,counts)
+        return pixelIndex,area
     
\ No newline at end of file
@@ -13,9 +13,26 @@ from scipy.stats import norm
 import h5py as hdf
 import datetime
 import pytest
+from collections import OrderedDict
+import itertools
+import copy
+import concurrent.futures
+import hashlib
+import json
+import zipfile
 
 NumberOfSigmas= 3 # Defining the active area of a peak on a detector as \pm n*sigma
 
+factorLambdasqrtE = 9.0445678
+
+# Calculated A4 and Ef for the most recently initialized geometries
+geometryCache = OrderedDict()
+geometryCacheSize = 16
+
+# Folder holding compiled instrument files, named by hash of the XML file
+compiledInstrumentFolder = os.path.join(os.path.expanduser("~"),'.MJOLNIRInstruments')
+compiledInstrumentVersion = 1
+
 
 
 class Instrument(GeometryConcept.GeometryConcept):
@@ -124,43 +141,84 @@ class Instrument(GeometryConcept.GeometryConcept):
 
     def initialize(self):
         """Method to initialize and perform analytical calculations of scattering quantities. 
+        Pixels of all wedges are stacked and A4 and Ef are calculated for all of them at once. Results are cached
+        for each geometry such that re-initializing an unchanged geometry is free.
         Initializes:
 
             -  A4: Matrix holding pixel A4. Shape (len(Wedges),len(detectors),pixels)
             
             -  Ef: Matrix holding pixel Ef. Shape (len(Wedges),len(detectors),pixels)
         """
-        factorLambdasqrtE = 9.0445678
-
         if(len(self.wedges)==0):
             raise ValueError('Instrument does not contain any wedges and can thus not be initialized.')
-        self._A4 = []
-        self._Ef = []
-        self._pixelPosition = []
-        self._analyserPosition = []
-        beamDirection = np.array([0.0,1.0,0.0])
 
-        for wedge in self.wedges:
-            detectorPixelPositions,analyserPixelPositions = wedge.calculateDetectorAnalyserPositions()
+        key = self.geometryKey()
+        if key in geometryCache:
+            geometryCache.move_to_end(key)
+            self._A4,self._Ef,self._pixelPosition,self._analyserPosition = _copyGeometry(geometryCache[key])
+            self.settings['Initialized']=True
+            return
 
-            A4 = [-np.arccos(np.divide(np.dot(AnalyserPos,beamDirection),
-                np.linalg.norm(AnalyserPos,axis=1)))*np.sign(np.cross(AnalyserPos,beamDirection)[:,-1]) for AnalyserPos in analyserPixelPositions]
+        self._A4,self._Ef,self._pixelPosition,self._analyserPosition = calculateWedgeGeometry(self.wedges)
 
-                
-            relPos = [detectorPixelPositions[i]-analyserPixelPositions[i] for i in range(len(analyserPixelPositions))]
+        geometryCache[key] = _copyGeometry((self._A4,self._Ef,self._pixelPosition,self._analyserPosition)) # Instances never share arrays with the cache
+        if len(geometryCache)>geometryCacheSize:
+            geometryCache.popitem(last=False)
 
-            A6 = [np.arccos(np.divide(np.einsum('ij,ij->i',analyserPixelPositions[i],relPos[i]),
-                np.linalg.norm(analyserPixelPositions[i],axis=1)*np.linalg.norm(relPos[i],axis=1))) for i in range(len(analyserPixelPositions))]
-            Ef = [np.power(factorLambdasqrtE/(wedge.analysers[0].d_spacing*2.0*np.sin(A6Sub/2.0)),2.0) for A6Sub in A6] 
-            self._A4.append(A4)
-            self._Ef.append(Ef)
-            self._pixelPosition.append(detectorPixelPositions)
-            self._analyserPosition.append(analyserPixelPositions)
+        self.settings['Initialized']=True
 
+    def geometryKey(self):
+        """Hashable description of all geometry parameters entering the calculation of A4 and Ef."""
+        return tuple([wedgeGeometryKey(wedge) for wedge in self.wedges])
 
+    def toRecords(self):
+        """Stacked array representation of wedges, analysers, and detectors of instrument. Only FlatAnalyser and TubeDetector1D are supported.
 
+        Returns:
 
-        self.settings['Initialized']=True
+            - records (dict): Dictionary with record arrays 'wedges', 'analysers', and 'detectors' and the concatenated detector 'splits'.
+
+        """
+        wedges = []
+        analysers = []
+        detectors = []
+        splits = []
+        splitStart = 0
+        for wedgeNumber,wedge in enumerate(self.wedges):
+            concept = np.asarray(wedge.settings['concept']).reshape(-1)[0]
+            wedges.append((wedge.position,str(concept)))
+            for ana in wedge.analysers:
+                if not type(ana) is Analyser.FlatAnalyser:
+                    raise AttributeError('Only FlatAnalyser can be converted to records, got {}.'.format(type(ana)))
+                analysers.append((wedgeNumber,ana.position,ana.direction,ana.d_spacing,ana.mosaicity,ana.width,ana.height))
+            for det in wedge.detectors:
+                if not type(det) is Detector.TubeDetector1D:
+                    raise AttributeError('Only TubeDetector1D can be converted to records, got {}.'.format(type(det)))
+                detectors.append((wedgeNumber,det.position,det.direction,det.pixels,det.length,det.diameter,splitStart,splitStart+len(det.split)))
+                splits.extend(det.split)
+                splitStart+=len(det.split)
+        return {'wedges':np.array(wedges,dtype=wedgeRecordDtype),'analysers':np.array(analysers,dtype=analyserRecordDtype),
+                'detectors':np.array(detectors,dtype=detectorRecordDtype),'splits':np.array(splits,dtype=int)}
+
+    def sweep(self,parameters,workers=1):
+        """Wrapper for sweepGeometry calculating A4 and Ef of all pixels for a grid of geometry perturbations of the instrument.
+
+        Args:
+
+            - parameters (dict): Mapping from parameter, e.g. 'analysers.d_spacing' or 'wedges[0].position', to list of perturbations.
+
+        Kwargs:
+
+            - workers (int): Number of threads used to calculate wedges (default 1)
+
+        Returns:
+
+            - A4 (array): A4 of shape (*grid,len(wedges),len(detectors),pixels).
+
+            - Ef (array): Ef of same shape as A4.
+
+        """
+        return sweepGeometry(self,parameters,workers=workers)
 
     @property
     def A4(self):
@@ -723,14 +781,443 @@ class Instrument(GeometryConcept.GeometryConcept):
             if not A4datafile is False: # pragma: no cover
                 A4File.close()
 
+def calculateA4Ef(analyserPosition,pixelPosition,dSpacing):
+    """Calculate A4 and Ef of stacked pixels.
+
+    Args:
+
+        - analyserPosition (array): Position of neutron on analyser for each pixel of shape (n,3).
+
+        - pixelPosition (array): Position of pixels of shape (n,3).
+
+        - dSpacing (float or array): d spacing of analyser for each pixel in Angstrom.
+
+    Returns:
+
+        - A4 (array): Scattering angle in radians of each pixel.
+
+        - Ef (array): Final energy in meV of each pixel.
+
+    """
+    beamDirection = np.array([0.0,1.0,0.0])
+    A4 = -np.arccos(np.divide(np.dot(analyserPosition,beamDirection),
+        np.linalg.norm(analyserPosition,axis=1)))*np.sign(np.cross(analyserPosition,beamDirection)[:,-1])
+
+    relPos = pixelPosition-analyserPosition
+    A6 = np.arccos(np.divide(np.einsum('ij,ij->i',analyserPosition,relPos),
+        np.linalg.norm(analyserPosition,axis=1)*np.linalg.norm(relPos,axis=1)))
+    Ef = np.power(factorLambdasqrtE/(dSpacing*2.0*np.sin(A6/2.0)),2.0)
+    return A4,Ef
+
+
+def _copyGeometry(geometry):
+    """Copy nested lists of arrays of A4, Ef, pixel positions, and analyser positions"""
+    return tuple([[[np.array(x,copy=True) for x in inner] for inner in quantity] for quantity in geometry])
+
+
+def wedgeGeometryKey(wedge):
+    """Hashable description of all geometry parameters of wedge entering the calculation of A4 and Ef."""
+    def array(x):
+        return tuple(np.asarray(x,dtype=float).ravel())
+    analysers = tuple([(array(ana.position),float(ana.d_spacing)) for ana in wedge.analysers])
+    detectors = tuple([(array(det.position),array(det.direction),int(det.pixels),float(det.length),tuple(np.asarray(det.split,dtype=int))) for det in wedge.detectors])
+    return (array(wedge.position),str(wedge.settings['concept']),analysers,detectors)
+
+
+def calculateWedgeGeometry(wedges):
+    """Calculate pixel and analyser positions together with A4 and Ef for all pixels in wedges. 
+    Pixels of all wedges are stacked such that A4 and Ef are found at once.
+
+    Args:
+
+        - wedges (list): Wedges to be calculated.
+
+    Returns:
+
+        - A4 (list): A4 of shape (len(wedges),len(detectors),pixels).
+
+        - Ef (list): Ef of shape (len(wedges),len(detectors),pixels).
+
+        - pixelPosition (list): Pixel positions for each wedge and detector.
+
+        - analyserPosition (list): Analyser positions for each wedge and detector.
+
+    """
+    pixelPositions = []
+    analyserPositions = []
+    dSpacing = []
+    for wedge in wedges:
+        detectorPixelPositions,analyserPixelPositions = wedge.calculateDetectorAnalyserPositions()
+        pixelPositions.append(detectorPixelPositions)
+        analyserPositions.append(analyserPixelPositions)
+        dSpacing.append(np.full(np.sum([len(x) for x in analyserPixelPositions],dtype=int),wedge.analysers[0].d_spacing))
+
+    counts = [len(x) for analyserPixelPositions in analyserPositions for x in analyserPixelPositions]
+    analyserPosition = np.concatenate([x for analyserPixelPositions in analyserPositions for x in analyserPixelPositions])
+    pixelPosition = np.concatenate([np.reshape(x,(-1,3)) for detectorPixelPositions in pixelPositions for x in detectorPixelPositions])
+
+    A4,Ef = calculateA4Ef(analyserPosition,pixelPosition,np.concatenate(dSpacing))
+
+    # Split stacked pixels into wedges and detectors again
+    splits = np.cumsum(counts)[:-1]
+    A4 = np.split(A4,splits)
+    Ef = np.split(Ef,splits)
+    wedgeA4 = []
+    wedgeEf = []
+    for analyserPixelPositions in analyserPositions:
+        wedgeA4.append(A4[:len(analyserPixelPositions)])
+        wedgeEf.append(Ef[:len(analyserPixelPositions)])
+        A4 = A4[len(analyserPixelPositions):]
+        Ef = Ef[len(analyserPixelPositions):]
+
+    return wedgeA4,wedgeEf,pixelPositions,analyserPositions
+
+
+sweepAttributes = ['position','direction','d_spacing','length','pixels']
+
+def _resolveSweepParameter(instrument,name):
+    """Find objects and attribute described by sweep parameter name, e.g. 'wedges[0].analysers[2].position' or 'detectors.length'"""
+    parts = name.split('.')
+    attribute = parts[-1]
+    if not attribute in sweepAttributes:
+        raise AttributeError('Sweep attribute "{}" not understood. Should be one of {}'.format(attribute,', '.join(sweepAttributes)))
+    if len(parts)<2:
+        raise AttributeError('Sweep parameter "{}" does not describe any wedge, analyser, or detector.'.format(name))
+    objects = [instrument]
+    for part in parts[:-1]:
+        level,_,index = part.partition('[')
+        if level in ['analysers','detectors'] and isinstance(objects[0],Instrument): # Analysers or detectors of all wedges
+            objects = [wedge for instr in objects for wedge in instr.wedges]
+        elif not (level == 'wedges' and isinstance(objects[0],Instrument)) and not (level in ['analysers','detectors'] and isinstance(objects[0],Wedge.Wedge)):
+            raise AttributeError('Sweep parameter "{}" not understood.'.format(name))
+        try:
+            if index == '':
+                objects = [child for obj in objects for child in getattr(obj,level)]
+            else:
+                objects = [getattr(obj,level)[int(index.rstrip(']'))] for obj in objects]
+        except (IndexError,ValueError):
+            raise AttributeError('Index in sweep parameter "{}" not understood.'.format(name))
+    if len(objects) == 0 or not all([hasattr(obj,attribute) for obj in objects]):
+        raise AttributeError('Sweep parameter "{}" does not describe any object with attribute {}.'.format(name,attribute))
+    return objects,attribute
+
+
+def _setSweepAttribute(obj,attribute,value):
+    if attribute == 'pixels': # Areas of detector are scaled with the number of pixels
+        split = np.round(np.asarray(obj.split,dtype=float)*value/obj.pixels).astype(int)
+        obj.pixels = value
+        obj.split = list(split)
+    else:
+        setattr(obj,attribute,value)
+
+
+def sweepGeometry(instrument,parameters,workers=1):
+    """Calculate A4 and Ef of all pixels for a grid of geometry perturbations of an instrument. The perturbations are added to the values
+    of the base instrument. Wedges unchanged between variants are only calculated once and unique wedges are calculated in parallel.
+
+    Args:
+
+        - instrument (Instrument): Base instrument. It is left unchanged.
+
+        - parameters (dict): Mapping from parameter to list of perturbations. Parameters are given as e.g. 'wedges[0].analysers[2].position',
+          'analysers.d_spacing' (all analysers), 'wedges.position', 'detectors.length', or 'detectors[3].pixels'. Splits of detectors are scaled with pixels.
+
+    Kwargs:
+
+        - workers (int): Number of threads used to calculate wedges (default 1)
+
+    Returns:
+
+        - A4 (array): A4 of shape (*grid,len(wedges),len(detectors),pixels) where grid has one axis per parameter. If variants have different numbers of pixels an object array of shape grid is returned.
+
+        - Ef (array): Ef of same shape as A4.
+
+    Raises:
+
+        - AttributeError
+
+    Example:
+        >>> A4,Ef = sweepGeometry(instr,{'analysers.d_spacing':[-0.01,0.0,0.01],'wedges[0].position':[[0,0,0],[0.001,0,0]]})
+        >>> A4.shape
+        (3, 2, 8, 13, 1024)
+    """
+    names = list(parameters.keys())
+    targets = [_resolveSweepParameter(instrument,name) for name in names]
+    values = [list(parameters[name]) for name in names]
+    gridShape = tuple([len(v) for v in values])
+
+    uniqueWedges = OrderedDict() # Wedge key to copy of wedge
+    variantKeys = []
+    for combination in itertools.product(*values):
+        originals = []
+        try:
+            for (objects,attribute),perturbation in zip(targets,combination):
+                for obj in objects:
+                    original = getattr(obj,attribute)
+                    originals.append((obj,attribute,original,copy.copy(obj.split) if attribute == 'pixels' else None))
+                    newValue = np.asarray(original)+np.asarray(perturbation)
+                    if attribute == 'pixels':
+                        newValue = int(newValue)
+                    _setSweepAttribute(obj,attribute,newValue)
+            keys = []
+            for wedge in instrument.wedges:
+                key = wedgeGeometryKey(wedge)
+                if not key in uniqueWedges:
+                    uniqueWedges[key] = copy.deepcopy(wedge)
+                keys.append(key)
+            variantKeys.append(keys)
+        finally: # Restore base instrument in reverse order as objects might be perturbed multiple times
+            for obj,attribute,original,split in reversed(originals):
+                if attribute == 'pixels':
+                    obj.pixels = original
+                    obj.split = list(split)
+                else:
+                    setattr(obj,attribute,original)
+
+    keys = list(uniqueWedges.keys())
+    wedges = list(uniqueWedges.values())
+    if workers>1 and len(wedges)>1:
+        chunks = np.array_split(np.arange(len(wedges)),min(workers,len(wedges)))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(lambda chunk: calculateWedgeGeometry([wedges[i] for i in chunk]),chunks))
+        wedgeA4 = [a for result in results for a in result[0]]
+        wedgeEf = [e for result in results for e in result[1]]
+    else:
+        wedgeA4,wedgeEf,_,_ = calculateWedgeGeometry(wedges)
+    wedgeResults = dict(zip(keys,zip(wedgeA4,wedgeEf)))
+
+    variants = [[wedgeResults[key] for key in keys] for keys in variantKeys]
+
+    def stack(index): # Stack variants if all of them are regular arrays of the same shape
+        arrays = []
+        for variant in variants:
+            if len(set([len(det) for wedge in variant for det in wedge[index]]))!=1 or len(set([len(wedge[index]) for wedge in variant]))!=1:
+                return None
+            arrays.append(np.array([wedge[index] for wedge in variant]))
+        if len(set([a.shape for a in arrays]))!=1:
+            return None
+        return np.array(arrays).reshape(gridShape+arrays[0].shape)
+
+    A4 = stack(0)
+    Ef = stack(1)
+    if A4 is None:
+        A4 = np.empty(len(variants),dtype=object)
+        Ef = np.empty(len(variants),dtype=object)
+        for i,variant in enumerate(variants):
+            A4[i] = [wedge[0] for wedge in variant]
+            Ef[i] = [wedge[1] for wedge in variant]
+        A4 = A4.reshape(gridShape)
+        Ef = Ef.reshape(gridShape)
+    return A4,Ef
+
+
+# Struct of arrays representation of flat analysers and tube detectors. Splits of all detectors are stored in one array.
+analyserRecordDtype = np.dtype([('wedge',int),('position',float,(3,)),('direction',float,(3,)),('d_spacing',float),('mosaicity',float),('width',float),('height',float)])
+detectorRecordDtype = np.dtype([('wedge',int),('position',float,(3,)),('direction',float,(3,)),('pixels',int),('length',float),('diameter',float),('splitStart',int),('splitStop',int)])
+wedgeRecordDtype = np.dtype([('position',float,(3,)),('concept','U16')])
+
+
+def _normalizedDirections(directions):
+    """Validate and normalize stacked directions as done by GeometryObject.direction for each object"""
+    directions = np.array(directions,dtype=float).reshape(-1,3)
+    norms = np.sqrt(np.einsum('ij,ij->i',directions,directions))
+    if np.any(np.abs(norms)<1e-10):
+        raise AttributeError('Length of direction is not allowed to be zero')
+    return directions/norms.reshape(-1,1)
+
+
+def createAnalysers(records):
+    """Create flat analysers from record array of type analyserRecordDtype. Values are validated for all analysers at once
+    and positions and directions of the analysers are views into shared arrays.
+
+    Args:
+
+        - records (array): Record array of analysers.
+
+    Returns:
+
+        - analysers (list): List of FlatAnalyser objects.
+
+    Raises:
+
+        - AttributeError
+
+    """
+    if len(records)==0:
+        return []
+    if np.any(records['d_spacing']<0.0) or np.any(records['mosaicity']<0.0) or np.any(records['width']<0) or np.any(records['height']<0.0):
+        raise AttributeError('Analyser d spacing, mosaicity, width, and height must be non-negative.')
+    if np.any(records['d_spacing']>10.0):
+        warnings.warn('The unit of d spacing is Angstrom')
+    if np.any(records['mosaicity']<1.0):
+        warnings.warn('The unit of mosaicity is arcminutes')
+    positions = np.array(records['position'],dtype=float)
+    directions = _normalizedDirections(records['direction'])
+
+    prototype = Analyser.FlatAnalyser(position=(0.0,0.0,0.0),direction=(0.0,0.0,1.0))
+    analysers = []
+    for position,direction,d_spacing,mosaicity,width,height in zip(positions,directions,records['d_spacing'].tolist(),records['mosaicity'].tolist(),
+                                                                   records['width'].tolist(),records['height'].tolist()):
+        ana = copy.copy(prototype)
+        ana._position = position
+        ana._direction = direction
+        ana._d_spacing = d_spacing
+        ana._mosaicity = mosaicity
+        ana._width = width
+        ana._height = height
+        analysers.append(ana)
+    return analysers
+
+
+def createDetectors(records,splits):
+    """Create tube detectors from record array of type detectorRecordDtype. Values are validated for all detectors at once
+    and positions and directions of the detectors are views into shared arrays.
+
+    Args:
+
+        - records (array): Record array of detectors.
+
+        - splits (array): Splits of all detectors concatenated. Split of detector i is splits[splitStart[i]:splitStop[i]].
+
+    Returns:
+
+        - detectors (list): List of TubeDetector1D objects.
+
+    Raises:
+
+        - AttributeError
+
+    """
+    if len(records)==0:
+        return []
+    if np.any(records['pixels']<1) or np.any(records['length']<0) or np.any(records['diameter']<0):
+        raise AttributeError('Detector pixels must be positive and length and diameter non-negative.')
+    positions = np.array(records['position'],dtype=float)
+    directions = _normalizedDirections(records['direction'])
+    splits = np.asarray(splits,dtype=int)
+
+    prototype = Detector.TubeDetector1D(position=(0.0,0.0,0.0),direction=(0.0,0.0,1.0))
+    detectors = []
+    for position,direction,pixels,length,diameter,start,stop in zip(positions,directions,records['pixels'].tolist(),records['length'].tolist(),
+                                                                    records['diameter'].tolist(),records['splitStart'].tolist(),records['splitStop'].tolist()):
+        det = copy.copy(prototype)
+        det._position = position
+        det._direction = direction
+        det._pixels = pixels
+        det._length = length
+        det._diameter = diameter
+        det._split = splits[start:stop] if stop>start else np.array([0,pixels],dtype=int)
+        detectors.append(det)
+    return detectors
+
+
+def instrumentFromRecords(records,position=(0.0,0.0,0.0)):
+    """Create instrument from stacked array representation as generated by Instrument.toRecords.
+
+    Args:
+
+        - records (dict): Dictionary with record arrays 'wedges', 'analysers', and 'detectors' and the concatenated detector 'splits'.
+
+    Kwargs:
+
+        - position (float 3): Position of instrument (default (0,0,0)).
+
+    Returns:
+
+        - instrument (Instrument): Instrument holding FlatAnalyser and TubeDetector1D objects.
+
+    """
+    analysers = createAnalysers(records['analysers'])
+    detectors = createDetectors(records['detectors'],records['splits'])
+    wedges = []
+    for wedgeNumber,wedgeRecord in enumerate(records['wedges']):
+        wedge = Wedge.Wedge(position=wedgeRecord['position'],concept=str(wedgeRecord['concept']))
+        wedge.append([ana for ana,w in zip(analysers,records['analysers']['wedge']) if w==wedgeNumber])
+        wedge.append([det for det,w in zip(detectors,records['detectors']['wedge']) if w==wedgeNumber])
+        wedges.append(wedge)
+    return Instrument(position=position,wedges=wedges)
+
+
+def _parseXMLRecords(instr_root):
+    """Parse analysers and detectors of XML instrument into record arrays. Returns None if the XML contains other
+    objects or attributes than handled by createAnalysers and createDetectors, or if values are missing or malformed."""
+    analyserFields = set(['position','direction','d_spacing','mosaicity','width','height'])
+    detectorFields = set(['position','direction','pixels','length','diameter','split'])
+    analyserDefaults = {'d_spacing':3.35,'mosaicity':60,'width':0.05,'height':0.1}
+    detectorDefaults = {'pixels':1024,'length':0.25,'diameter':0.02}
+    analysers = []
+    detectors = []
+    splits = []
+    splitStart = 0
+    try:
+        for wedgeNumber,wedge in enumerate(list(instr_root)):
+            if wedge.tag != 'Wedge':
+                return None
+            for item in list(wedge):
+                attributes = dict([(key,item.get(key).strip().split(',')) for key in item.keys()])
+                if not 'position' in attributes or not 'direction' in attributes or len(attributes['position'])!=3 or len(attributes['direction'])!=3:
+                    return None
+                position = [float(x) for x in attributes['position']]
+                direction = [float(x) for x in attributes['direction']]
+                if item.tag == 'FlatAnalyser' and set(attributes.keys()).issubset(analyserFields):
+                    values = [float(attributes[key][0]) if key in attributes and len(attributes[key])==1 else analyserDefaults[key] for key in ['d_spacing','mosaicity','width','height']]
+                    if any([key in attributes and len(attributes[key])!=1 for key in analyserDefaults]):
+                        return None
+                    analysers.append(tuple([wedgeNumber,position,direction]+values))
+                elif item.tag == 'TubeDetector1D' and set(attributes.keys()).issubset(detectorFields):
+                    if any([key in attributes and len(attributes[key])!=1 for key in detectorDefaults]):
+                        return None
+                    pixels,length,diameter = [float(attributes[key][0]) if key in attributes else detectorDefaults[key] for key in ['pixels','length','diameter']]
+                    split = [int(x) for x in attributes['split']] if 'split' in attributes and len(attributes['split'])>1 else []
+                    if 'split' in attributes and len(attributes['split'])==1: # Single split values are not supported by TubeDetector1D
+                        return None
+                    detectors.append((wedgeNumber,position,direction,int(pixels),length,diameter,splitStart,splitStart+len(split)))
+                    splits.extend(split)
+                    splitStart+=len(split)
+                else:
+                    return None
+    except ValueError: # Malformed values are reported by the objects themselves
+        return None
+    return {'analysers':np.array(analysers,dtype=analyserRecordDtype),'detectors':np.array(detectors,dtype=detectorRecordDtype),'splits':np.array(splits,dtype=int)}
+
+
+def _wedgeSettings(attributes):
+    """Convert XML attributes of wedge into keyword arguments of Wedge"""
+    wedgeSettings = {}
+    for attrib in attributes:
+        if attrib=='concept':
+            wedgeSettings[attrib]=np.array(attributes[attrib].strip().split(','),dtype=str)
+        else:        
+            wedgeSettings[attrib]=np.array(attributes[attrib].strip().split(','),dtype=float)
+    return wedgeSettings
+
+
+def _buildInstrument(Instr,instrumentAttributes,wedgeAttributes,records):
+    """Fill instrument from XML attributes of instrument and wedges together with record arrays of analysers and detectors"""
+    for attrib in instrumentAttributes:
+        if attrib=='position':
+            Instr.position = np.array(instrumentAttributes[attrib].split(','),dtype=float)
+        Instr.settings[attrib]=instrumentAttributes[attrib]
+    Instr._wedges=[]
+    analysers = createAnalysers(records['analysers'])
+    detectors = createDetectors(records['detectors'],records['splits'])
+    for wedgeNumber,attributes in enumerate(wedgeAttributes):
+        temp_wedge = Wedge.Wedge(**_wedgeSettings(attributes))
+        temp_wedge.append([ana for ana,w in zip(analysers,records['analysers']['wedge']) if w==wedgeNumber])
+        temp_wedge.append([det for det,w in zip(detectors,records['detectors']['wedge']) if w==wedgeNumber])
+        Instr.append(temp_wedge)
+
+
 def parseXML(Instr,fileName):
     import xml.etree.ElementTree as ET
 
     tree = ET.parse(fileName)
     instr_root = tree.getroot()
 
-    
-    
+    records = _parseXMLRecords(instr_root)
+    if not records is None: # Only flat analysers and tube detectors are present and these are created from stacked arrays
+        _buildInstrument(Instr,dict(instr_root.attrib),[dict(wedge.attrib) for wedge in list(instr_root)],records)
+        return
         
     for attrib in instr_root.keys():
         if attrib=='position':
@@ -745,15 +1232,7 @@ def parseXML(Instr,fileName):
             Wedgeclass_ = getattr(Wedge, wedge.tag)
         else:
             raise ValueError("Element is supposed to be a Wedge, but got '{}'.".format(wedge.tag))
-        wedgeSettings = {}
-        
-        for attrib in wedge.keys():
-            if attrib=='concept':
-                wedgeSettings[attrib]=np.array(wedge.attrib[attrib].strip().split(','),dtype=str)
-            else:        
-                wedgeSettings[attrib]=np.array(wedge.attrib[attrib].strip().split(','),dtype=float)
-            
-        temp_wedge = Wedgeclass_(**wedgeSettings)
+        temp_wedge = Wedgeclass_(**_wedgeSettings(wedge.attrib))
         
         
         
@@ -803,6 +1282,146 @@ def parseXML(Instr,fileName):
     
    
 
+def _flattenNested(nested):
+    """Flatten list of lists of arrays into one array together with the shape of all arrays"""
+    shapes = [[list(np.shape(x)) for x in inner] for inner in nested]
+    data = [np.asarray(x).ravel() for inner in nested for x in inner]
+    return np.concatenate(data) if len(data)>0 else np.array([]),json.dumps(shapes)
+
+
+def _unflattenNested(data,shapes):
+    """Inverse of _flattenNested"""
+    nested = []
+    start = 0
+    for inner in json.loads(shapes):
+        arrays = []
+        for shape in inner:
+            stop = start+int(np.prod(shape,dtype=int))
+            arrays.append(data[start:stop].reshape(shape))
+            start = stop
+        nested.append(arrays)
+    return nested
+
+
+def compiledInstrumentFile(fileName,cacheFolder=None):
+    """Location of compiled instrument file of XML file. The name is given by the hash of the XML content, such that any change 
+    of the XML file results in a new compiled file.
+
+    Args:
+
+        - fileName (string): Location of XML instrument file.
+
+    Kwargs:
+
+        - cacheFolder (string): Folder of compiled instruments (default compiledInstrumentFolder in home folder).
+
+    """
+    if cacheFolder is None:
+        cacheFolder = compiledInstrumentFolder
+    with open(fileName,'rb') as f:
+        fileHash = hashlib.sha256(f.read()).hexdigest()
+    return os.path.join(cacheFolder,'{}_v{}.npz'.format(fileHash,compiledInstrumentVersion))
+
+
+def compileInstrument(fileName,cacheFolder=None):
+    """Parse and initialize XML instrument and save it as compiled binary file holding analyser and detector records 
+    together with pixel positions, A4, and Ef. Only instruments consisting of FlatAnalyser and TubeDetector1D can be compiled.
+
+    Args:
+
+        - fileName (string): Location of XML instrument file.
+
+    Kwargs:
+
+        - cacheFolder (string): Folder of compiled instruments (default compiledInstrumentFolder in home folder).
+
+    Returns:
+
+        - compiledFile (string): Location of compiled instrument.
+
+    Raises:
+
+        - AttributeError
+
+    """
+    import xml.etree.ElementTree as ET
+    instr_root = ET.parse(fileName).getroot()
+    records = _parseXMLRecords(instr_root)
+    if records is None:
+        raise AttributeError('Instrument file {} contains objects that cannot be compiled. Only FlatAnalyser and TubeDetector1D are supported.'.format(fileName))
+    instrumentAttributes = dict(instr_root.attrib)
+    wedgeAttributes = [dict(wedge.attrib) for wedge in list(instr_root)]
+
+    Instr = Instrument()
+    Instr._settings = {}
+    _buildInstrument(Instr,instrumentAttributes,wedgeAttributes,records)
+    Instr.initialize()
+
+    bundle = {'instrumentAttributes':json.dumps(instrumentAttributes),'wedgeAttributes':json.dumps(wedgeAttributes)}
+    bundle.update(records)
+    for name,value in [('A4',Instr._A4),('Ef',Instr._Ef),('pixelPosition',Instr._pixelPosition),('analyserPosition',Instr._analyserPosition)]:
+        bundle[name],bundle[name+'Shapes'] = _flattenNested(value)
+
+    compiledFile = compiledInstrumentFile(fileName,cacheFolder=cacheFolder)
+    folder = os.path.dirname(compiledFile)
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+    tempFile = compiledFile+'.{}.tmp'.format(os.getpid())
+    with open(tempFile,'wb') as f:
+        np.savez(f,**bundle)
+    os.replace(tempFile,compiledFile) # Never leave a partially written file
+    return compiledFile
+
+
+def loadInstrument(fileName,cacheFolder=None):
+    """Load XML instrument file using its compiled form. The instrument is compiled on first use and loaded from
+    the binary file afterwards. Instruments that cannot be compiled are parsed from the XML file. The returned instrument
+    is initialized, i.e. A4 and Ef are available.
+
+    Args:
+
+        - fileName (string): Location of XML instrument file.
+
+    Kwargs:
+
+        - cacheFolder (string): Folder of compiled instruments (default compiledInstrumentFolder in home folder).
+
+    Returns:
+
+        - instrument (Instrument): Initialized instrument.
+
+    """
+    compiledFile = compiledInstrumentFile(fileName,cacheFolder=cacheFolder)
+    if not os.path.isfile(compiledFile):
+        try:
+            compileInstrument(fileName,cacheFolder=cacheFolder)
+        except AttributeError: # Instrument cannot be compiled
+            return _loadXMLInstrument(fileName)
+        except (OSError,ValueError) as e: # Compiled instrument cannot be saved, e.g. read only home folder
+            warnings.warn('Compiled instrument could not be saved to {}: {}'.format(compiledFile,e))
+            return _loadXMLInstrument(fileName)
+
+    try:
+        with np.load(compiledFile,allow_pickle=False) as npzFile:
+            bundle = dict(npzFile.items()) # Every access of NpzFile reads from disk
+        Instr = Instrument()
+        Instr._settings = {}
+        _buildInstrument(Instr,json.loads(str(bundle['instrumentAttributes'])),json.loads(str(bundle['wedgeAttributes'])),bundle)
+        Instr._A4,Instr._Ef,Instr._pixelPosition,Instr._analyserPosition = [_unflattenNested(bundle[name],str(bundle[name+'Shapes'])) for name in ['A4','Ef','pixelPosition','analyserPosition']]
+    except (OSError,ValueError,KeyError,AttributeError,zipfile.BadZipFile) as e: # Truncated or foreign file
+        warnings.warn('Compiled instrument {} could not be loaded: {}'.format(compiledFile,e))
+        return _loadXMLInstrument(fileName)
+    Instr.settings['Initialized']=True
+    return Instr
+
+
+def _loadXMLInstrument(fileName):
+    """Parse and initialize instrument from XML file"""
+    Instr = Instrument(fileName=fileName)
+    Instr.initialize()
+    return Instr
+
+
 def getNX_class(x,y,attribute):
     try:
         variableType = y.attrs['NX_class']
@@ -142,60 +142,58 @@ class Wedge(GeometryConcept.GeometryConcept):
         return string
 
     def calculateDetectorAnalyserPositions(self):
-        """Find neutron position on analyser and detector. Assuming that the analyser is in the z=0 plane."""
+        """Find neutron position on analyser and detector. Assuming that the analyser is in the z=0 plane.
+        Pixels of all detectors are stacked such that the analyser positions are found for all pixels at once."""
         if(len(self.detectors)==0 or len(self.analysers)==0):
             raise ValueError('Wedge does not contain detectors and/or analysers.')
 
-        detectorPixelPositions = []
-        analyserPixelPositions = []
-        if self.settings['concept']=='OneToOne':
+        oneToOne = self.settings['concept']=='OneToOne'
+        if oneToOne:
             if len(self.detectors)!=len(self.analysers):
                 raise RuntimeError('Concept set to OneToOne but number of detectors does not mach analysers ({}!?{}'.format(len(self.detectors),len(self.analysers)))
-            detectorCounter = 0
-            for det in self.detectors:
-                PixelPos = det.getPixelPositions()+self.position
-                if len(PixelPos)!=1:
-                    raise ValueError("OneToOne concept chosen by detector split into multiple parts!")
-                detectorPixelPositions.append(PixelPos)
-                LDA = PixelPos[0]-self.analysers[detectorCounter].position # Detector - analyser vector
-                LAS = self.analysers[detectorCounter].position+self.position
-                vertical = np.array([0,0,1])
-
-                perpVect = np.cross(vertical,LAS)
-
-                deltaXD = np.dot(PixelPos,perpVect)
-
-                LD = np.linalg.norm(LDA,axis=1)
-                LA = np.linalg.norm(LAS)
-
-                deltaXDprime = deltaXD/(LD/LA+1.0)
-
-                analyserPixelPositions.append(np.outer(deltaXDprime,perpVect)+self.analysers[detectorCounter].position+self.position)
-                detectorCounter+=1
-
-        elif self.settings['concept']=='ManyToMany':
-            for det in self.detectors:
-                PixelPos = [x +self.position for x in det.getPixelPositions()]
-                if len(PixelPos)!=len(self.analysers):
-                    raise ValueError("ManyToMany concept chosen by detector split into number of parts not matching number of analysers!")
-                detectorPixelPositions.append(np.concatenate(PixelPos))
-                
-                vertical = np.array([0,0,1])
-                
-                LAS = [self.analysers[i].position+self.position for i in range(len(PixelPos))]
-                perpVect = [np.cross(vertical,LAS[i])/(np.linalg.norm(np.cross(vertical,LAS[i]))) for i in range(len(PixelPos))]
-                
-                deltaXD = [np.dot(PixelPos[i],perpVect[i]) for i in range(len(PixelPos))]
-                LDA = [np.array(PixelPos[i])-np.array(deltaXD[i]).reshape(-1,1)*np.array(perpVect[i]).reshape(1,3)-self.analysers[i].position for i in range(len(PixelPos))]
-                
-                LD = [np.linalg.norm(LDA[i],axis=1) for i in range(len(PixelPos))]
-                LA = [np.linalg.norm(LAS[i]) for i in range(len(PixelPos))]
-                deltaXDprime = [deltaXD[i]/(LD[i]/LA[i]+1.0) for i in range(len(PixelPos))]
+        elif self.settings['concept']!='ManyToMany':
+            raise ValueError("Wedge does not contain a Concept setting that is understood. Should be either 'OneToOne' or 'ManyToMany'")
 
+        PixelPos = []
+        analyserIndex = []
+        for detNumber,det in enumerate(self.detectors):
+            pixelIndex,area = det.getSplitIndices()
+            if oneToOne:
+                if len(det.split)!=2:
+                    raise ValueError("OneToOne concept chosen by detector split into multiple parts!")
+                area = area+detNumber
+            elif len(det.split)-1!=len(self.analysers):
+                raise ValueError("ManyToMany concept chosen by detector split into number of parts not matching number of analysers!")
+            PixelPos.append(det.getPixelPositions(split=False)[pixelIndex]+self.position)
+            analyserIndex.append(area)
+
+        counts = np.cumsum([len(x) for x in analyserIndex])[:-1]
+        PixelPos = np.concatenate(PixelPos)
+        analyserIndex = np.concatenate(analyserIndex)
+
+        analyserPositions = np.array([ana.position for ana in self.analysers],dtype=float)
+        LAS = analyserPositions+self.position
+        vertical = np.array([0,0,1])
+        perpVect = np.cross(vertical,LAS)
+        if not oneToOne:
+            perpVect = perpVect/np.linalg.norm(perpVect,axis=1).reshape(-1,1)
+        LA = np.linalg.norm(LAS,axis=1)
+
+        pixelPerpVect = perpVect[analyserIndex]
+        pixelAnalyserPositions = analyserPositions[analyserIndex]
+        deltaXD = np.einsum('ij,ij->i',PixelPos,pixelPerpVect)
+        if oneToOne:
+            LDA = PixelPos-pixelAnalyserPositions # Detector - analyser vector
+        else:
+            LDA = PixelPos-deltaXD.reshape(-1,1)*pixelPerpVect-pixelAnalyserPositions
+        LD = np.linalg.norm(LDA,axis=1)
+        deltaXDprime = deltaXD/(LD/LA[analyserIndex]+1.0)
 
-                analyserPixelPositions.append(np.concatenate([np.outer(deltaXDprime[i],perpVect[i])+self.analysers[i].position+self.position for i in range(len(PixelPos))]))
+        analyserPixelPositions = deltaXDprime.reshape(-1,1)*pixelPerpVect+pixelAnalyserPositions+self.position
 
-        else:
-            raise ValueError("Wedge does not contain a Concept setting that is understood. Should be either 'OneToOne' or 'ManyToMany'")
+        detectorPixelPositions = np.split(PixelPos,counts)
+        analyserPixelPositions = np.split(analyserPixelPositions,counts)
+        if oneToOne: # Detectors consist of a single area
+            detectorPixelPositions = [x.reshape(1,-1,3) for x in detectorPixelPositions]
 
         return detectorPixelPositions,analyserPixelPositions
@@ -1,12 +1,6 @@
 import matplotlib.pyplot as plt
 import numpy as np
 
-from distutils.spawn import find_executable
-if find_executable('latex'):
-    USETEX = True
-else:
-    USETEX = False
-
 
 class FittingFunction(object):
     def __init__(self,function):
@@ -174,6 +174,108 @@ def calcTasQH(UBINV,angles,Ei,Ef,A3Off=0):
 
   return Q,QV
 
+def buildRMatrixBatch(UB, planeNormal, qe):
+    """Batched version of buildRMatrix for qe of shape (N,3) or (N,5). Returns R of shape (N,3,3)"""
+    qe = np.asarray(qe,dtype=float)
+    qe = qe.reshape(-1,qe.shape[-1])
+    U1V = np.einsum('ij,nj->ni',UB,qe[:,:3])
+    U1V/=np.linalg.norm(U1V,axis=1).reshape(-1,1)
+    U2V = np.cross(np.asarray(planeNormal,dtype=float).reshape(1,3), U1V)
+    U2VLength = np.linalg.norm(U2V,axis=1)
+    if np.any(U2VLength<0.001):
+        raise AttributeError('Calculate length of U2V too small ({})'.format(U2V[np.argmin(U2VLength)]))
+    U2V/=U2VLength.reshape(-1,1)
+    T3V = np.cross(U1V, U2V)
+    TV = np.stack([U1V,U2V,T3V],axis=1)
+    return np.linalg.inv(TV)
+
+def calcTasQAnglesBatch(UB,planeNormal,ss,A3Off,qe):
+    """Batched version of calcTasQAngles.
+
+    Args:
+
+        - UB (3x3 array): UB matrix
+
+        - planeNormal (3 array): Normal of scattering plane
+
+        - ss (float): Scattering sense
+
+        - A3Off (float): Offset of A3
+
+        - qe (array): Reflections of shape (N,5) with H, K, L, Ei, Ef
+
+    Returns:
+
+        - A3, A4, sgu, sgl (arrays): Angles of shape (N)
+
+    """
+    qe = np.asarray(qe,dtype=float).reshape(-1,5)
+    R = buildRMatrixBatch(UB,planeNormal,qe)
+    cossgl = np.sqrt(R[:,0,0]*R[:,0,0]+R[:,1,0]*R[:,1,0])
+    sgl = ss*arctan2d(-R[:,2,0],cossgl)
+    om = arctan2d(R[:,1,0]/cossgl, R[:,0,0]/cossgl)
+    sgu = arctan2d(R[:,2,1]/cossgl, R[:,2,2]/cossgl)
+
+    QC = np.einsum('ij,nj->ni',UB,qe[:,:3])
+    q = np.linalg.norm(QC,axis=1)
+
+    ki = np.sqrt(qe[:,3])*factorsqrtEK
+    kf = np.sqrt(qe[:,4])*factorsqrtEK
+
+    cos2t =(ki**2 + kf**2 - q**2) / (2. * np.abs(ki) * np.abs(kf))
+
+    A4 = arccosd(cos2t)
+    theta = calcTheta(ki, kf, A4)
+    A3 = om + ss*theta + A3Off
+    A3 = np.mod(A3 + ss*180.0,360.0) - ss*180.0
+
+    return -A3,-A4,sgu,sgl
+
+def calcTasMisalignmentBatch(UB,planeNormal,qe):
+    """Batched version of calcTasMisalignment for qe of shape (N,3) or (N,5)"""
+    R = buildRMatrixBatch(UB,planeNormal,qe)
+    return arctan2d(R[:,1,0], R[:,0,0])
+
+def calcTasQHBatch(UBINV,A3,A4,Ei,Ef,A3Off=0):
+    """Batched version of calcTasQH. All angles and energies are broadcasted against each other.
+
+    Args:
+
+        - UBINV (3x3 array): Inverse UB matrix
+
+        - A3 (array): Sample rotation in degrees
+
+        - A4 (array): Scattering angle in degrees
+
+        - Ei (array): Incoming energy in meV
+
+        - Ef (array): Outgoing energy in meV
+
+    Kwargs:
+
+        - A3Off (float): Offset of A3 (default 0)
+
+    Returns:
+
+        - Q (array): HKL of shape (N,3)
+
+        - QV (array): Qx, Qy, Qz of shape (N,3)
+
+    """
+    A3,A4,Ei,Ef = [x.flatten() for x in np.broadcast_arrays(*[np.asarray(x,dtype=float) for x in [A3,A4,Ei,Ef]])]
+
+    ki = np.sqrt(Ei)*factorsqrtEK
+    kf = np.sqrt(Ef)*factorsqrtEK
+
+    theta = calcTheta(ki, kf, np.abs(A4))
+    om = A3+A3Off-np.sign(A4)*theta
+    q = np.sqrt(ki**2 +kf**2- 2. *ki *kf * cosd(A4))
+
+    QV = uFromAngles(om,0.0,0.0)*q.reshape(-1,1)
+
+    Q = np.einsum('ij,nj->ni',UBINV,QV)
+    return Q,QV
+
 def addAuxReflection(cell,r1,r2,ss=1.0):
     h,k,l = r2[:3]#np.array([0,0,1])
     
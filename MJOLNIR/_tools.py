@@ -8,6 +8,12 @@ import math
 from MJOLNIR.Marray import *
 import os
 import inspect
+import threading
+import time
+try:
+    import resource
+except ImportError: # pragma: no cover
+    resource = None # Not available on Windows
 import matplotlib
 
 MPLKwargs = ['agg_filter','alpha','animated','antialiased or aa','clip_box','clip_on','clip_path','color or c','contains','dash_capstyle','dash_joinstyle','dashes','drawstyle','figure','fillstyle','gid','label','linestyle or ls','linewidth or lw','marker','markeredgecolor or mec','markeredgewidth or mew','markerfacecolor or mfc','markerfacecoloralt or mfcalt','markersize or ms','markevery','path_effects','picker','pickradius','rasterized','sketch_params','snap','solid_capstyle','solid_joinstyle','transform','url','visible','xdata','ydata','zorder']
@@ -41,9 +47,15 @@ def cutObject(func): # pragma: no cover
         return co
     return newFunction
 
+class _KwargCheckerState(threading.local):
+    running = False # True while a checked function is running in the current thread
+
+_kwargCheckerState = _KwargCheckerState()
+
 def KwargChecker(function=None,include=None):
     """Function to check if given key-word is in the list of accepted Kwargs. If not directly therein, checks capitalization. If still not match raises error
-    with suggestion of closest argument.
+    with suggestion of closest argument. The list of accepted arguments is found once when the function is decorated. Calls made from within 
+    another checked function are internal and are not checked.
     
     Args:
     
@@ -56,13 +68,22 @@ def KwargChecker(function=None,include=None):
     def KwargCheckerNone(func):
         @functools.wraps(func)
         def newFunc(*args,**kwargs):
-            argList = extractArgsList(func,newFunc,function,include)
-            checkArgumentList(argList,kwargs)
-            returnval = func(*args,**kwargs)
+            if _kwargCheckerState.running: # Internal call, arguments are provided by MJOLNIR itself
+                return func(*args,**kwargs)
+            if not argSet.issuperset(kwargs):
+                checkArgumentList(argList,kwargs)
+            _kwargCheckerState.running = True
+            try:
+                returnval = func(*args,**kwargs)
+            finally:
+                _kwargCheckerState.running = False
             return returnval
         newFunc._original = func
         newFunc._include = include
         newFunc._function = function
+        argList = extractArgsList(func,newFunc,function,include)
+        argSet = frozenset(argList)
+        newFunc._argList = argList
         return newFunc
     return KwargCheckerNone
 
@@ -137,6 +158,173 @@ def my_timer_N(N=0): # pragma: no cover
         return newFunc
     return my_timer
 
+_activeProfilers = [] # Profilers currently recording spans
+
+def _peakMemory():
+    """Peak resident memory of process in bytes or None if not available"""
+    if resource is None: # pragma: no cover
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak*1024 # kB on Linux, bytes on macOS
+
+
+class ProfileSpan(object):
+    """Named timing span used either as decorator or context manager. Spans are only recorded when a Profiler is active,
+    otherwise the overhead is a single check of a list.
+
+    Kwargs:
+
+        - name (string): Name of span. For decorated functions defaults to module and qualified name of function, e.g. 'DataSet.DataSet.cut1D' (default None)
+
+    Example::
+
+        @_tools.ProfileSpan()
+        def function(x):
+            ...
+
+        with _tools.ProfileSpan('maskEvaluation'):
+            ...
+
+    """
+    def __init__(self,name=None):
+        self.name = name
+
+    def __call__(self,func):
+        name = self.name
+        if name is None:
+            name = '{}.{}'.format(func.__module__.split('.')[-1],func.__qualname__)
+        @functools.wraps(func)
+        def newFunc(*args,**kwargs):
+            if not _activeProfilers:
+                return func(*args,**kwargs)
+            start = time.perf_counter(),_peakMemory()
+            try:
+                return func(*args,**kwargs)
+            finally:
+                _recordSpan(name,start)
+        return newFunc
+
+    def __enter__(self):
+        self._start = (time.perf_counter(),_peakMemory()) if _activeProfilers else None
+        return self
+
+    def __exit__(self,*args):
+        if not self._start is None:
+            _recordSpan(self.name,self._start)
+        return False
+
+
+def _recordSpan(name,start):
+    startTime,startMemory = start
+    event = (name,startTime,time.perf_counter()-startTime,threading.get_ident(),startMemory,_peakMemory())
+    for profiler in list(_activeProfilers):
+        profiler.events.append(event)
+
+
+class Profiler(object):
+    """Recorder of ProfileSpans in conversion and cut pipelines. Use as context manager or call start and stop. Setting the environment
+    variable MJOLNIR_PROFILE profiles the whole session and prints a report on exit. If its value ends with .json, a Chrome trace is saved to that file as well.
+
+    Example::
+
+        with _tools.Profiler() as profiler:
+            ds.convertDataFile()
+            ds.cut1D(...)
+        print(profiler.report())
+        profiler.saveChromeTrace('trace.json') # Open in chrome://tracing or Perfetto
+
+    """
+    def __init__(self):
+        self.events = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self,*args):
+        self.stop()
+        return False
+
+    def start(self):
+        """Start recording spans"""
+        if not self in _activeProfilers:
+            _activeProfilers.append(self)
+
+    def stop(self):
+        """Stop recording spans"""
+        if self in _activeProfilers:
+            _activeProfilers.remove(self)
+
+    def summary(self):
+        """Aggregate timings of recorded spans.
+
+        Returns:
+
+            - summary (dict): For each span name a dictionary with calls, total, mean, and max time in seconds, the 
+              peak memory of the process in bytes after the span, and the largest increase of peak memory during a single call.
+
+        """
+        summary = {}
+        for name,_,duration,_,startMemory,stopMemory in self.events:
+            entry = summary.setdefault(name,{'calls':0,'total':0.0,'max':0.0,'peakMemory':None,'memoryIncrease':None})
+            entry['calls']+=1
+            entry['total']+=duration
+            entry['max'] = max(entry['max'],duration)
+            if not stopMemory is None:
+                entry['peakMemory'] = max(entry['peakMemory'] or 0,stopMemory)
+                entry['memoryIncrease'] = max(entry['memoryIncrease'] or 0,stopMemory-startMemory)
+        for entry in summary.values():
+            entry['mean'] = entry['total']/entry['calls']
+        return summary
+
+    def report(self):
+        """Table of aggregate timings sorted by total time"""
+        summary = self.summary()
+        def MB(x):
+            return '-' if x is None else '{:.1f}'.format(x/1024**2)
+        width = max([len('Span')]+[len(name) for name in summary])
+        lines = ['{:<{w}}  {:>7}  {:>10}  {:>10}  {:>10}  {:>9}  {:>9}'.format('Span','Calls','Total [s]','Mean [s]','Max [s]','Peak [MB]','Incr [MB]',w=width)]
+        for name,entry in sorted(summary.items(),key=lambda x: -x[1]['total']):
+            lines.append('{:<{w}}  {:>7}  {:>10.4f}  {:>10.4f}  {:>10.4f}  {:>9}  {:>9}'.format(name,entry['calls'],entry['total'],entry['mean'],entry['max'],
+                         MB(entry['peakMemory']),MB(entry['memoryIncrease']),w=width))
+        return '\n'.join(lines)
+
+    def saveChromeTrace(self,fileName):
+        """Save recorded spans in the Chrome trace event format to be opened in chrome://tracing or Perfetto.
+
+        Args:
+
+            - fileName (string): Location of json file.
+
+        """
+        import json
+        events = []
+        for name,startTime,duration,threadId,_,stopMemory in self.events:
+            events.append({'name':name,'ph':'X','ts':startTime*1e6,'dur':duration*1e6,'pid':os.getpid(),'tid':threadId,
+                           'args':{'peakMemory':stopMemory}})
+        with open(fileName,'w') as f:
+            json.dump({'traceEvents':events,'displayTimeUnit':'ms'},f)
+
+
+def _profileEnvironment(): # pragma: no cover
+    """Profile full session if MJOLNIR_PROFILE is set"""
+    value = os.environ.get('MJOLNIR_PROFILE','').strip()
+    if value in ['','0']:
+        return None
+    import atexit
+    profiler = Profiler()
+    profiler.start()
+    def finish():
+        profiler.stop()
+        sys.stderr.write(profiler.report()+'\n')
+        if value.endswith('.json'):
+            profiler.saveChromeTrace(value)
+    atexit.register(finish)
+    return profiler
+
+environmentProfiler = _profileEnvironment()
+
+
 def beautifyArgs(args=(),kwargs={}): # pragma: no cover
     """Beautify arguments and keyword arguments. Returns formated string with arguments and 
     keyword argumenets seperated with commas as called in a function"""
@@ -261,25 +449,24 @@ def binEdges(values,tolerance,startPoint=None,endPoint=None):
     
     """
     values_array = np.array(values).ravel().flatten()
-    unique_values = np.asarray(list(set(values_array)))
-    unique_values.sort()
+    unique_values = np.unique(values_array)
     if len(unique_values)==0:
         return []
     bin_edges = [unique_values[0] - tolerance * 0.1]
-    add = 1
+    # Possible bin edges are midpoints between consecutive values. From each edge the next is the first 
+    # midpoint at least tolerance away, which is found by a binary search followed by an exact check.
+    midPoints = (unique_values[1:]+unique_values[:-1])*0.5
     current = 0
-    while current<len(unique_values) - 1:
-        add=1
-        broken = False
-        while (unique_values[current+add]+unique_values[current+add-1])*0.5 - bin_edges[-1] < tolerance:
-            if current+add < len(unique_values)-1:
-                add+=1
-            else:
-                broken=True
-                break
-        if not broken:
-            bin_edges.append((unique_values[current+add-1] + unique_values[current+add]) / 2)
-        current+=add
+    while current<len(midPoints):
+        nextEdge = max(np.searchsorted(midPoints,bin_edges[-1]+tolerance,side='left'),current)
+        while nextEdge>current and midPoints[nextEdge-1]-bin_edges[-1] >= tolerance:
+            nextEdge-=1
+        while nextEdge<len(midPoints) and midPoints[nextEdge]-bin_edges[-1] < tolerance:
+            nextEdge+=1
+        if nextEdge==len(midPoints):
+            break
+        bin_edges.append(midPoints[nextEdge])
+        current = nextEdge+1
     if unique_values[-1]-bin_edges[-1]< 1.1*tolerance:
         bin_edges.append(bin_edges[-1]+tolerance)
     else:
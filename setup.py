@@ -33,7 +33,8 @@ setup(
         "console_scripts": ['MJOLNIRHistory = MJOLNIR.CommandLineScripts.MJOLNIRHistory:main',
                             'MJOLNIRConvert = MJOLNIR.CommandLineScripts.MJOLNIRConvert:main',
                             'MJOLNIRCalibrationInspector = MJOLNIR.CommandLineScripts.MJOLNIRCalibrationInspector:main',
-                            'MJOLNIR3DView = MJOLNIR.CommandLineScripts.MJOLNIR3DView:main']
+                            'MJOLNIR3DView = MJOLNIR.CommandLineScripts.MJOLNIR3DView:main',
+                            'MJOLNIRBatch = MJOLNIR.CommandLineScripts.MJOLNIRBatch:main']
         },
     python_requires='>=3.5',
     install_requires=['matplotlib>=3,<3.3','numpy>=1.14','h5py>=2.5','scipy','datetime','shapely','pytest>=4.6','pyperclip','shapely','decorator','pandas','future',
@@ -0,0 +1,92 @@
+import numpy as np
+import h5py as hdf
+import os
+from MJOLNIR.Data.Catalogue import Catalogue
+
+
+def createHeaderFile(fileName,Ei,temperature,startTime,title='Title',scanParameter='a3'):
+    with hdf.File(fileName,'w') as f:
+        f.create_dataset('entry/scancommand',data=[np.string_('sc {} 0 da3 1 np 3 mn 150000'.format(scanParameter))])
+        f.create_dataset('entry/title',data=[np.string_(title)])
+        f.create_dataset('entry/start_time',data=[np.string_(startTime)])
+        f.create_dataset('entry/end_time',data=[np.string_(startTime.replace(' 1',' 2'))])
+        f.create_dataset('entry/CAMEA/monochromator/energy',data=[Ei])
+        f.create_dataset('entry/CAMEA/analyzer/polar_angle',data=[-20.0])
+        f.create_dataset('entry/sample/temperature',data=temperature+np.array([-0.05,0.0,0.05]))
+        f.create_dataset('entry/sample/name',data=[np.string_('YMnO3')])
+        f.create_dataset('entry/sample/unit_cell',data=[6.0,6.0,12.2,90.0,90.0,120.0])
+        f.create_dataset('entry/control/data',data=[1e5,1e5,1e5])
+        dset = f.create_dataset('entry/data/'+scanParameter,data=[0.0,1.0,2.0])
+        dset.attrs['units'] = np.string_('degree')
+
+
+def test_Catalogue(tmpdir):
+    folder = str(tmpdir)
+    parameters = [[5.05,1.5,'2018-03-11 10:00:00'],[5.0,1.55,'2018-03-12 10:00:00'],[5.0,10.0,'2018-03-13 10:00:00'],[7.0,1.5,'2018-03-14 10:00:00']]
+    files = [os.path.join(folder,'camea2018n{:06d}.hdf'.format(i)) for i in range(len(parameters))]
+    for file,(Ei,T,time) in zip(files,parameters):
+        createHeaderFile(file,Ei,T,time,title='Scan {}'.format(file[-5]),scanParameter='a3' if Ei==5.0 else 'ei')
+    with open(os.path.join(folder,'camea2018n000009.hdf'),'w') as f: # Not readable
+        f.write('Not an hdf file')
+
+    catalogue = Catalogue(databaseFile=os.path.join(folder,'catalogue.db'))
+    assert(catalogue.add(folder,workers=2) == 4)
+    assert(len(catalogue) == 4)
+    assert(files[0] in catalogue)
+    assert(catalogue.add(files) == 0) # Nothing changed
+
+    assert(catalogue.query(Ei=5.0,temperature=1.5) == files[:2])
+    assert(catalogue.query(Ei=5.0,temperature=1.5,Ei_err=0.01) == files[1:2])
+    assert(catalogue.query(start='2018-03-12',end='2018-03-14') == files[1:3])
+    assert(catalogue.query(scanParameter='a3') == files[1:3])
+    assert(catalogue.query(title='Scan 3',sampleName='YMnO3') == files[3:])
+    assert(catalogue.query(binning=8) == [])
+
+    meta = catalogue.metadata(files[0])[0]
+    assert(np.isclose(meta['temperature'],1.5))
+    assert(meta['monitor'] == 3e5)
+    assert(meta['binning'] is None)
+    assert(np.all(meta['unitCell'] == [6.0,6.0,12.2,90.0,90.0,120.0]))
+    assert(meta['scanCommand'] == 'sc ei 0 da3 1 np 3 mn 150000')
+    assert(meta['startTime'] == '2018-03-11 10:00:00')
+
+    createHeaderFile(files[0],5.0,10.0,'2018-03-11 10:00:00',title='Changed title extended')
+    catalogue.close()
+    catalogue = Catalogue(databaseFile=os.path.join(folder,'catalogue.db')) # Persistent
+    assert(catalogue.add(folder) == 1)
+    assert(catalogue.query(temperature=10.0) == [files[0],files[2]])
+    catalogue.close()
+
+
+def test_Catalogue_failedFiles(tmpdir,monkeypatch):
+    from MJOLNIR.Data import DataFile
+    folder = str(tmpdir)
+    goodFile = os.path.join(folder,'camea2018n000000.hdf')
+    createHeaderFile(goodFile,5.0,1.5,'2018-03-11 10:00:00')
+    wrongFile = os.path.join(folder,'camea2018n000001.hdf')
+    with open(wrongFile,'w') as f:
+        f.write('Not an hdf file')
+
+    readFiles = []
+    readHeaders = DataFile.readHeaders
+    def countingReadHeaders(files,**kwargs):
+        readFiles.extend(files)
+        return readHeaders(files,**kwargs)
+    monkeypatch.setattr(DataFile,'readHeaders',countingReadHeaders)
+
+    catalogue = Catalogue(databaseFile=os.path.join(folder,'catalogue.db'))
+    assert(catalogue.add([goodFile,wrongFile,os.path.join(folder,'missing.hdf')]) == 1) # Missing file is skipped
+    assert(readFiles == [goodFile,wrongFile])
+    assert(not wrongFile in catalogue)
+
+    readFiles.clear()
+    assert(catalogue.add(folder) == 0)
+    assert(readFiles == []) # Unreadable file is not read again until it changes
+
+    createHeaderFile(wrongFile,7.0,1.5,'2018-03-12 10:00:00')
+    os.utime(wrongFile,(0,0))
+    assert(catalogue.add(folder) == 1)
+    assert(readFiles == [wrongFile])
+    assert(wrongFile in catalogue)
+    assert(catalogue.connection.execute('SELECT COUNT(*) FROM failed').fetchone()[0] == 0)
+    catalogue.close()
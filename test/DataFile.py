@@ -1,5 +1,6 @@
 import numpy as np
-from MJOLNIR.Data.DataFile import DataFile,decodeStr,createEmptyDataFile,assertFile
+from MJOLNIR.Data.DataFile import DataFile,decodeStr,createEmptyDataFile,assertFile,calculateQHKL,readHeader,readHeaders
+from MJOLNIR import TasUBlibDEG
 from MJOLNIR import _tools
 import MJOLNIR.Data.Sample
 import matplotlib as mpl
@@ -305,6 +306,40 @@ def test_updateCalibration():
     newEdges = df.instrumentCalibrationEdges
     assert(np.any(newEdges!=edges)) # Check if all elemenst are equal
 
+
+def test_DataFile_calculateQHKL():
+    sample = MJOLNIR.Data.Sample.Sample(a=6.0,b=6.0,c=12.2,projectionVector2=[1,0,0],projectionVector1=[0,2,1],gamma=120.,beta=80.,alpha=90.)
+    UBINV = np.linalg.inv(sample.orientationMatrix)
+    steps,detectors,bins = 11,4,8
+    Ef = np.linspace(3.2,5.0,detectors*bins).reshape(1,detectors,bins)
+    A4Instrument = np.linspace(-100,-10,detectors*bins).reshape(1,detectors,bins)
+
+    cases = [[np.linspace(0,180,steps),A4Instrument,np.array([5.5])], # A3 scan
+             [np.array([10.0]*steps),A4Instrument+np.linspace(0,5,steps).reshape(-1,1,1),np.array([5.5])], # A4 scan
+             [np.array([10.0]*steps),A4Instrument,np.linspace(5,8,steps)]] # Ei scan
+    for A3,A4,Ei in cases:
+        qx,qy,h,k,l,energy = calculateQHKL(UBINV,A3,A4,Ei,Ef,steps=steps)
+        HKL,QX,QY = TasUBlibDEG.calcTasQH(UBINV,[A3.reshape(-1,1,1),A4],Ei.reshape(-1,1,1),Ef)
+        H,K,L = np.swapaxes(np.swapaxes(HKL,1,2),0,3)
+        for new,old in zip([qx,qy,h,k,l,energy],[QX,QY,H,K,L,Ei.reshape(-1,1,1)-Ef]):
+            assert(new.shape == (steps,detectors,bins))
+            assert(np.all(np.isclose(new,old)))
+
+
+def test_DataFile_ConvertEmpty():
+    nf = np.array([os.path.join('Data','Normalization_1.calib'),os.path.join('Data','Normalization_8.calib')])
+    sample = MJOLNIR.Data.Sample.Sample(a=6.0,b=6.0,c=12.2,projectionVector2=[1,0,0],projectionVector1=[0,2,1],gamma=120.,beta=80.,alpha=90.)
+    df = createEmptyDataFile(A3=np.linspace(0,90,91),A4=-16,Ei=5.5,sample=sample,normalizationFiles = nf)
+    
+    converted = df.convert(binning=1)
+    for attr in ['qx','qy','h','k','l','energy']:
+        assert(getattr(converted,attr).shape == (91,104,8))
+    
+    # Length of Q is independent of A3
+    Q = np.linalg.norm([converted.qx,converted.qy],axis=0)
+    assert(np.all(np.isclose(Q,Q[0])))
+    assert(np.all(np.isclose(converted.energy,5.5-df.instrumentCalibrationEf[:,1].reshape(1,104,8))))
+
 #
 #def test_DataFile_BoundaryCalculation(quick):
 #    if quick==True:
@@ -321,3 +356,49 @@ def test_updateCalibration():
 #        assert(len(EBins)==B*8+1)
         
 
+
+
+def test_DataFile_readHeaders(tmpdir):
+    import h5py as hdf
+    files = [os.path.join(str(tmpdir),'camea2018n{:06d}.hdf'.format(i)) for i in range(3)]
+    for i,file in enumerate(files):
+        with hdf.File(file,'w') as f:
+            f.create_dataset('entry/scancommand',data=[np.string_('sc a3 0 da3 {} np 121 mn 150000'.format(i))])
+            f.create_dataset('entry/title',data=[np.string_('Title {}'.format(i))])
+    wrongFile = os.path.join(str(tmpdir),'wrong.hdf')
+    with open(wrongFile,'w') as f:
+        f.write('Not an hdf file')
+
+    header = readHeader(files[0])
+    assert(header == {'name':'camea2018n000000.hdf','scanCommand':'sc a3 0 da3 0 np 121 mn 150000','title':'Title 0'})
+    assert(readHeader(files[0],entries={'Ei':'entry/CAMEA/monochromator/energy'})['Ei'] is None)
+    try:
+        readHeader(os.path.join(str(tmpdir),'missing.hdf'))
+        assert False
+    except AttributeError:
+        assert True
+
+    indexFile = os.path.join(str(tmpdir),'index')
+    headers = readHeaders(files+[wrongFile],workers=2,indexFile=indexFile)
+    assert(headers[-1] is None)
+    assert([h['title'] for h in headers[:-1]] == ['Title 0','Title 1','Title 2'])
+    assert(os.path.isfile(indexFile))
+
+    with hdf.File(files[1],'a') as f: # Change file such that only it is read again
+        del f['entry/title']
+        f.create_dataset('entry/title',data=[np.string_('New title')])
+    os.utime(files[1],(0,0))
+    stat = os.stat(files[0])
+    with open(files[0],'rb') as f:
+        content = f.read()
+    assert(content.count(b'Title 0') == 1)
+    with open(files[0],'wb') as f: # Overwrite title by string of same length, keeping modification time and size, thus index is used
+        f.write(content.replace(b'Title 0',b'Title X'))
+    os.utime(files[0],ns=(stat.st_atime_ns,stat.st_mtime_ns))
+    assert(os.stat(files[0]).st_size == stat.st_size)
+    assert(readHeader(files[0])['title'] == 'Title X')
+    headers = readHeaders(files,workers=1,indexFile=indexFile)
+    assert([h['title'] for h in headers] == ['Title 0','New title','Title 2'])
+    os.utime(files[0],ns=(stat.st_atime_ns,stat.st_mtime_ns+10**9)) # Changed modification time, thus file is read again
+    headers = readHeaders(files,workers=1,indexFile=indexFile)
+    assert([h['title'] for h in headers] == ['Title X','New title','Title 2'])
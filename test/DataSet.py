@@ -1,6 +1,8 @@
 import numpy as np
+import pandas as pd
 import MJOLNIR.Data.DataFile
-from MJOLNIR.Data.DataSet import DataSet,calculateGrid3D,binData3D,cut1DE,fmt,figureRowColumns,centeroidnp,compareNones,OxfordList, load
+from MJOLNIR.Data.DataSet import DataSet,calculateGrid3D,binData3D,cut1D,cut1DE,cutQE,cutQELine,cutELine,cutPowder,CutResult,histogram2DWeights,fmt,figureRowColumns,centeroidnp,compareNones,OxfordList, load,\
+    voronoiTessellation,clearVoronoiCache,loadTessellation
 from MJOLNIR import _tools
 import MJOLNIR.Data.Sample
 import matplotlib as mpl
@@ -856,6 +858,141 @@ def test_DataSet_compareNones():
     assert(np.all(compareNones(np.array([0.4,10.2,10.0]),np.array([0.4,10.2,10.0]),0.001)))
 
 
+def test_DataSet_voronoiTessellation():
+    A3 = np.linspace(0,20,21)
+    A4 = -np.linspace(10,30,15)
+    X,Y = [x.flatten() for x in np.meshgrid(A3,A4,indexing='ij')]
+
+    clearVoronoiCache()
+    polygons,polyPoints = voronoiTessellation([np.array([X,Y])],numGroups=1)
+    assert(len(polygons)==len(X))
+    assert(len(polyPoints)==len(X))
+    # Pixels cover the padded hull of the points exactly (half a step outside of the outer points)
+    area = 21*1.0*15*(20.0/14)
+    assert(np.isclose(np.sum([p.area for p in polygons]),area))
+    # Every point lies within exactly one pixel
+    centroids = np.array([centeroidnp(p) for p in polyPoints])
+    assert(np.all(np.isclose(np.sort(centroids[:,0]),np.sort(X),atol=0.5)))
+
+    # Second call is served from the cache and returns equal (but not identical) arrays
+    polygons2,polyPoints2 = voronoiTessellation([np.array([X,Y])],numGroups=1)
+    assert(polygons2 is not polygons)
+    assert(np.all([p1.equals(p2) for p1,p2 in zip(polygons,polygons2)]))
+
+    polygons3,_ = voronoiTessellation([np.array([X,Y])],numGroups=1,cache=False)
+    assert(np.isclose(np.sum([p.area for p in polygons3]),area))
+    clearVoronoiCache()
+
+    # Two overlapping scans with a non-convex combined boundary
+    X2,Y2 = [x.flatten() for x in np.meshgrid(A3+10.5,A4-10.3,indexing='ij')]
+    polygons,_ = voronoiTessellation([[X,Y],[X2,Y2]])
+    assert(len(polygons)==len(X)+len(X2))
+    assert(np.isclose(np.sum([p.area for p in polygons]),2*area-10.5*(15*20.0/14-10.3)))
+
+
+def test_DataSet_voronoiTessellation_File():
+    A3 = np.linspace(0,20,21)
+    A4 = -np.linspace(10,30,15)
+    X,Y = [x.flatten() for x in np.meshgrid(A3,A4,indexing='ij')]
+    X2,Y2 = [x.flatten() for x in np.meshgrid(A3+10.5,A4-10.3,indexing='ij')]
+
+    temp = 'temporaryTessellation.h5'
+    if os.path.isfile(temp):
+        os.remove(temp)
+
+    clearVoronoiCache()
+    polygons,polyPoints = voronoiTessellation([np.array([X,Y])],numGroups=1,cacheFile=temp)
+    polygons2,polyPoints2 = voronoiTessellation([[X,Y],[X2,Y2]],cacheFile=temp) # Ragged polygons are also stored
+    assert(os.path.isfile(temp))
+
+    clearVoronoiCache() # New session only has the file
+    loadedPolygons,loadedPolyPoints = voronoiTessellation([np.array([X,Y])],numGroups=1,cacheFile=temp,cache=False)
+    assert(np.all(np.isclose(loadedPolyPoints,polyPoints)))
+    assert(np.all([p1.equals(p2) for p1,p2 in zip(polygons,loadedPolygons)]))
+
+    loadedPolygons2,loadedPolyPoints2 = voronoiTessellation([[X,Y],[X2,Y2]],cacheFile=temp)
+    assert(len(loadedPolygons2)==len(polygons2))
+    assert(np.all([np.allclose(p1,p2) for p1,p2 in zip(polyPoints2,loadedPolyPoints2)]))
+
+    assert(loadTessellation(temp,'notAKey') == (None,None))
+    os.remove(temp)
+    clearVoronoiCache()
+
+
+def test_DataSet_Precision():
+    # Tolerances of the float32 working precision compared to float64. Positions are only rounded 
+    # to the 1e-7 relative level while counts are integers and all binning is accumulated in double precision.
+    sample = MJOLNIR.Data.Sample.Sample(a=6.0,b=6.0,c=12.2,projectionVector1=[1,0,0],projectionVector2=[0,1,0],gamma=120.)
+    nf = [os.path.join('Data','Normalization_1.calib'),os.path.join('Data','Normalization_8.calib')]
+    dataSets = []
+    for precision in ['float64','float32']:
+        df = MJOLNIR.Data.DataFile.createEmptyDataFile(A3=np.linspace(0,90,91),A4=-16,Ei=5.5,sample=sample,normalizationFiles=nf)
+        df.I = np.random.RandomState(0).poisson(10,size=df.I.shape)
+        ds = DataSet(dataFiles=[df],precision=precision)
+        ds.convertDataFile(binning=8,saveFile=False)
+        dataSets.append(ds)
+    ds64,ds32 = dataSets
+
+    assert(ds32.precision == 'float32')
+    for attr in ['qx','qy','h','k','l','energy','Norm']:
+        assert(getattr(ds32,attr)[0].dtype == np.float32)
+        assert(getattr(ds32.convertedFiles[0],attr).dtype == np.float32) # No float64 copy is kept
+        assert(getattr(ds64,attr)[0].dtype == np.float64)
+    assert(ds32.I[0].dtype == ds64.I[0].dtype)
+
+    q1,q2 = np.array([0.5,-1.0]),np.array([0.5,-0.5])
+    cut64 = ds64.cut1D(q1=q1,q2=q2,rlu=False,width=0.1,minPixel=0.01,Emin=1,Emax=1.5)[0]
+    cut32 = ds32.cut1D(q1=q1,q2=q2,rlu=False,width=0.1,minPixel=0.01,Emin=1,Emax=1.5)[0]
+    assert(cut32['Normalization'].dtype == np.float64)
+    for column in ['Intensity','Monitor','BinCount']:
+        assert(np.all(cut32[column]==cut64[column]))
+    assert(np.allclose(cut32['Int'],cut64['Int'],rtol=1e-6,atol=0.0))
+
+    cut64 = ds64.cut1DE(E1=0.5,E2=2,q=[0.5,-1.0],rlu=False,width=0.1)[0]
+    cut32 = ds32.cut1DE(E1=0.5,E2=2,q=[0.5,-1.0],rlu=False,width=0.1)[0]
+    assert(np.allclose(cut32['Int'],cut64['Int'],rtol=1e-6,atol=0.0))
+
+    # Data driven bin edges may move points lying on them, but totals are kept
+    cut64 = ds64.cutPowder(EBinEdges=np.linspace(0.5,2,5))[0]
+    cut32 = ds32.cutPowder(EBinEdges=np.linspace(0.5,2,5))[0]
+    for column in ['Intensity','Monitor','BinCount']:
+        assert(np.all(cut32.groupby('EnergyCut')[column].sum()==cut64.groupby('EnergyCut')[column].sum()))
+
+    data64,_ = ds64.binData3D(0.05,0.05,0.1)
+    data32,_ = ds32.binData3D(0.05,0.05,0.1)
+    assert(data32[2].dtype == np.float64)
+    for d32,d64 in zip(data32,data64):
+        assert(np.isclose(np.sum(d32),np.sum(d64),rtol=1e-6,atol=0.0))
+
+    # Changing precision recasts data, but the digits lost in float32 are not recovered
+    ds32.precision = 'float64'
+    assert(ds32.qx[0].dtype == np.float64)
+    assert(np.allclose(ds32.qx.extractData(),ds64.qx.extractData(),rtol=1e-6))
+
+    # Converted files provided by the user keep their precision
+    convertedFile = ds64.convertedFiles[0]
+    ds = DataSet(convertedFiles=[convertedFile],precision='float32')
+    assert(ds.qx[0].dtype == np.float32)
+    assert(not ds.convertedFiles[0] is convertedFile)
+    for attr in ['qx','qy','h','k','l','energy','Norm']:
+        assert(getattr(convertedFile,attr).dtype == np.float64)
+    ds64._getData()
+    assert(ds64.qx[0].dtype == np.float64)
+    assert(DataSet(convertedFiles=[convertedFile]).convertedFiles[0] is convertedFile) # No copy if precision matches
+
+    try:
+        ds32.precision = 'float16'
+        assert False
+    except AttributeError:
+        assert True
+
+    try:
+        DataSet(precision='double precision please')
+        assert False
+    except AttributeError:
+        assert True
+
+
 def test_DataSet_cutQELine():
     QPoints = np.array([[0.3,-1],[0.7,-1.4],[1.6,-0.9],[0.3,-0.9]],dtype=float)
     QPointsHKL=np.array([[1.0,0.0,0.0],
@@ -1100,6 +1237,328 @@ def test_DataSet_ELine():
     assert(np.all([np.all(np.logical_and(B[0]>=Emin*0.99,B[0]<=Emax*1.05)) for B in Bins])) # Allow for slightly heigher energy
 
 
+def test_DataSet_ELine_Grouped():
+    sample = MJOLNIR.Data.Sample.Sample(a=6.0,b=6.0,c=12.2,projectionVector1=[1,0,0],projectionVector2=[0,1,0],gamma=120.)
+    nf = [os.path.join('Data','Normalization_1.calib'),os.path.join('Data','Normalization_8.calib')]
+    df = MJOLNIR.Data.DataFile.createEmptyDataFile(A3=np.linspace(0,90,91),A4=-16,Ei=5.5,sample=sample,normalizationFiles=nf)
+    df.I = np.random.RandomState(0).poisson(10,size=df.I.shape)
+    ds = DataSet(dataFiles=[df])
+    ds.convertDataFile(binning=8,saveFile=False)
+
+    maskBefore = [m.copy() for m in ds.mask]
+    normalBefore = ds.sample[0].planeNormal.copy()
+
+    Q1 = [0.3,-1.4,0.0]
+    Q2 = [0.9,-0.6,0.0]
+    CutData,Bins = ds.cutELine(Q1, Q2, Emin=0.6, Emax=2.2, energyWidth = 0.05, minPixel = 0.05, width = 0.05)
+
+    # Neither the mask nor the sample is changed by the cut
+    assert(np.all([np.all(m1==m2) for m1,m2 in zip(maskBefore,ds.mask)]))
+    assert(np.all(ds.sample[0].planeNormal==normalBefore))
+
+    # Grouped binning is identical to a constant Q cut at every Q point
+    positions = np.array([ds.qx.extractData(),ds.qy.extractData(),ds.energy.extractData()])
+    I,Norm,Monitor = ds.I.extractData(),ds.Norm.extractData(),ds.Monitor.extractData()
+    QPoints = np.array(CutData.groupby('QCut')[['Qx','Qy']].first())
+    assert(len(QPoints)==len(Bins))
+
+    for constantBins in [False,True]:
+        Data,DataBins = cutELine(positions,I,Norm,Monitor,QPoints,width=0.05,energyWidth=0.05,E1=0.6,E2=2.2,constantBins=constantBins)
+        for Q,data,bins in zip(QPoints,Data,DataBins):
+            singleData,singleBins = cut1DE(positions,I,Norm,Monitor,E1=0.6,E2=2.2,q=Q.copy(),width=0.05,minPixel=0.05,constantBins=constantBins)
+            assert(np.allclose(bins[0],singleBins[0]))
+            for a,b in zip(data,singleData):
+                assert(np.allclose(a,b))
+
+    with pytest.raises(AttributeError):
+        cutELine(positions,I,Norm,Monitor,QPoints,width=0.05,energyWidth=0.05,E1=10.0,E2=12.0)
+    with pytest.raises(AttributeError):
+        cutELine(positions,I,Norm,Monitor,np.array([[10.0,10.0],[11.0,11.0]]),width=0.05,energyWidth=0.05,E1=0.6,E2=2.2)
+
+
+def test_DataSet_addMask():
+    sample = MJOLNIR.Data.Sample.Sample(a=6.0,b=6.0,c=12.2,projectionVector1=[1,0,0],projectionVector2=[0,1,0],gamma=120.)
+    nf = [os.path.join('Data','Normalization_1.calib'),os.path.join('Data','Normalization_8.calib')]
+    dataSets = []
+    for _ in range(2):
+        dfs = []
+        for i in range(2):
+            df = MJOLNIR.Data.DataFile.createEmptyDataFile(A3=np.linspace(0,90,91)+45*i,A4=-16,Ei=5.5,sample=sample,normalizationFiles=nf)
+            df.I = np.random.RandomState(i).poisson(10,size=df.I.shape)
+            dfs.append(df)
+        ds = DataSet(dataFiles=dfs)
+        ds.convertDataFile(binning=8,saveFile=False)
+        dataSets.append(ds)
+    incremental,full = dataSets
+
+    Emask = Mask.lineMask(2.2,3.0,coordinates='energy')
+    circ = Mask.circleMask(center=[0.5,-1.0],radius=0.1,coordinates=['qx','qy'])
+    incremental.mask = Emask
+    full.mask = Emask+circ
+
+    changed = incremental.addMask(circ)
+    assert(changed == [0,1])
+    for attr in ['I','qx','energy','Norm','Monitor']:
+        for inc,ful in zip(getattr(incremental,attr),getattr(full,attr)):
+            assert(np.all(np.ma.getmaskarray(inc)==np.ma.getmaskarray(ful)))
+    assert(np.all([np.all(inc==ful) for inc,ful in zip(incremental.mask,full.mask)]))
+    assert(np.all(incremental.maskIndices==full.maskIndices))
+    assert(np.all(incremental.I.extractData()==full.I.extractData()))
+
+    # Masks outside of data or already masked leave everything untouched
+    assert(incremental.addMask(Mask.circleMask(center=[10.0,10.0],radius=0.1,coordinates=['qx','qy'])) == [])
+    assert(incremental.addMask(circ,files=[1]) == [])
+
+    boolMask = [np.zeros_like(m) for m in incremental.mask]
+    boolMask[1][0] = True
+    assert(hasattr(incremental,'_maskingObject') and hasattr(incremental[1],'_maskingObject'))
+    assert(incremental.addMask(boolMask) == [1])
+    assert(np.all(incremental.I[1].mask[0]))
+    # Masking objects no longer describe the mask and are removed as when setting a boolean mask
+    assert(not hasattr(incremental,'_maskingObject'))
+    assert(not hasattr(incremental[0],'_maskingObject') and not hasattr(incremental[1],'_maskingObject'))
+    assert(np.all([np.all(inc==df.mask) for inc,df in zip(incremental.mask,incremental)]))
+
+    try:
+        incremental.addMask(boolMask[:1])
+        assert False
+    except AttributeError:
+        assert True
+
+
+def test_DataSet_histogram2DWeights():
+    rng = np.random.RandomState(0)
+    x,y = rng.uniform(0,1,size=(2,10000))
+    x[:10] = 1.0 # Points on the last edge belong to last bin
+    weights = [rng.poisson(10,size=10000),rng.uniform(0,1,size=10000)]
+    bins = [np.linspace(0,1,11),np.linspace(0.1,0.8,5)]
+    histograms = histogram2DWeights(x,y,bins=bins,weights=weights)
+    for hist,w in zip(histograms,weights):
+        assert(hist.shape == (10,4))
+        assert(np.all(hist == np.histogram2d(x,y,bins=bins,weights=w)[0]))
+
+def test_DataSet_plotQPlane_Workers():
+    sample = MJOLNIR.Data.Sample.Sample(a=6.0,b=6.0,c=12.2,projectionVector1=[1,0,0],projectionVector2=[0,1,0],gamma=120.)
+    nf = [os.path.join('Data','Normalization_1.calib'),os.path.join('Data','Normalization_8.calib')]
+    df = MJOLNIR.Data.DataFile.createEmptyDataFile(A3=np.linspace(0,90,91),A4=-16,Ei=5.5,sample=sample,normalizationFiles=nf)
+    df.I = np.random.RandomState(0).poisson(10,size=df.I.shape)
+    ds = DataSet(dataFiles=[df])
+    ds.convertDataFile(binning=8,saveFile=False)
+
+    EBins = [0.5,1.0,1.5,5.0,6.0,7.0] # Last two slices contain no data
+    results = []
+    for workers in [1,3]:
+        fig,ax = plt.subplots()
+        data,bins,ax = ds.plotQPlane(EBins=EBins,ax=ax,rlu=False,workers=workers)
+        results.append([data,bins])
+        plt.close(fig)
+        assert(len(data[0]) == 3)
+        assert(len(ax.pmeshs) == 3)
+
+    (data1,bins1),(data3,bins3) = results
+    for d1,d3 in zip(data1,data3):
+        assert(np.all([np.all(a==b) for a,b in zip(d1,d3)]))
+
+    energy = ds.energy.extractData()
+    inside = np.logical_and(energy>EBins[1],energy<=EBins[2])
+    assert(np.sum(data1[0][1]) == np.sum(ds.I.extractData()[inside]))
+    assert(np.sum(data1[3][1]) == np.sum(inside))
+
+
+def test_DataSet_plotQPlane_HKL():
+    sample = MJOLNIR.Data.Sample.Sample(a=6.0,b=6.0,c=12.2,projectionVector1=[1,0,0],projectionVector2=[0,1,0],gamma=120.)
+    nf = [os.path.join('Data','Normalization_1.calib'),os.path.join('Data','Normalization_8.calib')]
+    df = MJOLNIR.Data.DataFile.createEmptyDataFile(A3=np.linspace(0,90,91),A4=-16,Ei=5.5,sample=sample,normalizationFiles=nf)
+    df.I = np.random.RandomState(0).poisson(10,size=df.I.shape)
+    ds = DataSet(dataFiles=[df])
+    ds.convertDataFile(binning=8,saveFile=False)
+
+    try:
+        ds.plotQPlane(EMin=1.0,EMax=1.5,binning='hkl',rlu=False) # Bins in RLU cannot be plotted on an instrument axis
+        assert False
+    except AttributeError:
+        assert True
+
+    fig,ax = plt.subplots()
+    data,[Qx,Qy],ax = ds.plotQPlane(EMin=1.0,EMax=1.5,binning='hkl',xBinTolerance=0.02,yBinTolerance=0.03,ax=ax)
+    plt.close(fig)
+    
+    # Bins are rectilinear in RLU along the projection vectors, here H and K of the non-orthogonal lattice
+    xBins,yBins = ax.projectionBins[0]
+    assert(np.allclose(np.diff(xBins),0.02) and np.allclose(np.diff(yBins),0.03))
+    energy = ds.energy.extractData()
+    inside = np.logical_and(energy>1.0,energy<=1.5)
+    H,K = ds.h.extractData()[inside],ds.k.extractData()[inside]
+    assert(np.all(data[3][0] == np.histogram2d(H,K,bins=[xBins,yBins])[0]))
+    assert(np.sum(data[3][0]) == np.sum(inside))
+    
+    # Plotted corners are the bin corners in Qx,Qy
+    QxQy = ds.convertToQxQy(np.array([xBins[[0,-1]],yBins[[0,-1]],[0.0,0.0]]).T)
+    assert(np.allclose(Qx[0][[0,-1],[0,-1]],QxQy[:,0]) and np.allclose(Qy[0][[0,-1],[0,-1]],QxQy[:,1]))
+
+
+def test_DataSet_cutQE_Grouped():
+    sample = MJOLNIR.Data.Sample.Sample(a=6.0,b=6.0,c=12.2,projectionVector1=[1,0,0],projectionVector2=[0,1,0],gamma=120.)
+    nf = [os.path.join('Data','Normalization_1.calib'),os.path.join('Data','Normalization_8.calib')]
+    df = MJOLNIR.Data.DataFile.createEmptyDataFile(A3=np.linspace(0,90,91),A4=-16,Ei=5.5,sample=sample,normalizationFiles=nf)
+    df.I = np.random.RandomState(0).poisson(10,size=df.I.shape)
+    ds = DataSet(dataFiles=[df])
+    ds.convertDataFile(binning=8,saveFile=False)
+
+    positions = np.array([ds.qx.extractData(),ds.qy.extractData(),ds.energy.extractData()])
+    I,Norm,Monitor = ds.I.extractData(),ds.Norm.extractData(),ds.Monitor.extractData()
+    q1,q2 = np.array([0.5,-1.0]),np.array([0.8,-0.6])
+    
+    # Energy edges placed on measured energies are included in both neighbouring cuts as for cut1D
+    energies = np.unique(positions[2])
+    EnergyBins = np.concatenate([[0.2],energies[100:2000:400],[4.0,5.0]])
+    
+    for extend in [True,False]:
+        for constantBins in [False,True]:
+            Data,Bins = cutQE(positions,I,Norm,Monitor,q1,q2,width=0.1,minPixel=0.02,EnergyBins=EnergyBins,extend=extend,constantBins=constantBins)
+            assert(len(Data) == len(EnergyBins)-1)
+            for i,(data,bins) in enumerate(zip(Data,Bins)):
+                singleData,singleBins = cut1D(positions,I,Norm,Monitor,q1,q2,width=0.1,minPixel=0.02,Emin=EnergyBins[i],Emax=EnergyBins[i+1],extend=extend,constantBins=constantBins)
+                assert(len(data[0]) == len(singleData[0]))
+                for a,b in zip(data,singleData):
+                    assert(np.all(a == np.asarray(b).flatten()))
+                assert(np.all(bins[0] == singleBins[0]))
+    assert(len(Data[-1][0]) == 0) # No data between 4 and 5 meV
+
+    DataFrame,positionList,centerPos,binDistance = ds.cutQE(q1,q2,width=0.1,minPixel=0.02,EnergyBins=EnergyBins,rlu=False)
+    assert(np.all(DataFrame['energyCut'].unique() == np.arange(len(EnergyBins)-2)))
+    assert(len(positionList) == len(centerPos) == len(binDistance) == len(EnergyBins)-2)
+    for i,cut in DataFrame.groupby('energyCut'):
+        data = ds.cut1D(q1,q2,width=0.1,minPixel=0.02,Emin=EnergyBins[i],Emax=EnergyBins[i+1],rlu=False)[0]
+        for col in ['Qx','Qy','H','K','L','Energy','Intensity','Monitor','BinCount']:
+            assert(np.all(np.isclose(cut[col].values,data[col].values)))
+
+
+def test_DataSet_cutQELine_Grouped():
+    sample = MJOLNIR.Data.Sample.Sample(a=6.0,b=6.0,c=12.2,projectionVector1=[1,0,0],projectionVector2=[0,1,0],gamma=120.)
+    nf = [os.path.join('Data','Normalization_1.calib'),os.path.join('Data','Normalization_8.calib')]
+    df = MJOLNIR.Data.DataFile.createEmptyDataFile(A3=np.linspace(0,90,91),A4=-16,Ei=5.5,sample=sample,normalizationFiles=nf)
+    df.I = np.random.RandomState(0).poisson(10,size=df.I.shape)
+    ds = DataSet(dataFiles=[df])
+    ds.convertDataFile(binning=8,saveFile=False)
+
+    positions = np.array([ds.qx.extractData(),ds.qy.extractData(),ds.energy.extractData()])
+    I,Norm,Monitor = ds.I.extractData(),ds.Norm.extractData(),ds.Monitor.extractData()
+    QPoints = np.array([[0.5,-1.0],[0.8,-0.6],[0.9,-0.9],[0.4,-1.2]])
+    EnergyBins = np.linspace(0.5,2.3,7)
+    width = [0.1,0.2,0.05]
+    
+    # Projecting all segments at once gives the same as cutting each segment on its own
+    for constantBins in [False,True]:
+        Data,Bins = cutQELine(positions,I,Norm,Monitor,QPoints,width=width,minPixel=0.02,EnergyBins=EnergyBins,constantBins=constantBins)
+        assert(len(Data) == len(Bins) == len(QPoints)-1)
+        for segment,(q1,q2) in enumerate(zip(QPoints,QPoints[1:])):
+            singleData,singleBins = cutQE(positions,I,Norm,Monitor,q1,q2,width=width[segment],minPixel=0.02,EnergyBins=EnergyBins,extend=False,constantBins=constantBins)
+            for data,single in zip(Data[segment],singleData):
+                for a,b in zip(data,single):
+                    assert(np.all(a == b))
+            for bins,single in zip(Bins[segment],singleBins):
+                assert(np.all(bins[0] == single[0]))
+
+    # HKL conversion of the bins in RLU mode
+    QPointsHKL = ds.convertToHKL(QPoints)
+    DataList,BinList,centerPosition,binDistance = ds.cutQELine(QPointsHKL,EnergyBins,width=0.1,minPixel=0.02,rlu=True)
+    assert(np.all(DataList['qCut'].unique() == np.arange(len(QPoints)-1)))
+    for segment in range(len(QPoints)-1):
+        DataFrame,positionList,centerPos,_ = ds.cutQE(QPointsHKL[segment],QPointsHKL[segment+1],width=0.1,minPixel=0.02,EnergyBins=EnergyBins,extend=False)
+        assert(np.all(DataList[DataList['qCut']==segment]['Intensity'].values == DataFrame['Intensity'].values))
+        for position,HKLPosition,centre in zip(positionList,BinList[segment],centerPosition[segment]):
+            assert(np.all(np.isclose(HKLPosition[0][:,:3],ds.convertToHKL(position[0][:,:2]))))
+            assert(np.all(np.isclose(HKLPosition[0][:,3],position[0][:,2])))
+            assert(np.all(np.isclose(centre[:,:3],0.5*(HKLPosition[0][1:,:3]+HKLPosition[0][:-1,:3]))))
+
+
+def test_DataSet_cutPowder_Grouped():
+    sample = MJOLNIR.Data.Sample.Sample(a=6.0,b=6.0,c=12.2,projectionVector1=[1,0,0],projectionVector2=[0,1,0],gamma=120.)
+    nf = [os.path.join('Data','Normalization_1.calib'),os.path.join('Data','Normalization_8.calib')]
+    df = MJOLNIR.Data.DataFile.createEmptyDataFile(A3=np.linspace(0,90,91),A4=-16,Ei=5.5,sample=sample,normalizationFiles=nf)
+    df.I = np.random.RandomState(0).poisson(10,size=df.I.shape)
+    ds = DataSet(dataFiles=[df])
+    ds.convertDataFile(binning=8,saveFile=False)
+
+    qx,qy,energy = ds.qx.extractData(),ds.qy.extractData(),ds.energy.extractData()
+    I,Norm,Monitor = ds.I.extractData(),ds.Norm.extractData(),ds.Monitor.extractData()
+    q = np.linalg.norm([qx,qy],axis=0)
+    EBinEdges = np.concatenate([np.linspace(0.5,2.3,7),[4.0,5.0]]) # No data in last energy bin
+    
+    for constantBins in [False,True]:
+        Data,qbins = cutPowder([qx,qy,energy],I,Norm,Monitor,EBinEdges,qMinBin=0.02,constantBins=constantBins)
+        assert(len(qbins) == len(EBinEdges)-1)
+        assert(len(qbins[-1]) == 0 and np.sum(Data['EnergyCut']==len(EBinEdges)-2) == 0)
+        for i,(binStart,binEnd) in enumerate(zip(EBinEdges[:-2],EBinEdges[1:-1])): # Compare to histograms of each energy
+            inside = np.logical_and(energy>binStart,energy<=binEnd)
+            cut = Data[Data['EnergyCut']==i]
+            assert(np.all(cut['Intensity'].values == np.histogram(q[inside],bins=qbins[i],weights=I[inside])[0].astype(int)))
+            assert(np.all(cut['BinCount'].values == np.histogram(q[inside],bins=qbins[i])[0]))
+            assert(np.allclose(cut['q'].values,0.5*(qbins[i][1:]+qbins[i][:-1])))
+
+    # Common binning of all energies
+    EBinEdges = EBinEdges[:-2]
+    Data,qbins = ds.cutPowder(EBinEdges,qMinBin=0.02,commonBins=True)
+    assert(np.all([np.all(b == qbins[0]) for b in qbins]))
+    assert(len(Data) == (len(qbins[0])-1)*(len(EBinEdges)-1))
+    inside = np.logical_and(energy>EBinEdges[0],energy<=EBinEdges[-1])
+    assert(Data['BinCount'].sum() == np.sum(inside))
+
+
+def test_DataSet_importDependencies():
+    # Importing the data set module, as done by the command line tools, is not to pull in the optional 
+    # dependencies needed for Qt viewers, uFit export or tessellations. Checked in a fresh interpreter.
+    code = """import sys
+import MJOLNIR.Data.DataSet
+print(','.join(m for m in ['pyqtgraph','ufit','pytest','shapely','scipy.spatial','scipy.optimize','MJOLNIR.Data.Viewer3DPyQtGraph'] if m in sys.modules))
+import MJOLNIR.Data.Viewer1D
+print(MJOLNIR.Data.Viewer1D.USETEX) # No search for latex at import
+"""
+    import subprocess
+    output = subprocess.check_output([sys.executable,'-c',code],cwd=os.path.dirname(os.path.dirname(os.path.abspath(MJOLNIR.__file__)))).decode().split('\n')
+    assert(output[0] == '')
+    assert(output[1] == 'None')
+
+
+def test_CutResult():
+    result = CutResult(columns={'Energy':np.array([1.0,2.0,3.0]),'Intensity':np.array([1,2,0]),'Monitor':np.array([10,10,10]),
+                                'Normalization':np.array([1.0,2.0,0.0]),'BinCount':np.array([1,1,0])},q1=[0,0])
+    result['Int'] = result['Intensity']*result['BinCount']/(result['Normalization']*result['Monitor'])
+    result['qCut'] = 1 # Scalars are broadcasted
+    assert(len(result) == 3)
+    assert(result.shape == (3,7))
+    assert(result.columns == ['Energy','Intensity','Monitor','Normalization','BinCount','Int','qCut'])
+    assert(result[['Energy','qCut']].shape == (3,2))
+    assert(result.metadata['q1'] == [0,0])
+
+    try: # Column of wrong length
+        result['H'] = np.array([1.0,2.0])
+        assert False
+    except AttributeError:
+        assert True
+
+    frame = result.to_pandas()
+    assert(list(frame.columns) == result.columns)
+    assert(frame['Intensity'].dtype == int and frame['Int'].dtype == float)
+    assert(np.all(frame['Energy'].values == result['Energy']))
+
+    # Concatenation keeps the indices as pandas.concat
+    other = CutResult(columns={name:result[name][:2] for name in result},index=np.array([5,6]))
+    combined = CutResult.concatenate([result,CutResult(),other])
+    reference = pd.concat([frame,other.to_pandas()])
+    assert(np.all(combined.to_pandas().index == reference.index))
+    for col in reference.columns:
+        assert(np.allclose(combined[col],reference[col].values,equal_nan=True))
+    assert(len(CutResult.concatenate([])) == 0)
+
+    try: # No uFit parameters
+        result.to_ufit()
+        assert False
+    except AttributeError:
+        assert True
+
+
 def test_updateCalibration():
     calibFiles = [os.path.join('Data','Normalization80_1.calib'),
                     os.path.join('Data','Normalization80_3.calib'),
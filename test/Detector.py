@@ -89,4 +89,16 @@ def test_TubeDetector1D_getPixelPositions():
     assert(np.all(AssumedPositions==positions))
 
     
-    
\ No newline at end of file
+    
+
+def test_TubeDetector1D_getSplitIndices():
+    TubeDetector = TubeDetector1D(position=(1.0,0.0,1.0),direction=(1.0,0,0),length=0.5,pixels=20)
+    positions = TubeDetector.getPixelPositions(split=False)
+    assert(positions.shape == (20,3))
+    for split in [[0,20],[2,5,11,18],[0,12],[3,12,8,25],[5,5,30]]:
+        TubeDetector.split = split
+        pixelIndex,area = TubeDetector.getSplitIndices()
+        parts = TubeDetector.getPixelPositions()
+        assert(len(parts) == len(split)-1)
+        for i,part in enumerate(parts):
+            assert(np.all(positions[pixelIndex[area==i]] == part))
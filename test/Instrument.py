@@ -183,6 +183,171 @@ def test_Instrument_Initialization():
         assert True
 
 
+def test_Instrument_GeometryCache():
+    from MJOLNIR.Geometry import Instrument as InstrumentModule
+    Instr = Instrument(fileName='Data'+os.sep+'CAMEA_Updated.xml')
+    Instr.initialize()
+    A4 = Instr.A4
+
+    Instr2 = Instrument(fileName='Data'+os.sep+'CAMEA_Updated.xml')
+    assert(Instr2.geometryKey() == Instr.geometryKey())
+    cacheSize = len(InstrumentModule.geometryCache)
+    Instr2.initialize()
+    assert(len(InstrumentModule.geometryCache) == cacheSize) # Same geometry is taken from cache
+    assert(np.all([np.all(a == b) for wedgeA,wedgeB in zip(Instr2.A4,A4) for a,b in zip(wedgeA,wedgeB)]))
+
+    # Instances do not share arrays with each other or with the cache
+    assert(not Instr2.A4 is A4)
+    assert(not Instr2.A4[0][0] is A4[0][0])
+    assert(not Instr2.Ef[0][0] is Instr.Ef[0][0])
+    original = np.array(A4[0][0])
+    Instr2.A4[0][0] += 1.0
+    assert(np.all(A4[0][0] == original))
+    Instr3 = Instrument(fileName='Data'+os.sep+'CAMEA_Updated.xml')
+    Instr3.initialize()
+    assert(np.all(Instr3.A4[0][0] == original))
+    Instr2.initialize() # Reinitializing restores A4 from the cache
+
+    Instr2.wedges[0].analysers[0].d_spacing = 3.0
+    assert(Instr2.geometryKey() != Instr.geometryKey())
+    Instr2.initialize()
+    assert(np.all(Instr2.A4[0][0] == A4[0][0]))
+    assert(np.all(Instr2.Ef[0][0] != Instr.Ef[0][0]))
+    assert(np.all(Instr2.Ef[1][0] == Instr.Ef[1][0]))
+
+    InstrumentModule.geometryCache.clear()
+    Instr.initialize()
+    assert(not Instr.A4 is A4)
+    assert(np.all([np.all(a == b) for wedgeA,wedgeB in zip(Instr.A4,A4) for a,b in zip(wedgeA,wedgeB)]))
+
+    # A4 and Ef of a single pixel
+    A4,Ef = InstrumentModule.calculateA4Ef(np.array([[1.0,0.0,0.0]]),np.array([[1.0,0.0,1.0]]),3.355)
+    assert(np.isclose(A4[0],-np.pi/2))
+    assert(np.isclose(Ef[0],(InstrumentModule.factorLambdasqrtE/(3.355*2.0*np.sin(np.pi/4.0)))**2))
+
+
+def test_Instrument_sweep():
+    import copy
+    from MJOLNIR.Geometry import Instrument as InstrumentModule
+    Instr = Instrument(fileName='Data'+os.sep+'CAMEA_Updated.xml')
+    Instr.initialize()
+    key = Instr.geometryKey()
+
+    dSpacings = [-0.01,0.0]
+    positions = [[0,0,0],[0.001,0,0],[0,0.002,0]]
+    A4,Ef = Instr.sweep({'analysers.d_spacing':dSpacings,'wedges[1].position':positions},workers=2)
+    assert(A4.shape == (2,3,8,13,1024))
+    assert(Ef.shape == A4.shape)
+    assert(Instr.geometryKey() == key) # Base instrument is unchanged
+
+    for i,d in enumerate(dSpacings):
+        for j,p in enumerate(positions):
+            Instr2 = copy.deepcopy(Instr)
+            for wedge in Instr2.wedges:
+                for ana in wedge.analysers:
+                    ana.d_spacing+=d
+            Instr2.wedges[1].position = Instr2.wedges[1].position+np.array(p)
+            Instr2.initialize()
+            assert(np.all(np.array(Instr2.A4) == A4[i,j]))
+            assert(np.all(np.array(Instr2.Ef) == Ef[i,j]))
+
+    A4,Ef = InstrumentModule.sweepGeometry(Instr,{'wedges[0].detectors[0].pixels':[0,-24]})
+    assert(A4.shape == (2,)) # Different number of pixels
+    assert(len(A4[0][0][0]) == 1024 and len(A4[1][0][0]) == 1000)
+    assert(Instr.wedges[0].detectors[0].pixels == 1024)
+    assert(Instr.geometryKey() == key)
+
+    for wrongParameter in ['position','wedges.analysers.width','detectors.wedges.position','wedges[20].position','analysers[a].position']:
+        with pytest.raises(AttributeError):
+            Instr.sweep({wrongParameter:[0.0]})
+
+
+def test_Instrument_records():
+    from MJOLNIR.Geometry import Instrument as InstrumentModule
+    Instr = Instrument(fileName='Data'+os.sep+'CAMEA_Updated.xml')
+    records = Instr.toRecords()
+    assert(len(records['wedges']) == 8)
+    assert(len(records['analysers']) == 64 and len(records['detectors']) == 104)
+
+    Instr2 = InstrumentModule.instrumentFromRecords(records)
+    records2 = Instr2.toRecords()
+    for name in ['analysers','detectors']:
+        for field in records[name].dtype.names:
+            assert(np.allclose(records2[name][field],records[name][field]))
+    assert(np.all(records2['splits'] == records['splits']))
+    for wedge,wedge2 in zip(Instr.wedges,Instr2.wedges):
+        for item,item2 in zip(wedge.analysers+wedge.detectors,wedge2.analysers+wedge2.detectors):
+            assert(item == item2)
+    Instr.initialize()
+    Instr2.initialize()
+    assert(np.allclose(np.array(Instr.A4),np.array(Instr2.A4)))
+
+    Instr2.wedges[0].analysers[0].position = (0.0,0.0,1.0) # Changing one object leaves the others untouched
+    assert(np.all(Instr2.wedges[0].analysers[1].position == records['analysers']['position'][1]))
+
+    records['analysers']['direction'][3] = 0.0
+    with pytest.raises(AttributeError):
+        InstrumentModule.instrumentFromRecords(records)
+
+    Instr3 = Instrument(wedges=[Wedge.Wedge(analysers=[Analyser.Analyser(position=(0,0,0),direction=(1,0,0))])])
+    with pytest.raises(AttributeError):
+        Instr3.toRecords()
+
+def test_Instrument_compiled(tmpdir):
+    from MJOLNIR.Geometry import Instrument as InstrumentModule
+    fileName = 'Data'+os.sep+'CAMEA_Updated.xml'
+    cacheFolder = str(tmpdir.join('compiled'))
+    Instr = Instrument(fileName=fileName)
+    Instr.initialize()
+
+    compiledFile = InstrumentModule.compiledInstrumentFile(fileName,cacheFolder=cacheFolder)
+    assert(not os.path.isfile(compiledFile))
+    Instr2 = InstrumentModule.loadInstrument(fileName,cacheFolder=cacheFolder) # Compiles instrument
+    assert(os.path.isfile(compiledFile))
+    Instr3 = InstrumentModule.loadInstrument(fileName,cacheFolder=cacheFolder) # Loads compiled instrument
+
+    for loaded in [Instr2,Instr3]:
+        assert(loaded.settings == Instr.settings)
+        for wedge,wedge2 in zip(Instr.wedges,loaded.wedges):
+            assert(str(wedge.settings) == str(wedge2.settings))
+            for item,item2 in zip(wedge.analysers+wedge.detectors,wedge2.analysers+wedge2.detectors):
+                assert(item == item2)
+        assert(np.all(np.array(loaded.A4) == np.array(Instr.A4)))
+        assert(np.all(np.array(loaded.Ef) == np.array(Instr.Ef)))
+
+    # Changing the XML file results in a new compiled file
+    changedFile = str(tmpdir.join('changed.xml'))
+    with open(fileName) as f:
+        XML = f.read()
+    with open(changedFile,'w') as f:
+        f.write(XML.replace("d_spacing='3.354'","d_spacing='3.4'",1))
+    assert(InstrumentModule.compiledInstrumentFile(changedFile,cacheFolder=cacheFolder) != compiledFile)
+    Instr4 = InstrumentModule.loadInstrument(changedFile,cacheFolder=cacheFolder)
+    assert(not np.all(np.array(Instr4.Ef) == np.array(Instr.Ef)))
+
+    # Instruments with other objects are not compiled but still loaded
+    otherFile = str(tmpdir.join('other.xml'))
+    with open(otherFile,'w') as f:
+        f.write("<?xml version='1.0'?>\n<Instrument><Wedge position='0,0,0' concept='ManyToMany'>\n<FlatAnalyser position='0,1,0' direction='0,0,1' d_spacing='3.35'></FlatAnalyser>\n<TubeDetector1D position='1,1,0' direction='0,0,1' pixels='10' length='0.1' diameter='0.02' split=''></TubeDetector1D>\n</Wedge></Instrument>")
+    with pytest.raises(AttributeError):
+        InstrumentModule.compileInstrument(otherFile,cacheFolder=cacheFolder)
+    Instr5 = InstrumentModule.loadInstrument(otherFile,cacheFolder=cacheFolder)
+    assert(np.array(Instr5.A4).shape == (1,1,10))
+
+    # Cache folder that cannot be created, and broken compiled files, fall back to parsing the XML file
+    blockingFile = str(tmpdir.join('afile'))
+    with open(blockingFile,'w') as f:
+        f.write('Not a folder')
+    with pytest.warns(UserWarning):
+        Instr6 = InstrumentModule.loadInstrument(fileName,cacheFolder=os.path.join(blockingFile,'x'))
+    assert(np.all(np.array(Instr6.A4) == np.array(Instr.A4)))
+
+    with open(compiledFile,'wb') as f:
+        f.write(b'Not a compiled instrument')
+    with pytest.warns(UserWarning):
+        Instr7 = InstrumentModule.loadInstrument(fileName,cacheFolder=cacheFolder)
+    assert(np.all(np.array(Instr7.Ef) == np.array(Instr.Ef)))
+
 
 def test_Instrument_saveload():
     import os
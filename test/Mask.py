@@ -5,7 +5,7 @@ import warnings
 from six import with_metaclass
 # or
 from future.utils import with_metaclass
-from MJOLNIR.Data.Mask import MaskingObject, lineMask, rectangleMask, circleMask, boxMask, indexMask, MultiMask
+from MJOLNIR.Data.Mask import MaskingObject, lineMask, rectangleMask, circleMask, boxMask, indexMask, MultiMask, CompiledMask
 
 
 def test_subclass_MaskingObject():
@@ -292,4 +292,74 @@ def test_indexMask():
     assert(np.all(mask[:,:,:,1,:]==True))
     assert(np.all(mask[:,:,:,2,:]==False))
     
-    
\ No newline at end of file
+    
+def test_CompiledMask():
+    X,Y,Z = np.array(np.meshgrid(np.linspace(0,2,40),np.linspace(0,2,40),np.linspace(0,2,40))).reshape(3,-1)
+    
+    class p(object):
+        def __init__(self):
+            self.fetched = []
+        
+        def __getattr__(self,name): # Keep track of coordinate fetches
+            if not name in ['X','Y','Z']:
+                raise AttributeError(name)
+            self.fetched.append(name)
+            return {'X':X,'Y':Y,'Z':Z}[name]
+    
+    points = p()
+    
+    circ = circleMask(center=[0.5,0.5],radius=0.5,coordinates=['X','Y'])
+    rect = rectangleMask(corner1=[0,2],corner2=[0,0],corner3=[1,0],coordinates=['X','Y'])
+    box = boxMask([0,0,0],[1,0.5,0],[0,0,0.5],coordinates=['X','Y','Z'])
+    line = lineMask(0.5,1.0,coordinates='Z')
+
+    mask = -(circ+rect+box)*line/(circ*box)
+
+    # Nested operations of the same kind are merged, giving one or and two and operations
+    compiled = mask.compile()
+    assert(isinstance(compiled,CompiledMask))
+    assert(len([instruction for instruction in compiled.program if instruction[0] == 'operation']) == 3)
+
+    result = compiled(points)
+    assert(sorted(points.fetched) == ['X','Y','Z']) # Coordinates are only fetched once
+
+    C,R,B,L = [m(p()) for m in [circ,rect,box,line]]
+    expected = np.logical_not(np.logical_or(np.logical_or(C,R),B))
+    expected = np.logical_and(expected,L.reshape(-1))
+    expected = np.logical_and(expected,np.logical_not(np.logical_and(C,B)))
+    assert(result.shape == X.shape)
+    assert(np.all(result == expected))
+    assert(np.all(mask(points) == expected))
+
+    out = np.zeros(X.shape,dtype=bool)
+    returned = compiled(points,out=out)
+    assert(returned is out)
+    assert(np.all(out == expected))
+
+def test_boundingBox():
+    circ = circleMask(center=[0.5,0.5],radius=0.25)
+    sphere = circleMask(center=[0.5,0.5,0.5],radius=0.25)
+    rect = rectangleMask(corner1=[1,1],corner2=[0,0],corner3=[1,-1])
+    box = boxMask([0,0,0],[0.2,0.1,0],[0,0.3,0.1],[0,0,0.4])
+    line = lineMask(0.2,0.4)
+
+    assert(np.all(np.isclose(circ.boundingBox,[[0.25,0.25],[0.75,0.75]])))
+    assert(np.all(np.isclose(sphere.boundingBox,[[0.25]*3,[0.75]*3])))
+    assert(np.all(np.isclose(rect.boundingBox,[[0,-1],[2,1]])))
+    assert(np.all(np.isclose(line.boundingBox,[[0.2],[0.4]])))
+    assert(indexMask(0,1).boundingBox is None)
+    assert((circ+rect).boundingBox is None)
+
+    # Pruned evaluation agrees with exact evaluation of all points, also on the boundaries
+    points = np.random.RandomState(0).uniform(-0.5,2.0,size=(3,50000))
+    points[:,:4] = np.array([[0.25,0.5,0.5],[0.75,0.5,0.5],[2,0,0.5],[0,0,0]]).T
+    for mask in [circ,sphere,rect,box]:
+        dimension = mask.boundingBox.shape[1]
+        P = [p for p in points[:dimension]]
+        pruned = mask._evaluateInside(P,np.empty(points.shape[1],dtype=bool))
+        exact = mask._inside(P,np.empty(points.shape[1],dtype=bool))
+        assert(np.all(pruned == exact))
+        assert(np.all(mask(points[:dimension]) == exact))
+        inside = points[:dimension,exact]
+        assert(np.all(inside>=mask.boundingBox[0].reshape(-1,1)-1e-10))
+        assert(np.all(inside<=mask.boundingBox[1].reshape(-1,1)+1e-10))
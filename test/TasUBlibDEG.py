@@ -1,4 +1,5 @@
-from MJOLNIR.TasUBlibDEG import calcTasUBFromTwoReflections, calcTasQH, calculateBMatrix, calcUBFromAngles, calcTasQAngles
+from MJOLNIR.TasUBlibDEG import calcTasUBFromTwoReflections, calcTasQH, calculateBMatrix, calcUBFromAngles, calcTasQAngles,\
+    calcTasQAnglesBatch, calcTasQHBatch, calcTasMisalignment, calcTasMisalignmentBatch
 import numpy as np
 
 def test_TasUBDeg(): # Test that the two libraries are equivalent in calculating the UB matrices
@@ -90,3 +91,47 @@ def test_TasUBDEG_CalculateAngles(): # TODO: Redo these calculations as one need
         assert(np.all(np.isclose([sgu,sgl],0.0))) # Sgu and sgl are 0 by definition
         assert(np.all(np.isclose(hkl,qe[:3])))
     
+
+
+def test_TasUBDEG_Batch(): # Batched versions are to give the same as looping over single reflections
+    cell = [6.11,   6.11,  11.35, 1.187430040454027, 1.1874300210500532, 0.5535845899562842, 90.  ,  90.  , 120., 90., 90., 60.]
+    B = calculateBMatrix(cell)
+    UB = calcUBFromAngles(B,12.5,0.0,0.0)
+    UBINV = np.linalg.inv(UB)
+    planeNormal = np.array([0,0,1.0])
+    ss = 1
+    A3Off = 2.0
+
+    QE = np.array([[1.0,0.0,0.0,5.0,5],
+                   [0.0,0.5,0.0,8.0,9.2],
+                   [-1.1,-0.1,0.0,5.4,4.4],
+                   [0.3,1.2,0.0,12.0,5.0]])
+
+    A3,A4,sgu,sgl = calcTasQAnglesBatch(UB,planeNormal,ss,A3Off,QE)
+    assert(A3.shape == (len(QE),))
+    for i,qe in enumerate(QE):
+        angles = calcTasQAngles(UB,planeNormal,ss,A3Off,qe)
+        assert(np.all(np.isclose(angles,[A3[i],A4[i],sgu[i],sgl[i]])))
+        assert(np.isclose(calcTasMisalignment(UB,planeNormal,qe),calcTasMisalignmentBatch(UB,planeNormal,QE)[i]))
+
+    # Plain lists of reflections are accepted
+    assert(np.all(np.isclose(calcTasMisalignmentBatch(UB,planeNormal,[[1,1,0]]),calcTasMisalignment(UB,planeNormal,[1,1,0]))))
+    assert(np.all(np.isclose(calcTasQAnglesBatch(UB,planeNormal,ss,A3Off,QE.tolist())[0],A3)))
+
+    HKL,QV = calcTasQHBatch(UBINV,A3,A4,QE[:,3],QE[:,4],A3Off=-A3Off)
+    assert(np.all(np.isclose(QV[:,2],0.0)))
+    for i,qe in enumerate(QE):
+        hkl,qv = calcTasQH(UBINV,[A3[i],A4[i]],qe[3],qe[4],A3Off=-A3Off)
+        assert(np.all(np.isclose(hkl,HKL[i])))
+        assert(np.all(np.isclose(qv,QV[i])))
+
+    # Broadcasting of energies against angles
+    HKL,QV = calcTasQHBatch(UBINV,A3.reshape(-1,1),A4.reshape(-1,1),5.0,np.array([4.0,5.0,6.0]).reshape(1,-1))
+    assert(HKL.shape == (len(QE)*3,3))
+    assert(np.all(np.isclose(HKL[1],calcTasQH(UBINV,[A3[0],A4[0]],5.0,5.0)[0])))
+
+    try:
+        calcTasQAnglesBatch(UB,planeNormal,ss,A3Off,np.array([[0.0,0.0,1.0,5.0,5.0]])) # Parallel to plane normal
+        assert False
+    except AttributeError:
+        assert True
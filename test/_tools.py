@@ -1,5 +1,6 @@
 import numpy as np
-from MJOLNIR._tools import rotate2X, minMax, unitVector, vectorAngle, rotationMatrix, binEdges, fileListGenerator, RoundBinning, generateLabel
+import pytest
+from MJOLNIR._tools import rotate2X, minMax, unitVector, vectorAngle, rotationMatrix, binEdges, fileListGenerator, RoundBinning, generateLabel, KwargChecker, ProfileSpan, Profiler
 
 import os
 
@@ -138,3 +139,67 @@ def test_generateLabel():
     label = generateLabel(v)
     assert(label=='(-0.5H, 22K, -3L)')
 
+
+
+def test_KwargChecker():
+    @KwargChecker(include=['extra'])
+    def inner(a,b=1,c=2):
+        return a+b+c
+
+    @KwargChecker()
+    def outer(a,**kwargs):
+        return inner(a,**kwargs)
+
+    assert(inner._argList == ['a','b','c','extra'])
+    assert(inner(1,b=2) == 5)
+    with pytest.raises(AttributeError) as e:
+        inner(1,B=2)
+    assert('Did you mean "b"?' in str(e.value))
+    with pytest.raises(AttributeError):
+        outer(1,b=2) # b is not an argument of outer
+
+    @KwargChecker(function=inner._original)
+    def outer2(a,**kwargs):
+        return inner(a,**kwargs)
+
+    assert(outer2(1,c=0) == 2) # Internal call of inner is not checked
+    with pytest.raises(TypeError):
+        outer2('a',c=0) # Error raised inside of checked function
+    with pytest.raises(AttributeError):
+        inner(1,d=0) # Checking is reenabled after an error
+
+
+def test_Profiler(tmpdir):
+    import json
+    @ProfileSpan()
+    def inner(x):
+        return 2*x
+
+    @ProfileSpan('outer')
+    def outer(x):
+        return inner(x)+1
+
+    assert(outer(1) == 3) # Not recorded as no profiler is active
+
+    with Profiler() as profiler:
+        for i in range(3):
+            outer(i)
+        with ProfileSpan('block'):
+            inner(0)
+    outer(1)
+
+    summary = profiler.summary()
+    assert(summary['outer']['calls'] == 3)
+    assert(summary['_tools.test_Profiler.<locals>.inner']['calls'] == 4)
+    assert(summary['block']['calls'] == 1)
+    assert(summary['outer']['total'] >= summary['outer']['max'] >= summary['outer']['mean'] > 0.0)
+    report = profiler.report()
+    assert(report.split('\n')[0].startswith('Span'))
+    assert(len(report.split('\n')) == 4)
+
+    traceFile = str(tmpdir.join('trace.json'))
+    profiler.saveChromeTrace(traceFile)
+    with open(traceFile) as f:
+        trace = json.load(f)
+    assert(len(trace['traceEvents']) == 8)
+    assert(all([event['ph'] == 'X' for event in trace['traceEvents']]))
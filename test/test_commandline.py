@@ -2,6 +2,7 @@ from MJOLNIR.Data import DataFile
 import subprocess
 import os,sys
 import pytest
+import numpy as np
 
 dataFiles = [os.path.join('samlpedata',f) for f in ['camea2018n000136.hdf','camea2018n000136.nxs',
 'camea2018n000137.nxs',
@@ -93,6 +94,17 @@ def test_History_MultipleFiles_repeat():
     results = subprocess.check_output(call)
     results2 = subprocess.check_output(['MJOLNIRHistory', '-r'])
     assert(results2 == results)
+
+def test_History_WrongFormat(tmpdir):
+    import h5py
+    wrongFile = os.path.join(str(tmpdir),'notData.hdf')
+    with h5py.File(wrongFile,'w') as f:
+        f.create_group('entry')
+    packageDir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(DataFile.__file__))))
+    script = os.path.join(packageDir,'MJOLNIR','CommandLineScripts','MJOLNIRHistory.py')
+    env = dict(os.environ,PYTHONPATH=os.pathsep.join([packageDir,os.environ.get('PYTHONPATH','')]))
+    result = subprocess.check_output([sys.executable,script,wrongFile],env=env)
+    assert(result.decode().strip() == 'notData.hdf not correct format')
     
     
     
@@ -201,4 +213,61 @@ def test_3DView_Run_Through():
     subprocess.check_output(['MJOLNIR3DView','-r','-b 1','-d', '0.1','0.1','0.2'])
     subprocess.check_output(['MJOLNIR3DView','-r','-b 1','-m 0','-M 1e-5'])
     assert(True)
-    
\ No newline at end of file
+    
+
+### Batch
+def test_Batch_LoadJob():
+    from MJOLNIR.CommandLineScripts import MJOLNIRBatch
+    job = MJOLNIRBatch.loadJob({'files':'136-137','cuts':[{'type':'cutPowder','EBinEdges':[1.0,2.0]},{'type':'cut1D','name':'line'}]})
+    assert(job['binning'] == 8)
+    assert([cut['name'] for cut in job['cuts']] == ['cutPowder_0','line'])
+    assert(MJOLNIRBatch.jobFiles(job) == [os.path.join('.','camea2018n000136.hdf'),os.path.join('.','camea2018n000137.hdf')])
+
+    for wrongJob in [{'binning':8},{'files':[],'binnings':8},{'files':[],'saveFormat':'txt'},
+                     {'files':[],'cuts':[{'type':'cut2D'}]},{'files':[],'cuts':[{'type':'cut1D','name':'a'},{'type':'cutQE','name':'a'}]}]:
+        with pytest.raises(AttributeError):
+            MJOLNIRBatch.loadJob(wrongJob)
+
+    assert(MJOLNIRBatch.generateMask([]) is None)
+    mask = MJOLNIRBatch.generateMask([{'type':'circleMask','center':[0.0,0.0],'radius':0.1},{'type':'circleMask','center':[1.0,0.0],'radius':0.1}])
+    assert(np.all(mask(np.array([[0.0,0.5,1.0],[0.0,0.0,0.0]])) == [True,False,True]))
+    with pytest.raises(AttributeError):
+        MJOLNIRBatch.generateMask([{'type':'Sample'}])
+
+
+def test_Batch_RunCut(tmpdir):
+    from MJOLNIR.CommandLineScripts import MJOLNIRBatch
+    from MJOLNIR.Data.DataSet import DataSet
+    import MJOLNIR.Data.Sample
+    import h5py as hdf
+    import pandas as pd
+    sample = MJOLNIR.Data.Sample.Sample(a=6.0,b=6.0,c=12.2,projectionVector1=[1,0,0],projectionVector2=[0,1,0],gamma=120.)
+    nf = [os.path.join('Data','Normalization_1.calib'),os.path.join('Data','Normalization_8.calib')]
+    df = DataFile.createEmptyDataFile(A3=np.linspace(0,90,91),A4=-16,Ei=5.5,sample=sample,normalizationFiles=nf)
+    df.I = np.random.RandomState(0).poisson(10,size=df.I.shape)
+    ds = DataSet(dataFiles=[df])
+    ds.convertDataFile(binning=8,saveFile=False)
+
+    job = MJOLNIRBatch.loadJob({'files':[],'cuts':[{'type':'cut1D','q1':[0.5,-1.0],'q2':[0.8,-0.6],'width':0.1,'minPixel':0.01,'Emin':1.0,'Emax':1.5,'rlu':False},
+                                                 {'type':'cutPowder','EBinEdges':[1.0,1.5,2.0]},
+                                                 {'type':'binData3D','dx':0.05,'dy':0.05,'dz':0.2,'rlu':False}]})
+    cut1D,powder,volume = job['cuts']
+
+    fileName = MJOLNIRBatch.runCut(ds,cut1D,str(tmpdir),saveFormat='csv')
+    assert(fileName == os.path.join(str(tmpdir),'cut1D_0.csv'))
+    saved = pd.read_csv(fileName)
+    data = ds.cut1D(q1=np.array([0.5,-1.0]),q2=np.array([0.8,-0.6]),width=0.1,minPixel=0.01,Emin=1.0,Emax=1.5,rlu=False)[0]
+    assert(np.allclose(saved['Intensity'],data['Intensity']))
+
+    fileName = MJOLNIRBatch.runCut(ds,powder,str(tmpdir))
+    data = ds.cutPowder(EBinEdges=[1.0,1.5,2.0])[0]
+    with hdf.File(fileName,'r') as f:
+        assert(f.attrs['type'] == 'cutPowder')
+        assert(np.all(f['Intensity'][()] == data['Intensity'].values))
+
+    fileName = MJOLNIRBatch.runCut(ds,volume,str(tmpdir),saveFormat='csv') # Always saved as hdf
+    assert(fileName.endswith('binData3D_2.hdf'))
+    (I,_,_,count),bins = ds.binData3D(0.05,0.05,0.2,rlu=False)
+    with hdf.File(fileName,'r') as f:
+        assert(np.all(f['Intensity'][()] == I))
+        assert(np.all(f['X'][()] == bins[0]))